@@ -1,11 +1,23 @@
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Request, Query, Response
+from fastapi.responses import StreamingResponse, FileResponse
 from pydantic import BaseModel, Field
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Literal, Tuple
+import asyncio
+import json
 import logging
-from app.models.question_generator import QuestionGenerator
+import time
 
 # Import models
 from app.models.transparency_scorer import TransparencyScorer
+from app.models.incremental_scorer import incremental_scorer, UnknownProductError
+from app.models.registry import model_registry
+from app.utils.inference_pool import generation_pool, scoring_pool, PoolSaturatedError
+from app.utils.question_cache import question_cache
+from app.utils.question_index import question_index
+from app.utils.job_queue import job_queue, JobQueueFullError
+from app.utils.profiling import request_profiler
+from app.utils.cancellation import CancellationToken, GenerationCancelled, DISCONNECTED, parse_deadline_header
+from app.utils.metrics import generation_cancellations
 
 # Configure logging
 logger = logging.getLogger(__name__)
@@ -13,6 +25,9 @@ logger = logging.getLogger(__name__)
 # Define API routers
 question_router = APIRouter(tags=["Questions"])
 transparency_router = APIRouter(tags=["Transparency"])
+model_router = APIRouter(tags=["Models"])
+job_router = APIRouter(tags=["Jobs"])
+profile_router = APIRouter(tags=["Profiling"])
 
 # Define request/response models
 class ProductInfo(BaseModel):
@@ -27,9 +42,16 @@ class ProductInfo(BaseModel):
 class GenerateQuestionsRequest(BaseModel):
     product: ProductInfo
     num_questions: Optional[int] = Field(default=5, ge=1, le=20)
+    refresh: Optional[bool] = Field(default=False, description="Ignore cached questions and regenerate")
+    mode: Optional[Literal["fast", "balanced", "quality"]] = Field(
+        default=None,
+        description="Latency tier: fast (small model, beam search), balanced (base model, beam search) "
+                    "or quality (base model, sampling); defaults to QUESTION_DEFAULT_MODE"
+    )
 
 class GenerateQuestionsResponse(BaseModel):
     questions: List[str]
+    mode: Optional[str] = Field(default=None, description="Tier that served the request")
 
 class TransparencyScoreRequest(BaseModel):
     product: ProductInfo
@@ -40,13 +62,185 @@ class TransparencyScoreResponse(BaseModel):
     feedback: str
     areas_for_improvement: List[str]
 
-# Dependency to get question generator model
+class TransparencyScoreDelta(BaseModel):
+    product: Optional[ProductInfo] = Field(default=None, description="Updated product information, if it changed")
+    answers: Dict[str, str] = Field(default_factory=dict, description="Added or changed question-answer pairs")
+    removed: List[str] = Field(default_factory=list, description="Questions whose answers were removed")
+
+class IncrementalScoreResponse(TransparencyScoreResponse):
+    product_id: str
+    answer_count: int
+    verified: Optional[bool] = Field(default=None, description="Whether a full recompute agreed, when checked")
+
+class BatchTransparencyScoreRequest(BaseModel):
+    items: List[TransparencyScoreRequest] = Field(..., min_items=1, max_items=5000)
+
+class GenerateQuestionsJobRequest(BaseModel):
+    products: List[ProductInfo] = Field(..., min_items=1, max_items=1000)
+    num_questions: Optional[int] = Field(default=5, ge=1, le=20)
+    refresh: Optional[bool] = Field(default=False, description="Ignore cached questions and regenerate")
+    mode: Optional[Literal["fast", "balanced", "quality"]] = Field(
+        default=None, description="Latency tier as for /generate-questions; defaults to QUESTION_DEFAULT_MODE"
+    )
+    priority: Literal["high", "normal", "low"] = Field(
+        default="normal", description="Queued products of higher-priority jobs are generated first"
+    )
+    result_ttl: Optional[int] = Field(
+        default=None, ge=60, le=604800,
+        description="Seconds results are kept once the job finishes; defaults to JOB_RESULT_TTL"
+    )
+
+class JobResponse(BaseModel):
+    job_id: str
+    status: str = Field(..., description="queued, running, completed or failed (no product succeeded)")
+    priority: str
+    total: int
+    completed: int
+    failed: int
+    created_at: float
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    expires_at: Optional[float] = Field(default=None, description="When the results are deleted")
+    results: Optional[List[Dict[str, Any]]] = Field(
+        default=None,
+        description="Finished products by index: {index, questions, mode} or {index, error}"
+    )
+
+class ProfileResponse(BaseModel):
+    profile_id: str
+    method: str
+    path: str
+    trigger: str = Field(..., description="header, query or sampled")
+    request_id: str
+    status: int
+    started_at: float
+    duration_ms: float
+    python_threads: int = Field(..., description="Threads whose cProfile statistics were merged")
+    generate_calls: int
+    torch_profiled_calls: int = Field(..., description="Generate calls with a torch operator profile")
+    files: List[str]
+
+class ModelStatsResponse(BaseModel):
+    models: Dict[str, Dict[str, Any]]
+    scheduler: Optional[Dict[str, Any]] = None
+    generation_modes: Optional[Dict[str, Any]] = None
+    prompts: Optional[Dict[str, Any]] = None
+    pools: Dict[str, Dict[str, Any]]
+    cache: Dict[str, Any]
+    index: Dict[str, Any]
+    incremental_scoring: Dict[str, Any]
+    jobs: Dict[str, Any]
+
+# Dependency to get the shared question generator model; waits (without blocking
+# the event loop) while the generator is still loading in the background
 async def get_question_generator():
-    return QuestionGenerator()
+    return await asyncio.wrap_future(model_registry.question_generator_future())
 
-# Dependency to get transparency scorer model
+# Dependency to get the shared transparency scorer model
 async def get_transparency_scorer():
-    return TransparencyScorer()
+    return model_registry.get_transparency_scorer()
+
+@model_router.get(
+    "/models",
+    response_model=ModelStatsResponse,
+    summary="Load time and memory footprint of loaded models"
+)
+async def get_model_stats():
+    return ModelStatsResponse(
+        models=model_registry.stats(),
+        scheduler=model_registry.scheduler_stats(),
+        generation_modes=model_registry.generation_mode_stats(),
+        prompts=model_registry.prompt_stats(),
+        pools={pool.name: pool.stats() for pool in (generation_pool, scoring_pool)},
+        cache=question_cache.stats(),
+        index=question_index.stats(),
+        incremental_scoring=incremental_scorer.stats(),
+        jobs=job_queue.stats()
+    )
+
+def saturated_exception(error: PoolSaturatedError) -> HTTPException:
+    # Tell clients to back off instead of queueing indefinitely
+    return HTTPException(
+        status_code=503,
+        detail=f"Service is busy, retry after {error.retry_after} seconds",
+        headers={"Retry-After": str(error.retry_after)}
+    )
+
+def generation_mode(question_generator, requested: Optional[str]) -> str:
+    # Tier the request asked for (or the default). Its cache and index entries are checked first;
+    # the fast-tier fallback is only decided when a generation is actually needed
+    if requested is not None and requested not in question_generator.modes:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Generation mode '{requested}' is not enabled; available: {', '.join(question_generator.modes)}"
+        )
+    return requested or question_generator.default_mode
+
+def request_cancellation(http_request: Request) -> CancellationToken:
+    # Cancellation token carrying the optional X-Request-Deadline of the client
+    header = http_request.headers.get("x-request-deadline")
+    if not header:
+        return CancellationToken()
+    try:
+        return CancellationToken(parse_deadline_header(header))
+    except ValueError:
+        raise HTTPException(
+            status_code=400,
+            detail="X-Request-Deadline must be a Unix timestamp in seconds or milliseconds"
+        )
+
+def generate_or_reuse(question_generator, product_info: Dict[str, Any], num_questions: int, mode: str,
+                      refresh: bool, cancel_token: CancellationToken,
+                      fallback: bool = False) -> Tuple[List[str], str, bool]:
+    # Reuse the questions of a near-identical product when the index has one; otherwise generate,
+    # in the fast tier instead when fallback is allowed and the requested tier is backed up.
+    # Returns the questions, the tier that produced them and whether they may be cached: questions
+    # cut short by a deadline or topped up with generic ones only go to the caller who asked.
+    if not refresh:
+        reused = question_index.lookup(
+            product_info, question_generator.prompt_fields, num_questions, question_generator.modes[mode].model_id
+        )
+        if reused is not None:
+            return reused, mode, True
+    if fallback:
+        served_mode = question_generator.resolve_mode(mode)
+        if served_mode != mode:
+            # The fallback tier may have answered this product already
+            cached = None if refresh else question_cache.get(question_cache.make_key(
+                product_info, question_generator.prompt_fields, num_questions,
+                question_generator.modes[served_mode].model_id
+            ))
+            if cached is not None:
+                return cached, served_mode, True
+            return generate_or_reuse(question_generator, product_info, num_questions, served_mode, refresh, cancel_token)
+    outcome = {}
+    questions = question_generator.generate(
+        product_info=product_info,
+        num_questions=num_questions,
+        cancel_token=cancel_token,
+        mode=mode,
+        outcome=outcome
+    )
+    if outcome["complete"]:
+        question_index.add(
+            product_info, question_generator.prompt_fields, question_generator.modes[mode].model_id, questions
+        )
+    return questions, mode, outcome["complete"]
+
+async def cancel_on_disconnect(http_request: Request, token: CancellationToken, interval: float = 0.1):
+    # Poll for a client disconnect while generation runs on the pool
+    while not token.cancelled:
+        if await http_request.is_disconnected():
+            token.cancel(DISCONNECTED)
+            return
+        await asyncio.sleep(interval)
+
+def cancelled_exception(error: GenerationCancelled) -> HTTPException:
+    # 504 when the client's deadline passed; 499 (client closed request) when it went away
+    generation_cancellations.labels(error.reason).inc()
+    if error.reason == DISCONNECTED:
+        return HTTPException(status_code=499, detail="Client closed request")
+    return HTTPException(status_code=504, detail="Request deadline exceeded")
 
 @question_router.post(
     "/generate-questions",
@@ -55,21 +249,185 @@ async def get_transparency_scorer():
 )
 async def generate_questions(
     request: GenerateQuestionsRequest,
-    question_generator: QuestionGenerator = Depends(get_question_generator)
+    http_request: Request,
+    question_generator=Depends(get_question_generator)
 ):
+    cancel_token = request_cancellation(http_request)
+    mode = generation_mode(question_generator, request.mode)
+    model_id = question_generator.modes[mode].model_id
+    watcher = None
     try:
-        logger.info(f"Generating questions for product: {request.product.name}")
+        logger.info(f"Generating questions for product: {request.product.name} ({mode} mode)")
+        cancel_token.raise_if_cancelled()
         
-        # Generate questions based on product information
-        questions = question_generator.generate(
-            product_info=request.product.dict(),
-            num_questions=request.num_questions
+        product_info = request.product.dict()
+        cache_key = question_cache.make_key(
+            product_info, question_generator.prompt_fields, request.num_questions, model_id
+        )
+
+        def tier_key(name: str) -> str:
+            return question_cache.make_key(
+                product_info, question_generator.prompt_fields, request.num_questions,
+                question_generator.modes[name].model_id
+            )
+
+        # Stop sampling when the client disconnects or its deadline passes
+        watcher = asyncio.create_task(cancel_on_disconnect(http_request, cancel_token))
+
+        async def generate():
+            # Generate questions based on product information; runs on the generation pool
+            # so the event loop stays responsive and concurrent requests can be batched
+            questions, served_mode, complete = await generation_pool.run(
+                generate_or_reuse, question_generator, product_info, request.num_questions, mode,
+                request.refresh, cancel_token, fallback=True
+            )
+            # Questions of a fallback tier are cached under that tier's key, never the requested one's
+            return questions, None if served_mode == mode else tier_key(served_mode), complete
+
+        questions, stored_key = await question_cache.get_or_generate(cache_key, generate, refresh=request.refresh)
+        served_mode = mode if stored_key == cache_key else next(
+            name for name in question_generator.modes if tier_key(name) == stored_key
         )
         
-        return GenerateQuestionsResponse(questions=questions)
+        return GenerateQuestionsResponse(questions=questions, mode=served_mode)
+    except GenerationCancelled as e:
+        logger.info(f"Cancelled question generation: {str(e)}")
+        raise cancelled_exception(e)
+    except PoolSaturatedError as e:
+        logger.warning(f"Rejected question generation: {str(e)}")
+        raise saturated_exception(e)
     except Exception as e:
         logger.error(f"Error generating questions: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Failed to generate questions: {str(e)}")
+    finally:
+        if watcher is not None:
+            watcher.cancel()
+
+# Products scored per vectorized batch in the bulk scoring endpoint
+SCORING_CHUNK_SIZE = 256
+
+def format_stream_event(payload: Dict[str, Any], sse: bool) -> str:
+    # Server-Sent Events frame or one line of newline-delimited JSON
+    data = json.dumps(payload)
+    return f"data: {data}\n\n" if sse else f"{data}\n"
+
+@question_router.post(
+    "/generate-questions/stream",
+    summary="Stream product-specific questions as they are generated",
+    response_description="Newline-delimited JSON, or Server-Sent Events when requested via the Accept header"
+)
+async def stream_questions(
+    request: GenerateQuestionsRequest,
+    http_request: Request,
+    question_generator=Depends(get_question_generator)
+):
+    mode = generation_mode(question_generator, request.mode)
+    model_id = question_generator.modes[mode].model_id
+    logger.info(f"Streaming questions for product: {request.product.name} ({mode} mode)")
+    sse = "text/event-stream" in http_request.headers.get("accept", "")
+    media_type = "text/event-stream" if sse else "application/x-ndjson"
+
+    product_info = request.product.dict()
+    cache_key = question_cache.make_key(
+        product_info, question_generator.prompt_fields, request.num_questions, model_id
+    )
+    cached = None if request.refresh else await question_cache.aget(cache_key)
+
+    if cached is not None:
+        async def cached_events():
+            for index, question in enumerate(cached):
+                yield format_stream_event({"index": index, "question": question}, sse)
+            yield format_stream_event({"done": True, "count": len(cached), "mode": mode}, sse)
+
+        return StreamingResponse(cached_events(), media_type=media_type, headers={"Cache-Control": "no-cache"})
+
+    cancel_token = request_cancellation(http_request)
+
+    # Tier that produced the streamed questions, decided on the pool once the requested tier's
+    # cache and index have missed, and whether they may be cached (set by iter_generate)
+    served = {"mode": mode, "complete": True}
+
+    def generate():
+        # Reuse the questions of a near-identical product when the index has one
+        if not request.refresh:
+            reused = question_index.lookup(
+                product_info, question_generator.prompt_fields, request.num_questions, model_id
+            )
+            if reused is not None:
+                yield from reused
+                return
+        served["mode"] = question_generator.resolve_mode(mode)
+        if served["mode"] != mode and not request.refresh:
+            # The fallback tier may have answered this product already
+            served_id = question_generator.modes[served["mode"]].model_id
+            reused = question_cache.get(question_cache.make_key(
+                product_info, question_generator.prompt_fields, request.num_questions, served_id
+            )) or question_index.lookup(product_info, question_generator.prompt_fields, request.num_questions, served_id)
+            if reused is not None:
+                yield from reused
+                return
+        generated = []
+        for question in question_generator.iter_generate(
+            product_info=product_info,
+            num_questions=request.num_questions,
+            streaming=True,
+            cancel_token=cancel_token,
+            mode=served["mode"],
+            outcome=served
+        ):
+            generated.append(question)
+            yield question
+        # Reached only when the whole stream was consumed
+        if served["complete"]:
+            question_index.add(
+                product_info, question_generator.prompt_fields, question_generator.modes[served["mode"]].model_id,
+                generated
+            )
+
+    try:
+        questions = generation_pool.stream(generate)
+    except PoolSaturatedError as e:
+        logger.warning(f"Rejected question stream: {str(e)}")
+        raise saturated_exception(e)
+
+    async def events():
+        streamed = []
+        # Set once generation ended on its own; otherwise the client went away mid-stream
+        finished = False
+        try:
+            async for question in questions:
+                yield format_stream_event({"index": len(streamed), "question": question}, sse)
+                streamed.append(question)
+            finished = True
+        except GenerationCancelled as e:
+            finished = True
+            generation_cancellations.labels(e.reason).inc()
+            logger.info(f"Cancelled question stream: {str(e)}")
+            yield format_stream_event({"error": "Request deadline exceeded"}, sse)
+            return
+        except Exception as e:
+            finished = True
+            logger.error(f"Error streaming questions: {str(e)}")
+            yield format_stream_event({"error": f"Failed to generate questions: {str(e)}"}, sse)
+            return
+        finally:
+            if not finished and not cancel_token.cancelled:
+                # Client disconnected: abort the generate call in progress
+                cancel_token.cancel(DISCONNECTED)
+                generation_cancellations.labels(DISCONNECTED).inc()
+            await questions.aclose()
+        # Only complete streams are cached, under the key of the tier that produced them; streams
+        # cut short or topped up with generic questions are not
+        if served["complete"] and served["mode"] != mode:
+            await question_cache.aset(question_cache.make_key(
+                product_info, question_generator.prompt_fields, request.num_questions,
+                question_generator.modes[served["mode"]].model_id
+            ), streamed)
+        elif served["complete"]:
+            await question_cache.aset(cache_key, streamed)
+        yield format_stream_event({"done": True, "count": len(streamed), "mode": served["mode"]}, sse)
+
+    return StreamingResponse(events(), media_type=media_type, headers={"Cache-Control": "no-cache"})
 
 @transparency_router.post(
     "/calculate-transparency-score",
@@ -84,7 +442,8 @@ async def calculate_transparency_score(
         logger.info(f"Calculating transparency score for product: {request.product.name}")
         
         # Calculate transparency score based on product information and answers
-        result = transparency_scorer.calculate_score(
+        result = await scoring_pool.run(
+            transparency_scorer.calculate_score,
             product_info=request.product.dict(),
             answers=request.answers
         )
@@ -94,6 +453,264 @@ async def calculate_transparency_score(
             feedback=result["feedback"],
             areas_for_improvement=result["areas_for_improvement"]
         )
+    except PoolSaturatedError as e:
+        logger.warning(f"Rejected transparency scoring: {str(e)}")
+        raise saturated_exception(e)
     except Exception as e:
         logger.error(f"Error calculating transparency score: {str(e)}")
-        raise HTTPException(status_code=500, detail=f"Failed to calculate transparency score: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Failed to calculate transparency score: {str(e)}")
+
+@transparency_router.post(
+    "/calculate-transparency-scores",
+    summary="Calculate transparency scores for many products",
+    response_description="Newline-delimited JSON with one result per item, in input order"
+)
+async def calculate_transparency_scores(
+    request: BatchTransparencyScoreRequest,
+    transparency_scorer: TransparencyScorer = Depends(get_transparency_scorer)
+):
+    logger.info(f"Calculating transparency scores for {len(request.items)} products")
+    items = [(item.product.dict(), item.answers) for item in request.items]
+
+    def score_chunks():
+        # Score in vectorized chunks so the first results stream back early
+        for start in range(0, len(items), SCORING_CHUNK_SIZE):
+            yield transparency_scorer.calculate_scores(items[start:start + SCORING_CHUNK_SIZE])
+
+    try:
+        chunks = scoring_pool.stream(score_chunks)
+    except PoolSaturatedError as e:
+        logger.warning(f"Rejected bulk transparency scoring: {str(e)}")
+        raise saturated_exception(e)
+
+    async def results():
+        index = 0
+        try:
+            async for chunk in chunks:
+                for result in chunk:
+                    yield format_stream_event({
+                        "index": index,
+                        "score": result["score"],
+                        "feedback": result["feedback"],
+                        "areas_for_improvement": result["areas_for_improvement"]
+                    }, sse=False)
+                    index += 1
+        except Exception as e:
+            logger.error(f"Error calculating transparency scores: {str(e)}")
+            yield format_stream_event({"error": f"Failed to calculate transparency scores: {str(e)}"}, sse=False)
+            return
+        finally:
+            await chunks.aclose()
+        yield format_stream_event({"done": True, "count": index}, sse=False)
+
+    return StreamingResponse(results(), media_type="application/x-ndjson")
+
+def incremental_response(product_id: str, result: Dict[str, Any]) -> IncrementalScoreResponse:
+    return IncrementalScoreResponse(
+        product_id=product_id,
+        score=result["score"],
+        feedback=result["feedback"],
+        areas_for_improvement=result["areas_for_improvement"],
+        answer_count=result["answer_count"],
+        verified=result["verified"]
+    )
+
+@transparency_router.put(
+    "/products/{product_id}/transparency-score",
+    response_model=IncrementalScoreResponse,
+    summary="Register a product's answers for incremental scoring and score them"
+)
+async def register_incremental_score(
+    product_id: str,
+    request: TransparencyScoreRequest,
+    verify: bool = Query(default=False, description="Check the result against a full recompute"),
+    transparency_scorer: TransparencyScorer = Depends(get_transparency_scorer)
+):
+    try:
+        logger.info(f"Registering product {product_id} for incremental scoring: {request.product.name}")
+        result = await scoring_pool.run(
+            incremental_scorer.register,
+            transparency_scorer,
+            product_id,
+            product_info=request.product.dict(),
+            answers=request.answers,
+            verify=verify
+        )
+        return incremental_response(product_id, result)
+    except PoolSaturatedError as e:
+        logger.warning(f"Rejected incremental scoring: {str(e)}")
+        raise saturated_exception(e)
+    except Exception as e:
+        logger.error(f"Error calculating transparency score: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Failed to calculate transparency score: {str(e)}")
+
+@transparency_router.patch(
+    "/products/{product_id}/transparency-score",
+    response_model=IncrementalScoreResponse,
+    summary="Apply added, changed and removed answers and return the updated score",
+    responses={404: {"description": "No scoring state for the product; register it again with PUT"}}
+)
+async def update_incremental_score(
+    product_id: str,
+    request: TransparencyScoreDelta,
+    verify: bool = Query(default=False, description="Check the result against a full recompute"),
+    transparency_scorer: TransparencyScorer = Depends(get_transparency_scorer)
+):
+    try:
+        result = await scoring_pool.run(
+            incremental_scorer.update,
+            transparency_scorer,
+            product_id,
+            product_info=request.product.dict() if request.product is not None else None,
+            answers=request.answers,
+            removed=request.removed,
+            verify=verify
+        )
+        return incremental_response(product_id, result)
+    except UnknownProductError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except PoolSaturatedError as e:
+        logger.warning(f"Rejected incremental scoring: {str(e)}")
+        raise saturated_exception(e)
+    except Exception as e:
+        logger.error(f"Error updating transparency score: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Failed to update transparency score: {str(e)}")
+
+@transparency_router.delete(
+    "/products/{product_id}/transparency-score",
+    status_code=204,
+    summary="Drop a product's incremental scoring state"
+)
+async def drop_incremental_score(product_id: str):
+    if not incremental_scorer.drop(product_id):
+        raise HTTPException(status_code=404, detail=f"No scoring state for product '{product_id}'")
+    return Response(status_code=204)
+
+# Seconds a job worker waits before retrying admission to a busy generation pool, doubling up to the maximum
+JOB_ADMISSION_MIN_DELAY = 0.05
+JOB_ADMISSION_MAX_DELAY = 1.0
+
+def generate_job_item(product_info: Dict[str, Any], options: Dict[str, Any],
+                      cancel_token: CancellationToken) -> Dict[str, Any]:
+    # Job worker handler for one product: the cache, index and generation path of
+    # /generate-questions, in the requested tier (jobs have no latency target, so no fast fallback)
+    question_generator = model_registry.get_question_generator()
+    mode = options.get("mode") or question_generator.default_mode
+    if mode not in question_generator.modes:
+        raise ValueError(f"Generation mode '{mode}' is not enabled")
+    num_questions = options["num_questions"]
+    cache_key = question_cache.make_key(
+        product_info, question_generator.prompt_fields, num_questions, question_generator.modes[mode].model_id
+    )
+    questions = None if options.get("refresh") else question_cache.get(cache_key)
+    if questions is None:
+        # Generation goes through the generation pool like request traffic, so job workers never add
+        # model calls beyond GENERATION_MAX_CONCURRENCY; while the pool is busy, wait and try again
+        delay = JOB_ADMISSION_MIN_DELAY
+        while True:
+            cancel_token.raise_if_cancelled()
+            try:
+                questions, _, complete = generation_pool.try_run(
+                    generate_or_reuse, question_generator, product_info, num_questions, mode,
+                    options.get("refresh", False), cancel_token
+                )
+                break
+            except PoolSaturatedError:
+                time.sleep(delay)
+                delay = min(delay * 2, JOB_ADMISSION_MAX_DELAY)
+        if complete:
+            question_cache.set(cache_key, questions)
+    return {"questions": questions, "mode": mode}
+
+# Job endpoints are plain functions: FastAPI runs them on its threadpool, off the event loop,
+# while they wait on the job store
+
+@job_router.post(
+    "/jobs/generate-questions",
+    response_model=JobResponse,
+    status_code=202,
+    summary="Queue question generation for one or more products and return the job immediately"
+)
+def submit_question_job(request: GenerateQuestionsJobRequest, http_request: Request, response: Response):
+    modes = model_registry.generation_mode_stats()
+    if request.mode is not None and modes is not None and request.mode not in modes["modes"]:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Generation mode '{request.mode}' is not enabled; available: {', '.join(modes['modes'])}"
+        )
+    try:
+        job = job_queue.submit(
+            [product.dict() for product in request.products],
+            {"num_questions": request.num_questions, "mode": request.mode, "refresh": request.refresh},
+            priority=request.priority,
+            result_ttl=request.result_ttl
+        )
+    except JobQueueFullError as e:
+        logger.warning(f"Rejected question generation job: {str(e)}")
+        raise HTTPException(
+            status_code=503,
+            detail=f"Job queue is full, retry after {e.retry_after} seconds",
+            headers={"Retry-After": str(e.retry_after)}
+        )
+    logger.info(f"Queued question generation job {job['job_id']} for {len(request.products)} products "
+                f"({request.priority} priority)")
+    response.headers["Location"] = str(http_request.url_for("get_question_job", job_id=job["job_id"]))
+    return JobResponse(**job)
+
+@job_router.get(
+    "/jobs/{job_id}",
+    response_model=JobResponse,
+    summary="Status of a question generation job and the results of its finished products",
+    responses={404: {"description": "Unknown job, or its results expired"}}
+)
+def get_question_job(
+    job_id: str,
+    results: bool = Query(default=True, description="Include the results of finished products")
+):
+    job = job_queue.get(job_id, include_results=results)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"No job '{job_id}'; it may have expired")
+    return JobResponse(**job)
+
+@job_router.delete(
+    "/jobs/{job_id}",
+    status_code=204,
+    summary="Cancel a question generation job and delete its results"
+)
+def delete_question_job(job_id: str):
+    if not job_queue.delete(job_id):
+        raise HTTPException(status_code=404, detail=f"No job '{job_id}'")
+    return Response(status_code=204)
+
+# Profiling admin endpoints, only mounted when PROFILING_ENABLED is set
+
+@profile_router.get(
+    "/profiles",
+    response_model=List[ProfileResponse],
+    summary="Most recent request profiles, newest first"
+)
+def list_profiles(limit: int = Query(default=50, ge=1, le=1000)):
+    return [ProfileResponse(**profile) for profile in request_profiler.list(limit)]
+
+@profile_router.get(
+    "/profiles/{profile_id}",
+    response_model=ProfileResponse,
+    summary="Metadata and file names of a request profile"
+)
+def get_profile(profile_id: str):
+    profile = request_profiler.get(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail=f"No profile '{profile_id}'")
+    return ProfileResponse(**profile)
+
+@profile_router.get(
+    "/profiles/{profile_id}/{file_name}",
+    summary="Download a profile file: .pstats, .python.folded, .torch.folded or .torch.txt",
+    response_class=FileResponse
+)
+def get_profile_file(profile_id: str, file_name: str):
+    path = request_profiler.file_path(profile_id, file_name)
+    if path is None:
+        raise HTTPException(status_code=404, detail=f"Profile '{profile_id}' has no file '{file_name}'")
+    media_type = "application/octet-stream" if file_name.endswith(".pstats") else "text/plain"
+    return FileResponse(path, media_type=media_type, filename=file_name)
@@ -0,0 +1,234 @@
+import logging
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from contextlib import nullcontext
+from typing import Dict, List, Any, Optional, Tuple
+
+from app.utils.cancellation import CancellationToken, GenerationCancelled
+from app.utils.profiling import active_profile
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+
+class _PendingPrompt:
+    """A tokenized prompt waiting to be sampled"""
+
+    __slots__ = ("input_ids", "num_sequences", "cancel_token", "mode", "profile", "future", "enqueued_at")
+
+    def __init__(self, input_ids: List[int], num_sequences: int, cancel_token: Optional[CancellationToken],
+                 mode: Optional[str]):
+        self.input_ids = input_ids
+        self.num_sequences = num_sequences
+        self.cancel_token = cancel_token
+        self.mode = mode
+        # Profile session of the submitting request, if it is profiled
+        self.profile = active_profile.get()
+        self.future: Future = Future()
+        self.enqueued_at = time.perf_counter()
+
+
+class BatchScheduler:
+    """Dynamic micro-batching scheduler for question generation
+
+    Prompts submitted from concurrent requests are queued, grouped into
+    length buckets per generation mode and sampled with one ``generate`` call
+    per bucket. Each caller receives its own decoded candidates through a future.
+    """
+
+    def __init__(self, generator, max_batch_size: int = 32, max_wait_ms: float = 10.0,
+                 bucket_width: int = 32, stats_window: int = 1000):
+        """Initialize the scheduler
+
+        Args:
+            generator: QuestionGenerator used to run batched sampling
+            max_batch_size: Maximum number of sequences sampled per batch
+            max_wait_ms: Longest time the first queued prompt waits for others
+            bucket_width: Prompt length range (in tokens) batched together
+            stats_window: Number of recent queue waits kept for percentiles
+        """
+        self.generator = generator
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000
+        self.bucket_width = max(1, bucket_width)
+
+        self._queue: "queue.Queue[Optional[_PendingPrompt]]" = queue.Queue()
+        self._carry: Optional[_PendingPrompt] = None
+        self._thread: Optional[threading.Thread] = None
+
+        # Statistics, only written by the worker thread
+        self._batches = 0
+        self._prompts = 0
+        self._sequences = 0
+        self._max_batch_sequences = 0
+        self._cancelled = 0
+        self._queue_waits: deque = deque(maxlen=stats_window)
+
+    def start(self) -> None:
+        """Start the background worker thread"""
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name="question-batch-scheduler", daemon=True)
+        self._thread.start()
+        logger.info(
+            f"Batch scheduler started (max_batch_size={self.max_batch_size}, "
+            f"max_wait_ms={self.max_wait * 1000:.0f}, bucket_width={self.bucket_width})"
+        )
+
+    def stop(self) -> None:
+        """Stop the worker thread after the queued prompts are processed"""
+        if self._thread is None:
+            return
+        self._queue.put(None)
+        self._thread.join()
+        self._thread = None
+
+    def submit(self, input_ids: List[int], num_sequences: int,
+               cancel_token: Optional[CancellationToken] = None, mode: Optional[str] = None) -> Future:
+        """Queue a tokenized prompt for sampling
+
+        Args:
+            input_ids: Token IDs of the prompt
+            num_sequences: Number of candidates to sample for the prompt
+            cancel_token: Optional token; a cancelled prompt is dropped from its batch
+            mode: Generation mode (latency tier); only prompts of the same mode share a batch
+
+        Returns:
+            Future resolving to the list of decoded candidates, or raising
+            GenerationCancelled if the token was cancelled
+        """
+        pending = _PendingPrompt(input_ids, num_sequences, cancel_token, mode)
+        self._queue.put(pending)
+        return pending.future
+
+    def _collect(self) -> Optional[List[_PendingPrompt]]:
+        """Block until a batch is ready, or return None when stopping"""
+        if self._carry is not None:
+            first, self._carry = self._carry, None
+        else:
+            first = self._queue.get()
+            if first is None:
+                return None
+
+        batch = [first]
+        sequences = first.num_sequences
+        deadline = time.perf_counter() + self.max_wait
+        while sequences < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                pending = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if pending is None:
+                # Process what we have, then stop on the next collect
+                self._queue.put(None)
+                break
+            if sequences + pending.num_sequences > self.max_batch_size:
+                self._carry = pending
+                break
+            batch.append(pending)
+            sequences += pending.num_sequences
+        return batch
+
+    def _bucket(self, batch: List[_PendingPrompt]) -> List[List[_PendingPrompt]]:
+        """Split a batch into groups of the same mode and similar prompt length"""
+        buckets: Dict[Tuple[str, int], List[_PendingPrompt]] = {}
+        for pending in batch:
+            key = (pending.mode or "", len(pending.input_ids) // self.bucket_width)
+            buckets.setdefault(key, []).append(pending)
+        return [buckets[key] for key in sorted(buckets)]
+
+    def _run_bucket(self, bucket: List[_PendingPrompt]) -> None:
+        """Sample every prompt in a bucket with a single generate call"""
+        started = time.perf_counter()
+        for pending in bucket:
+            self._queue_waits.append(started - pending.enqueued_at)
+
+        # Prompts whose request was cancelled while queued are not sampled at all
+        active = []
+        for pending in bucket:
+            if self._cancel_if_needed(pending):
+                self._cancelled += 1
+            else:
+                active.append(pending)
+        if not active:
+            return
+        bucket = active
+
+        # A shared batch is profiled for the first profiled request in it
+        profile = next((pending.profile for pending in bucket if pending.profile is not None), None)
+        try:
+            with nullcontext() if profile is None else profile.activate():
+                results = self.generator.sample_batch(
+                    [pending.input_ids for pending in bucket],
+                    [pending.num_sequences for pending in bucket],
+                    [pending.cancel_token for pending in bucket],
+                    bucket[0].mode
+                )
+        except Exception as e:
+            logger.error(f"Batched generation failed: {str(e)}")
+            for pending in bucket:
+                pending.future.set_exception(e)
+            return
+
+        for pending, questions in zip(bucket, results):
+            if not self._cancel_if_needed(pending):
+                pending.future.set_result(questions)
+
+        num_sequences = sum(pending.num_sequences for pending in bucket)
+        self._batches += 1
+        self._prompts += len(bucket)
+        self._sequences += num_sequences
+        self._max_batch_sequences = max(self._max_batch_sequences, num_sequences)
+
+    @staticmethod
+    def _cancel_if_needed(pending: _PendingPrompt) -> bool:
+        """Fail the prompt's future if its request was cancelled"""
+        token = pending.cancel_token
+        if token is not None and token.cancelled:
+            pending.future.set_exception(GenerationCancelled(token.reason))
+            return True
+        return False
+
+    def _run(self) -> None:
+        """Worker loop"""
+        while True:
+            batch = self._collect()
+            if batch is None:
+                break
+            for bucket in self._bucket(batch):
+                self._run_bucket(bucket)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return batch-size and queue-wait statistics"""
+        waits = sorted(self._queue_waits)
+        batches = max(1, self._batches)
+
+        def percentile(fraction: float) -> float:
+            if not waits:
+                return 0.0
+            return round(waits[min(len(waits) - 1, int(fraction * len(waits)))] * 1000, 2)
+
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000,
+            "bucket_width": self.bucket_width,
+            "queue_depth": self._queue.qsize(),
+            "batches": self._batches,
+            "prompts": self._prompts,
+            "sequences": self._sequences,
+            "mean_prompts_per_batch": round(self._prompts / batches, 2),
+            "mean_sequences_per_batch": round(self._sequences / batches, 2),
+            "max_sequences_per_batch": self._max_batch_sequences,
+            "cancelled_prompts": self._cancelled,
+            "queue_wait_ms": {
+                "p50": percentile(0.5),
+                "p95": percentile(0.95),
+                "max": percentile(1.0),
+            },
+        }
@@ -0,0 +1,354 @@
+import os
+import time
+import random
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, Iterable, Optional, Tuple
+from dotenv import load_dotenv
+
+from app.models.transparency_scorer import TransparencyScorer, AnswerFeatures
+from app.utils.metrics import incremental_scoring_updates, incremental_scoring_verifications
+
+# Load environment variables
+load_dotenv()
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+
+class UnknownProductError(KeyError):
+    """Raised when a delta arrives for a product without scoring state"""
+
+    def __init__(self, product_id: str):
+        super().__init__(product_id)
+        self.product_id = product_id
+
+    def __str__(self) -> str:
+        return f"No scoring state for product '{self.product_id}'; send the full product and answers"
+
+
+class ProductScoreState:
+    """Scoring state of one product: its answers, their features and running totals
+
+    Every total is updated in O(1) per answer: adding an answer adds its
+    contribution and changing or removing one subtracts the old one. The
+    quality total is a float, and calculate_score sums it left to right in
+    answer order. Appends keep the running total equal to that sum; after a
+    change or removal it can differ in the last bits, within quality_error.
+    Changed answers keep their position, as they do in a dict.
+    """
+
+    __slots__ = ("product_info", "answers", "features", "quality_sum", "inexact_updates", "verifiable_answers",
+                 "length_sum", "topic_coverage", "expires_at")
+
+    def __init__(self, product_info: Dict[str, Any]):
+        self.product_info = product_info
+        self.answers: Dict[str, str] = {}
+        self.features: Dict[str, AnswerFeatures] = {}
+        self.quality_sum = 0.0
+        # Changes and removals since quality_sum last equalled the left-to-right sum
+        self.inexact_updates = 0
+        self.verifiable_answers = 0
+        self.length_sum = 0
+        # Number of good answers (quality 0.5 or more) mentioning each topic area
+        self.topic_coverage: Dict[str, int] = {}
+        self.expires_at = 0.0
+
+    def _count(self, features: AnswerFeatures, sign: int) -> None:
+        """Add (sign 1) or subtract (sign -1) an answer's contribution to the totals"""
+        self.quality_sum += sign * features.quality
+        self.verifiable_answers += sign * features.verifiable
+        self.length_sum += sign * features.length
+        if features.quality >= 0.5:
+            for area in features.topics:
+                remaining = self.topic_coverage.get(area, 0) + sign
+                if remaining:
+                    self.topic_coverage[area] = remaining
+                else:
+                    del self.topic_coverage[area]
+
+    def add(self, question: str, answer: str, features: AnswerFeatures) -> None:
+        """Add an answer, replacing an earlier answer to the same question in place"""
+        previous = self.features.get(question)
+        if previous is not None:
+            self._count(previous, -1)
+            self.inexact_updates += 1
+        elif self.inexact_updates:
+            self.inexact_updates += 1
+        self.answers[question] = answer
+        self.features[question] = features
+        self._count(features, 1)
+
+    def remove(self, question: str) -> bool:
+        """Remove the answer to a question; returns False if there was none"""
+        features = self.features.pop(question, None)
+        if features is None:
+            return False
+        del self.answers[question]
+        self._count(features, -1)
+        if self.features:
+            self.inexact_updates += 1
+        else:
+            self.quality_sum = 0.0
+            self.inexact_updates = 0
+        return True
+
+    def quality_error(self) -> float:
+        """Bound on how far quality_sum may be from calculate_score's left-to-right sum
+
+        Qualities are at most 1, so every partial sum is at most the answer
+        count, and each update and each term of the reference sum adds at most
+        a couple of roundings of that size.
+        """
+        if not self.inexact_updates:
+            return 0.0
+        count = max(1, len(self.features))
+        return (self.inexact_updates + count) * count * 2.0 ** -50
+
+    def resum(self) -> None:
+        """Recompute the quality total left to right in answer order, as calculate_score does"""
+        self.quality_sum = sum(features.quality for features in self.features.values())
+        self.inexact_updates = 0
+
+
+class IncrementalScorer:
+    """Bounded per-product scoring state for O(delta) re-scoring
+
+    Clients register a product with its answers once, then send only added,
+    changed and removed answers. Features are extracted for the changed
+    answers only and folded into running totals, from which the score is
+    derived exactly as TransparencyScorer.calculate_score derives it.
+    States live in an LRU with an idle TTL; an evicted product is simply
+    registered again. A sampled (or requested) full recompute checks the
+    incremental result and resynchronizes the state on a mismatch.
+    """
+
+    def __init__(self, max_products: int = 10000, ttl_seconds: float = 3600, verify_rate: float = 0.0):
+        """Initialize the store
+
+        Args:
+            max_products: Maximum number of products with state kept in memory
+            ttl_seconds: Seconds a state is kept after its last update
+            verify_rate: Fraction of updates checked against a full recompute
+        """
+        self.max_products = max(1, max_products)
+        self.ttl_seconds = ttl_seconds
+        self.verify_rate = verify_rate
+
+        self._lock = threading.Lock()
+        self._states: "OrderedDict[str, ProductScoreState]" = OrderedDict()
+
+        # Counters
+        self._registrations = 0
+        self._updates = 0
+        self._answers_applied = 0
+        self._unknown = 0
+        self._evictions = 0
+        self._expirations = 0
+        self._resums = 0
+        self._verifications = 0
+        self._mismatches = 0
+
+    def _get(self, product_id: str, now: float) -> Optional[ProductScoreState]:
+        """Return the live state of a product, dropping it if expired"""
+        state = self._states.get(product_id)
+        if state is not None and state.expires_at <= now:
+            del self._states[product_id]
+            self._expirations += 1
+            state = None
+        return state
+
+    def _store(self, product_id: str, state: ProductScoreState, now: float) -> None:
+        """Insert or refresh a state, evicting the least recently updated products"""
+        state.expires_at = now + self.ttl_seconds
+        self._states[product_id] = state
+        self._states.move_to_end(product_id)
+        while len(self._states) > self.max_products:
+            self._states.popitem(last=False)
+            self._evictions += 1
+
+    @staticmethod
+    def _score(scorer: TransparencyScorer, state: ProductScoreState, quality_sum: float) -> Dict[str, Any]:
+        """Score a state from its running totals with the given quality total"""
+        criteria_scores, final_score = scorer._criteria_from_totals(
+            state.product_info,
+            num_answers=len(state.features),
+            quality_sum=quality_sum,
+            verifiable_answers=state.verifiable_answers,
+            length_sum=state.length_sum
+        )
+        improvement_areas = scorer._improvement_areas_for(state.product_info, set(state.topic_coverage))
+        feedback = scorer._generate_feedback(final_score, improvement_areas)
+        return scorer._format_result(final_score, feedback, improvement_areas, criteria_scores)
+
+    def _result(self, scorer: TransparencyScorer, state: ProductScoreState) -> Dict[str, Any]:
+        """Score a state from its running totals; called with the lock held
+
+        Scores only grow with the quality total and are rounded, so when both
+        ends of the total's error bound give the same result, the left-to-right
+        sum gives it too. Only a total that close to a rounding boundary is
+        summed again in answer order.
+        """
+        result = self._score(scorer, state, state.quality_sum)
+        error = state.quality_error()
+        if error and (self._score(scorer, state, state.quality_sum - error)
+                      != self._score(scorer, state, state.quality_sum + error)):
+            state.resum()
+            self._resums += 1
+            result = self._score(scorer, state, state.quality_sum)
+        result["answer_count"] = len(state.features)
+        result["verified"] = None
+        return result
+
+    def _snapshot(self, state: ProductScoreState, verify: bool) -> Optional[Tuple[Dict[str, Any], Dict[str, str]]]:
+        """Inputs to recompute a result from, if it is to be verified; called with the lock held
+
+        Capturing them together with the result keeps concurrent updates from skewing the check.
+        """
+        if verify or (self.verify_rate > 0 and random.random() < self.verify_rate):
+            return state.product_info, dict(state.answers)
+        return None
+
+    def register(self, scorer: TransparencyScorer, product_id: str, product_info: Dict[str, Any],
+                 answers: Dict[str, str], verify: bool = False) -> Dict[str, Any]:
+        """Create or replace the state of a product from its full answers
+
+        Args:
+            scorer: Scorer used for feature extraction and scoring
+            product_id: Client-chosen product identifier
+            product_info: Dictionary containing product information
+            answers: Dictionary of question-answer pairs
+            verify: Check the result against a full recompute
+
+        Returns:
+            Result as returned by calculate_score, plus answer_count and verified
+            (None when not checked, otherwise whether the full recompute agreed)
+        """
+        state = ProductScoreState(product_info)
+        for question, answer in answers.items():
+            state.add(question, answer, scorer._extract_answer_features(question, answer))
+        with self._lock:
+            self._store(product_id, state, time.time())
+            self._registrations += 1
+            result = self._result(scorer, state)
+            snapshot = self._snapshot(state, verify)
+        return self._verify(scorer, product_id, result, snapshot)
+
+    def update(self, scorer: TransparencyScorer, product_id: str, product_info: Optional[Dict[str, Any]] = None,
+               answers: Optional[Dict[str, str]] = None, removed: Iterable[str] = (),
+               verify: bool = False) -> Dict[str, Any]:
+        """Apply added, changed and removed answers to a product's state
+
+        Work is proportional to the size of the delta, not to the number of
+        answers the product has.
+
+        Args:
+            scorer: Scorer used for feature extraction and scoring
+            product_id: Identifier the product was registered under
+            product_info: New product information, if it changed
+            answers: Added or changed question-answer pairs
+            removed: Questions whose answers were removed
+            verify: Check the result against a full recompute
+
+        Returns:
+            Result as returned by calculate_score, plus answer_count and verified
+            (None when not checked, otherwise whether the full recompute agreed)
+
+        Raises:
+            UnknownProductError: If the product has no state (never registered, evicted or expired)
+        """
+        answers = answers or {}
+        removed = list(removed)
+        # Feature extraction is the expensive part, so it happens outside the lock
+        features = {question: scorer._extract_answer_features(question, answer) for question, answer in answers.items()}
+        with self._lock:
+            state = self._get(product_id, time.time())
+            if state is None:
+                self._unknown += 1
+                raise UnknownProductError(product_id)
+            if product_info is not None:
+                state.product_info = product_info
+            for question in removed:
+                state.remove(question)
+            for question, answer in answers.items():
+                state.add(question, answer, features[question])
+            self._store(product_id, state, time.time())
+            self._updates += 1
+            self._answers_applied += len(answers) + len(removed)
+            result = self._result(scorer, state)
+            snapshot = self._snapshot(state, verify)
+        incremental_scoring_updates.inc()
+        return self._verify(scorer, product_id, result, snapshot)
+
+    def _verify(self, scorer: TransparencyScorer, product_id: str, result: Dict[str, Any],
+                snapshot: Optional[Tuple[Dict[str, Any], Dict[str, str]]]) -> Dict[str, Any]:
+        """Check a result against a full recompute of the inputs it was derived from"""
+        if snapshot is None:
+            return result
+        product_info, answers = snapshot
+        expected = scorer.calculate_score(product_info, answers)
+        result["verified"] = all(result[key] == value for key, value in expected.items())
+        with self._lock:
+            self._verifications += 1
+            self._mismatches += not result["verified"]
+        incremental_scoring_verifications.labels("match" if result["verified"] else "mismatch").inc()
+        if result["verified"]:
+            return result
+
+        logger.warning(f"Incremental score for product '{product_id}' diverged from a full recompute "
+                       f"({result['score']} vs {expected['score']}); resynchronizing")
+        self._resync(scorer, product_id)
+        return dict(expected, answer_count=len(answers), verified=False)
+
+    def _resync(self, scorer: TransparencyScorer, product_id: str) -> None:
+        """Rebuild a product's state from its raw answers, re-extracting every answer's features"""
+        with self._lock:
+            state = self._states.get(product_id)
+            if state is None:
+                return
+            product_info, answers = state.product_info, dict(state.answers)
+        rebuilt = ProductScoreState(product_info)
+        for question, answer in answers.items():
+            rebuilt.add(question, answer, scorer._extract_answer_features(question, answer))
+        with self._lock:
+            # An update that landed meanwhile carries its own changes; leave that state alone
+            if (self._states.get(product_id) is state and state.product_info is product_info
+                    and state.answers == answers):
+                self._store(product_id, rebuilt, time.time())
+
+    def drop(self, product_id: str) -> bool:
+        """Forget a product's state; returns False if it had none"""
+        with self._lock:
+            return self._states.pop(product_id, None) is not None
+
+    def clear(self) -> None:
+        """Forget every product's state"""
+        with self._lock:
+            self._states.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Return state counts and update counters"""
+        return {
+            "products": len(self._states),
+            "max_products": self.max_products,
+            "ttl_seconds": self.ttl_seconds,
+            "verify_rate": self.verify_rate,
+            "registrations": self._registrations,
+            "updates": self._updates,
+            "answers_applied": self._answers_applied,
+            "unknown_products": self._unknown,
+            "evictions": self._evictions,
+            "expirations": self._expirations,
+            "quality_resums": self._resums,
+            "verifications": self._verifications,
+            "mismatches": self._mismatches,
+        }
+
+
+# Shared state for the incremental scoring endpoints
+incremental_scorer = IncrementalScorer(
+    max_products=int(os.getenv("INCREMENTAL_SCORING_MAX_PRODUCTS", 10000)),
+    ttl_seconds=float(os.getenv("INCREMENTAL_SCORING_TTL", 3600)),
+    verify_rate=float(os.getenv("INCREMENTAL_SCORING_VERIFY_RATE", 0.0))
+)
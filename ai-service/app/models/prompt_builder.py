@@ -0,0 +1,349 @@
+import os
+import re
+import json
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional, Tuple
+from dotenv import load_dotenv
+
+from app.utils.metrics import prompt_tokens, prompt_truncations
+
+# Load environment variables
+load_dotenv()
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Instruction preamble shared by every prompt
+PREAMBLE = (
+    "You are an AI assistant that helps improve product transparency.\n"
+    "Based on the *specific details of the product below*, generate a unique and insightful follow-up question "
+    "that has not been asked before.\n"
+    "The question must be directly related to this product’s characteristics like description , "
+    "product name and category.\n"
+    "It should encourage deeper understanding, trust, or accountability.\n\n"
+)
+SUFFIX = "Question:"
+
+# Product fields in prompt order, with their labels
+FIELD_LABELS = {
+    "name": "Product Name",
+    "description": "Description",
+    "category": "Category",
+    "ingredients": "Ingredients",
+    "manufacturing_process": "Manufacturing Process",
+    "country_of_origin": "Country of Origin",
+    "certifications": "Certifications",
+}
+PROMPT_FIELDS = tuple(FIELD_LABELS)
+# When the fields don't all fit max_tokens, short identifying fields get their tokens first
+ALLOCATION_ORDER = ("name", "category", "country_of_origin", "certifications", "ingredients",
+                    "manufacturing_process", "description")
+
+# Tokens each field may take; fields are filled in prompt order until max_tokens is reached
+DEFAULT_BUDGETS = {
+    "name": 32,
+    "description": 160,
+    "category": 16,
+    "ingredients": 64,
+    "manufacturing_process": 64,
+    "country_of_origin": 16,
+    "certifications": 32,
+}
+
+# Free-text fields summarised by whole sentences when over budget; other fields are cut at the budget
+EXTRACTIVE_FIELDS = frozenset(["description", "ingredients", "manufacturing_process"])
+
+# Only this much of a field is considered for its summary
+MAX_SUMMARY_CHARS = 50000
+MAX_SUMMARY_SENTENCES = 1000
+# Sentences tokenized per summary at most; ranking is cheap, tokenizing is not
+MAX_SUMMARY_CANDIDATES = 64
+# A field longer than this many characters per budget token is over budget without tokenizing it
+MAX_CHARS_PER_TOKEN = 8
+# A summary stops looking for sentences once fewer tokens than this are left
+MIN_SENTENCE_TOKENS = 8
+# Rebuilds of a prompt whose whole-string tokenization overshoots max_tokens
+MAX_BUILD_ATTEMPTS = 3
+
+SENTENCE_BOUNDARY = re.compile(r"(?<=[.!?;])\s+|\n+")
+WORD = re.compile(r"[a-z0-9]{3,}")
+STOPWORDS = frozenset(
+    "and the for with are from that this our your you its has have was were will can all any not but "
+    "into only each per also more most very just than then them they their there these those which".split()
+)
+# Stems of details transparency questions are asked about: origin, process, testing and claims
+SALIENT_STEMS = (
+    "source", "origin", "grown", "farm", "harvest", "made", "manufactur", "produc", "process", "factory",
+    "ingredient", "certif", "organic", "test", "lab", "audit", "recycl", "sustainab", "fair", "ethic",
+    "packag", "supplier", "traceab", "import",
+)
+
+
+def parse_budgets(value: str) -> Dict[str, int]:
+    """Parse QUESTION_PROMPT_BUDGETS, e.g. "description=256,ingredients=32"
+
+    Raises:
+        ValueError: If an entry is not field=tokens for a prompt field with a non-negative budget
+    """
+    budgets = {}
+    for entry in filter(None, (part.strip() for part in value.split(","))):
+        field, _, tokens = entry.partition("=")
+        field = field.strip()
+        if field not in FIELD_LABELS or not tokens.strip().isdigit():
+            raise ValueError(f"Invalid QUESTION_PROMPT_BUDGETS entry '{entry}', expected field=tokens "
+                             f"with field one of {', '.join(PROMPT_FIELDS)}")
+        budgets[field] = int(tokens)
+    return budgets
+
+
+def split_sentences(text: str) -> List[str]:
+    """Sentences of a free-text field, whitespace-normalized, without repeats"""
+    sentences = []
+    seen = set()
+    for sentence in SENTENCE_BOUNDARY.split(text[:MAX_SUMMARY_CHARS]):
+        sentence = " ".join(sentence.split())
+        key = sentence.lower()
+        if sentence and key not in seen:
+            seen.add(key)
+            sentences.append(sentence)
+        if len(sentences) >= MAX_SUMMARY_SENTENCES:
+            break
+    return sentences
+
+
+def rank_sentences(sentences: List[str]) -> List[int]:
+    """Sentence indices, most informative first
+
+    A sentence scores the mean frequency of its content words across the
+    field (sentences about what the text keeps coming back to rank high),
+    plus a bonus for mentioning origin, process, testing or certification
+    details and a smaller one for the lead sentence.
+    """
+    words = [[word for word in WORD.findall(sentence.lower()) if word not in STOPWORDS] for sentence in sentences]
+    frequency: Dict[str, int] = {}
+    for sentence_words in words:
+        for word in set(sentence_words):
+            frequency[word] = frequency.get(word, 0) + 1
+    peak = max(frequency.values(), default=1)
+
+    scores = []
+    for index, sentence_words in enumerate(words):
+        score = sum(frequency[word] for word in sentence_words) / (peak * len(sentence_words)) if sentence_words else 0.0
+        if any(stem in word for word in sentence_words for stem in SALIENT_STEMS):
+            score += 1.0
+        if index == 0:
+            score += 0.5
+        scores.append(score)
+    return sorted(range(len(sentences)), key=lambda index: (-scores[index], index))
+
+
+class PromptBuilder:
+    """Token-budgeted prompt construction with a tokenization cache
+
+    The instruction preamble, field labels and suffix are tokenized once for
+    budgeting, and each product field gets its own token budget, so a
+    multi-kilobyte description cannot grow the encoder input. Free-text
+    fields over budget are summarised extractively, keeping the
+    highest-ranked sentences that fit, in their original order; other fields,
+    and a single sentence longer than the whole budget, are cut at the budget.
+    Input IDs are cached per product, keyed by a hash of its prompt fields,
+    so retries and repeated requests skip tokenization entirely.
+    """
+
+    def __init__(self, tokenizer, budgets: Optional[Dict[str, int]] = None, max_tokens: int = 512,
+                 cache_size: int = 4096):
+        """Initialize the builder
+
+        Args:
+            tokenizer: Tokenizer of the model the prompts are for
+            budgets: Tokens per field, overriding DEFAULT_BUDGETS
+            max_tokens: Upper bound on the prompt length including the preamble and special tokens
+            cache_size: Number of products whose input IDs are kept
+        """
+        self.tokenizer = tokenizer
+        self.budgets = dict(DEFAULT_BUDGETS, **(budgets or {}))
+        self.max_tokens = max_tokens
+        self.cache_size = max(0, cache_size)
+
+        self._preamble_ids = self.encode(PREAMBLE)
+        self._suffix_ids = self.encode(SUFFIX)
+        eos_token_id = getattr(tokenizer, "eos_token_id", None)
+        self._eos_ids = [eos_token_id] if eos_token_id is not None else []
+        self._label_ids = {field: self.encode(f"{label}:") for field, label in FIELD_LABELS.items()}
+        self._newline_ids = self.encode("\n")
+        # Tokens left for field values once the constant parts are placed
+        self._field_tokens = max(0, max_tokens - len(self._preamble_ids) - len(self._suffix_ids) - len(self._eos_ids))
+
+        self._lock = threading.Lock()
+        self._cache: "OrderedDict[str, List[int]]" = OrderedDict()
+
+        # Counters
+        self._builds = 0
+        self._hits = 0
+        self._truncations: Dict[str, int] = {}
+
+    def encode(self, text: str) -> List[int]:
+        """Token IDs of a text fragment, without special tokens"""
+        return list(self.tokenizer.encode(text, add_special_tokens=False))
+
+    @staticmethod
+    def field_text(product_info: Dict[str, Any], field: str) -> str:
+        """Text of a field as it appears in the prompt; empty when the field is not set"""
+        value = product_info.get(field)
+        if field == "name" and not value:
+            return "product"
+        if isinstance(value, list):
+            value = ", ".join(str(item) for item in value if item)
+        return str(value) if value else ""
+
+    @staticmethod
+    def product_key(product_info: Dict[str, Any]) -> str:
+        """Cache key of a product: a hash of its prompt fields"""
+        values = json.dumps([product_info.get(field) for field in PROMPT_FIELDS], default=str, ensure_ascii=False)
+        return hashlib.sha1(values.encode("utf-8")).hexdigest()
+
+    def summarise(self, text: str, budget: int) -> Tuple[str, int]:
+        """The highest-ranked sentences that fit the budget, in their original order, and their token count
+
+        Sentences are tokenized in rank order until the budget is full, so the
+        cost depends on the budget rather than on the length of the text.
+        """
+        sentences = split_sentences(text)
+        if not sentences:
+            return "", 0
+        ranking = rank_sentences(sentences)
+        chosen: Dict[int, int] = {}
+        best_ids = None
+        remaining = budget
+        for index in ranking[:MAX_SUMMARY_CANDIDATES]:
+            ids = self.encode(sentences[index])
+            if best_ids is None:
+                best_ids = ids
+            if len(ids) <= remaining:
+                chosen[index] = len(ids)
+                remaining -= len(ids)
+                if remaining < MIN_SENTENCE_TOKENS:
+                    break
+        if not chosen:
+            # Not even one sentence fits: keep the start of the best one
+            return self.cut(best_ids, budget)
+        return " ".join(sentences[index] for index in sorted(chosen)), budget - remaining
+
+    def cut(self, ids: List[int], budget: int) -> Tuple[str, int]:
+        """Text of the first budget tokens of a value, and their token count"""
+        ids = ids[:budget]
+        return self.tokenizer.decode(ids, skip_special_tokens=True).strip(), len(ids)
+
+    def fit_field(self, field: str, text: str, budget: int) -> Tuple[str, int]:
+        """A field value shortened to at most budget tokens, and its token count"""
+        if budget <= 0:
+            return "", 0
+        ids = None
+        if len(text) <= budget * MAX_CHARS_PER_TOKEN:
+            ids = self.encode(text)
+            if len(ids) <= budget:
+                return text, len(ids)
+        with self._lock:
+            self._truncations[field] = self._truncations.get(field, 0) + 1
+        prompt_truncations.labels(field).inc()
+        if field in EXTRACTIVE_FIELDS:
+            return self.summarise(text, budget)
+        if ids is None:
+            ids = self.encode(text[:budget * MAX_CHARS_PER_TOKEN])
+        return self.cut(ids, budget)
+
+    def prompt(self, product_info: Dict[str, Any], field_tokens: Optional[int] = None) -> str:
+        """A product's prompt text with every field within its budget
+
+        Budgets are counted on the pre-tokenized constant parts and on each
+        field value tokenized alone. Fields are allotted tokens in
+        ALLOCATION_ORDER and written in prompt order.
+        """
+        values: Dict[str, str] = {}
+        available = self._field_tokens if field_tokens is None else field_tokens
+        for field in ALLOCATION_ORDER:
+            text = self.field_text(product_info, field)
+            if not text:
+                continue
+            overhead = len(self._label_ids[field]) + len(self._newline_ids)
+            value, tokens = self.fit_field(field, text, min(self.budgets[field], available - overhead))
+            if value:
+                values[field] = value
+                available -= overhead + tokens
+
+        prompt = PREAMBLE
+        for field in PROMPT_FIELDS:
+            if field in values:
+                prompt += f"{FIELD_LABELS[field]}: {values[field]}\n"
+        return prompt + SUFFIX
+
+    def build(self, product_info: Dict[str, Any]) -> List[int]:
+        """Input IDs of a product's prompt, without the cache
+
+        The assembled prompt is tokenized as a whole, exactly as the model
+        tokenizer would tokenize it, so a prompt within budget gets the same
+        IDs as the untruncated one. Tokens can merge across fragment
+        boundaries and a cut value can re-tokenize differently, so the
+        fragment counts are estimates: a prompt that still comes out over
+        max_tokens is rebuilt with the excess taken from the field allowance.
+        """
+        field_tokens = self._field_tokens
+        for _ in range(MAX_BUILD_ATTEMPTS):
+            ids = list(self.tokenizer.encode(self.prompt(product_info, field_tokens)))
+            excess = len(ids) - self.max_tokens
+            if excess <= 0:
+                return ids
+            field_tokens = max(0, field_tokens - excess)
+        # Still over: keep the end of the prompt (suffix and end of sequence) and cut before it
+        tail = len(self._suffix_ids) + len(self._eos_ids)
+        return ids[:self.max_tokens - tail] + ids[-tail:]
+
+    def input_ids(self, product_info: Dict[str, Any]) -> List[int]:
+        """Input IDs of a product's prompt, from the cache when the product was seen before"""
+        key = self.product_key(product_info)
+        with self._lock:
+            ids = self._cache.get(key)
+            if ids is not None:
+                self._cache.move_to_end(key)
+                self._hits += 1
+        if ids is None:
+            ids = self.build(product_info)
+            with self._lock:
+                self._builds += 1
+                if self.cache_size:
+                    self._cache[key] = ids
+                    while len(self._cache) > self.cache_size:
+                        self._cache.popitem(last=False)
+        prompt_tokens.observe(len(ids))
+        return list(ids)
+
+    def text(self, product_info: Dict[str, Any]) -> str:
+        """The prompt as the model sees it, for logging and inspection"""
+        return self.tokenizer.decode(self.input_ids(product_info), skip_special_tokens=True)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return budgets, cache use and truncation counts"""
+        lookups = self._builds + self._hits
+        return {
+            "max_tokens": self.max_tokens,
+            "budgets": dict(self.budgets),
+            "cached_prompts": len(self._cache),
+            "cache_size": self.cache_size,
+            "builds": self._builds,
+            "cache_hits": self._hits,
+            "hit_rate": round(self._hits / lookups, 3) if lookups else 0.0,
+            "truncations": dict(self._truncations),
+        }
+
+
+def configured_builder(tokenizer) -> PromptBuilder:
+    """PromptBuilder for a tokenizer with the QUESTION_PROMPT_* settings"""
+    return PromptBuilder(
+        tokenizer,
+        budgets=parse_budgets(os.getenv("QUESTION_PROMPT_BUDGETS", "")),
+        max_tokens=int(os.getenv("QUESTION_PROMPT_MAX_TOKENS", 512)),
+        cache_size=int(os.getenv("QUESTION_PROMPT_CACHE_SIZE", 4096))
+    )
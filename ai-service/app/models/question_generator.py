@@ -1,52 +1,517 @@
-from transformers import AutoTokenizer, AutoModelForSeq2SeqLM
+from transformers import AutoTokenizer, StoppingCriteria, StoppingCriteriaList
+from transformers.modeling_outputs import BaseModelOutput
 import torch
+import os
 import re
+import time
+import logging
+import threading
+from app.models.generation_backends import get_backend
+from app.models.prompt_builder import PROMPT_FIELDS, configured_builder
+from app.utils.metrics import (
+    generation_stage_duration,
+    generation_rounds,
+    generation_max_rounds,
+    generated_questions,
+    generated_tokens,
+    generation_tokens_per_second,
+    generation_early_stops,
+    generation_mode_duration,
+    generation_mode_fallbacks,
+    rejected_candidates,
+)
+from app.utils.profiling import profile_generate
+
+# Per-stage timers and counters exposed at /metrics
+TOKENIZE_SECONDS = generation_stage_duration.labels("tokenize")
+ENCODE_SECONDS = generation_stage_duration.labels("encode")
+GENERATE_SECONDS = generation_stage_duration.labels("generate")
+DECODE_SECONDS = generation_stage_duration.labels("decode")
+MODEL_QUESTIONS = generated_questions.labels("model")
+FALLBACK_FILLS = generated_questions.labels("fallback")
+EMPTY_REJECTS = rejected_candidates.labels("empty")
+DUPLICATE_REJECTS = rejected_candidates.labels("duplicate")
+NEAR_DUPLICATE_REJECTS = rejected_candidates.labels("near_duplicate")
+DEADLINE_STOPS = generation_early_stops.labels("deadline")
+LOW_YIELD_STOPS = generation_early_stops.labels("low_yield")
+
+logger = logging.getLogger(__name__)
+
+# Latency tiers a request can ask for
+FAST = "fast"
+BALANCED = "balanced"
+QUALITY = "quality"
+GENERATION_MODES = (FAST, BALANCED, QUALITY)
+
+# Decoding strategies: top-k/top-p sampling with top-up rounds, or diverse beam search
+# (greedy for a single sequence), which is deterministic and so gets a single round
+SAMPLE = "sample"
+BEAM = "beam"
+
+# Lowercase words and numbers; punctuation and spacing don't make a question new
+WORD_PATTERN = re.compile(r"[a-z0-9]+")
+
+# Generic questions used when sampling does not produce enough unique questions
+FALLBACK_QUESTIONS = [
+    "Can you provide more information about {name}?",
+    "Where are the materials used in {name} sourced from?",
+    "How is {name} manufactured?",
+    "Which third-party certifications does {name} hold?",
+    "How do you verify the quality and safety of {name}?",
+]
+# Aspects of a topic question ("What can you tell us about the packaging of {name}?"), enough
+# to fill the API's maximum of 20 questions even when the model produced none
+FALLBACK_TOPIC_QUESTION = "What can you tell us about the {topic} of {name}?"
+FALLBACK_TOPICS = [
+    "packaging", "ingredients", "raw materials", "suppliers", "working conditions", "wages",
+    "carbon footprint", "energy use", "water use", "waste", "recycling", "transport",
+    "storage", "shelf life", "allergens", "quality testing", "safety testing", "audits",
+    "certifications", "animal welfare", "chemical use", "disposal", "pricing", "recall history",
+]
+
+class CancelledStoppingCriteria(StoppingCriteria):
+    # Stops model.generate once every request sharing the call has been cancelled
+    def __init__(self, cancel_tokens: list):
+        self.cancel_tokens = cancel_tokens
+
+    def __call__(self, input_ids, scores, **kwargs) -> bool:
+        return all(token.cancelled for token in self.cancel_tokens)
+
+def question_tokens(question: str) -> frozenset:
+    # Normalized token set used for near-duplicate detection
+    return frozenset(WORD_PATTERN.findall(question.lower()))
+
+def token_set_similarity(a: frozenset, b: frozenset) -> float:
+    # Jaccard similarity of two token sets
+    if not a or not b:
+        return float(a == b)
+    return len(a & b) / len(a | b)
+
+class GenerationMode:
+    # A latency tier: the model that serves it and how that model decodes
+    def __init__(self, name: str, model_name: str, decoding: str, backend_name: str):
+        self.name = name
+        self.model_name = model_name
+        self.decoding = decoding
+        # Sampling keeps the plain model ID, so existing cache and index entries stay valid
+        self.model_id = f"{model_name}@{backend_name}" + ("" if decoding == SAMPLE else f"/{decoding}")
+
+def configured_modes(model_name: str, backend_name: str, modes=None) -> dict:
+    # Tiers to load, from modes or QUESTION_GENERATION_MODES. The fast tier runs
+    # QUESTION_FAST_MODEL (flan-t5-small) with sampling, balanced runs model_name
+    # with beam search and quality runs model_name with sampling. Diverse beam search
+    # decodes its groups one after another, so it only pays off on the base model.
+    if modes is None:
+        modes = os.getenv("QUESTION_GENERATION_MODES", ",".join(GENERATION_MODES)).split(",")
+    settings = {
+        FAST: (os.getenv("QUESTION_FAST_MODEL", "google/flan-t5-small"), SAMPLE),
+        BALANCED: (model_name, BEAM),
+        QUALITY: (model_name, SAMPLE),
+    }
+    result = {}
+    for name in (mode.strip().lower() for mode in modes):
+        if not name:
+            continue
+        if name not in settings:
+            raise ValueError(f"Unknown generation mode '{name}', expected one of {', '.join(GENERATION_MODES)}")
+        result[name] = GenerationMode(name, settings[name][0], settings[name][1], backend_name)
+    if not result:
+        raise ValueError("At least one generation mode must be configured")
+    return result
 
 class QuestionGenerator:
-    def __init__(self):
-        self.model_name = "google/flan-t5-base"
-        self.tokenizer = AutoTokenizer.from_pretrained(self.model_name)
-        self.model = AutoModelForSeq2SeqLM.from_pretrained(self.model_name)
+    def __init__(self, model_name: str = "google/flan-t5-base", backend: str = None, modes=None):
+        self.model_name = model_name
+        # Inference backend (eager, int8 or onnx), defaults to QUESTION_GENERATION_BACKEND
+        self.backend = get_backend(backend)
+        # Identifies model and backend, since backends can produce slightly different outputs
+        self.model_id = f"{self.model_name}@{self.backend.name}"
+        # Product fields that influence the prompt (and therefore cache keys)
+        self.prompt_fields = PROMPT_FIELDS
+        # Candidates sampled per missing question in one batched generate call
+        self.oversample_factor = max(1, int(os.getenv("QUESTION_OVERSAMPLE_FACTOR", 2)))
+        # Upper bound on sequences drawn per generate call
+        self.max_batch_sequences = max(1, int(os.getenv("QUESTION_MAX_BATCH_SEQUENCES", 64)))
+        # Initial batch plus top-up batches (one by default)
+        self.max_rounds = max(1, int(os.getenv("QUESTION_MAX_ROUNDS", 2)))
+        generation_max_rounds.set(self.max_rounds)
+        # Candidates at least this similar to an accepted question (token-set Jaccard) are rejected
+        self.similarity_threshold = float(os.getenv("QUESTION_SIMILARITY_THRESHOLD", 0.8))
+        # Stop sampling when a round yields fewer new questions than this share of its candidates
+        self.min_unique_yield = float(os.getenv("QUESTION_MIN_UNIQUE_YIELD", 0.1))
+        # Wall-clock budget per request in seconds (0 disables); the best-so-far set is returned
+        self.deadline_seconds = float(os.getenv("QUESTION_GENERATION_DEADLINE", 10))
+        # Limit intra-op threads so concurrent pools don't oversubscribe the cores
+        num_threads = int(os.getenv("TORCH_NUM_THREADS", 0))
+        if num_threads > 0:
+            torch.set_num_threads(num_threads)
+        # Sampling settings shared by single-prompt and batched generation
+        self.generation_kwargs = {
+            "max_new_tokens": 64,
+            "do_sample": True,
+            "top_k": 50,
+            "top_p": 0.95,
+            "temperature": 0.85,
+        }
+        # Diversity penalty between beam groups for beam-search tiers
+        self.diversity_penalty = float(os.getenv("QUESTION_DIVERSITY_PENALTY", 1.0))
+        # Optional BatchScheduler that merges prompts from concurrent requests
+        self.scheduler = None
+        configured = configured_modes(self.model_name, self.backend.name, modes)
+        default_mode = os.getenv("QUESTION_DEFAULT_MODE", QUALITY).lower()
+        if default_mode not in configured:
+            # E.g. a catalogue job that loads a single tier
+            logger.warning(f"Default generation mode '{default_mode}' is not configured, using '{next(iter(configured))}'")
+            default_mode = next(iter(configured))
+        self.init_modes(configured, default_mode, int(os.getenv("QUESTION_MODE_FALLBACK_DEPTH", 4)))
+        # Every configured model stays loaded; tiers on the same model share its weights
+        self.tokenizers = {}
+        self.models = {}
+        # Token-budgeted prompts per model, with the constant parts pre-tokenized
+        self.prompt_builders = {}
+        for mode in self.modes.values():
+            if mode.model_name not in self.models:
+                self.tokenizers[mode.model_name] = AutoTokenizer.from_pretrained(mode.model_name)
+                self.models[mode.model_name] = self.backend.load(mode.model_name)
+                self.prompt_builders[mode.model_name] = configured_builder(self.tokenizers[mode.model_name])
+        # The default tier's model, for callers that use a single model
+        self.tokenizer = self.tokenizers[self.modes[self.default_mode].model_name]
+        self.model = self.models[self.modes[self.default_mode].model_name]
 
-    def generate(self, product_info: dict, num_questions: int = 5) -> list:
-        name = product_info.get("name", "product")
-        description = product_info.get("description", "")
-        category = product_info.get("category", "")
-        base_prompt = (
-             f"You are an AI assistant that helps improve product transparency.\n"
-    f"Based on the *specific details of the product below*, generate a unique and insightful follow-up question that has not been asked before.\n"
-    f"The question must be directly related to this product’s characteristics like description , product name and category.\n"
-    f"It should encourage deeper understanding, trust, or accountability.\n\n"
-    f"Product Name: {name}\n"
-        )
-        if description:
-            base_prompt += f"Description: {description}\n"
-        if category:
-            base_prompt += f"Category: {category}\n"
-        base_prompt += "Question:"
-
-        questions = set()
-        tries = 0
-        max_tries = num_questions * 5  # More tries for more unique questions
-
-        while len(questions) < num_questions and tries < max_tries:
-            inputs = self.tokenizer(base_prompt, return_tensors="pt")
-            outputs = self.model.generate(
+    def init_modes(self, modes: dict, default_mode: str, fallback_depth: int) -> None:
+        # Latency tiers by name, plus the per-tier load that drives the fast-tier fallback.
+        # Requests for a slower tier are served by the fast tier once fallback_depth
+        # generations are already in flight on it (0 disables the fallback).
+        if default_mode not in modes:
+            raise ValueError(f"Default generation mode '{default_mode}' is not configured")
+        self.modes = modes
+        self.default_mode = default_mode
+        self.fallback_depth = max(0, fallback_depth)
+        self._mode_lock = threading.Lock()
+        self._in_flight = {name: 0 for name in modes}
+        self._mode_requests = {name: 0 for name in modes}
+        self._fallbacks = {name: 0 for name in modes}
+
+    def resolve_mode(self, requested: str = None) -> str:
+        # Tier that serves a request: the requested (or default) one, or the fast tier when
+        # the requested tier's queue is too deep. Raises KeyError for an unconfigured tier.
+        mode = self.modes[requested or self.default_mode].name
+        if mode == FAST or FAST not in self.modes or not self.fallback_depth:
+            return mode
+        with self._mode_lock:
+            if self._in_flight[mode] < self.fallback_depth:
+                return mode
+            self._fallbacks[mode] += 1
+        generation_mode_fallbacks.labels(mode).inc()
+        return FAST
+
+    def mode_stats(self) -> dict:
+        # Model, decoding and load of every configured tier
+        return {
+            "default_mode": self.default_mode,
+            "fallback_depth": self.fallback_depth,
+            "modes": {
+                name: {
+                    "model_id": mode.model_id,
+                    "decoding": mode.decoding,
+                    "in_flight": self._in_flight[name],
+                    "requests": self._mode_requests[name],
+                    "fallbacks_to_fast": self._fallbacks[name],
+                }
+                for name, mode in self.modes.items()
+            },
+        }
+
+    def warmup(self) -> None:
+        # Run a tiny generation on every model so lazy initialisation happens before the first request
+        for model_name, model in self.models.items():
+            inputs = self.tokenizers[model_name]("Question:", return_tensors="pt")
+            with torch.no_grad():
+                model.generate(**inputs, max_new_tokens=4)
+
+    def memory_footprint(self) -> int:
+        # Bytes held by the weights of every loaded model
+        return sum(self.backend.memory_footprint(model) for model in self.models.values())
+
+    def decoding_kwargs(self, mode: GenerationMode, num_sequences: int) -> dict:
+        # generate() arguments drawing num_sequences candidates per prompt in a tier
+        if mode.decoding == SAMPLE:
+            return dict(self.generation_kwargs, num_return_sequences=num_sequences)
+        kwargs = {"max_new_tokens": self.generation_kwargs.get("max_new_tokens", 64), "do_sample": False}
+        if num_sequences > 1:
+            # One beam per group, pushed apart by the diversity penalty
+            kwargs.update(num_beams=num_sequences, num_beam_groups=num_sequences,
+                          diversity_penalty=self.diversity_penalty, num_return_sequences=num_sequences)
+        return kwargs
+
+    def prompt_inputs(self, product_info: dict, mode: str = None) -> dict:
+        # generate() inputs of a product's token-budgeted prompt for a tier's model;
+        # input IDs are cached per product, so retries skip tokenization
+        mode = self.modes[mode or self.default_mode]
+        with TOKENIZE_SECONDS.time():
+            input_ids = torch.tensor([self.prompt_builders[mode.model_name].input_ids(product_info)], dtype=torch.long)
+        return {"input_ids": input_ids, "attention_mask": torch.ones_like(input_ids)}
+
+    def prompt_stats(self) -> dict:
+        # Budgets, tokenization cache use and truncations per model
+        return {model_name: builder.stats() for model_name, builder in self.prompt_builders.items()}
+
+    def decode(self, outputs, tokenizer=None) -> list:
+        with DECODE_SECONDS.time():
+            output_texts = (tokenizer or self.tokenizer).batch_decode(outputs, skip_special_tokens=True)
+            return [text.split("Question:")[-1].strip() for text in output_texts]
+
+    def record_generate(self, outputs, seconds: float, tokenizer=None) -> None:
+        # Count produced tokens, leaving out padding and the decoder start token
+        tokens = int((outputs != (tokenizer or self.tokenizer).pad_token_id).sum())
+        GENERATE_SECONDS.observe(seconds)
+        generated_tokens.inc(tokens)
+        if seconds > 0:
+            generation_tokens_per_second.set(tokens / seconds)
+
+    def stopping_criteria(self, cancel_tokens: list) -> dict:
+        # generate() arguments that abort decoding when the requests are cancelled
+        if not cancel_tokens or any(token is None for token in cancel_tokens):
+            return {}
+        return {"stopping_criteria": StoppingCriteriaList([CancelledStoppingCriteria(cancel_tokens)])}
+
+    def sample(self, inputs, num_sequences: int, cancel_token=None, mode: str = None) -> list:
+        # Draw num_sequences candidates for an already tokenized prompt in one generate call
+        mode = self.modes[mode or self.default_mode]
+        if self.scheduler is not None:
+            input_ids = inputs["input_ids"][0].tolist()
+            return self.scheduler.submit(input_ids, num_sequences, cancel_token, mode.name).result()
+        tokenizer = self.tokenizers[mode.model_name]
+        start = time.perf_counter()
+        with torch.no_grad(), profile_generate():
+            outputs = self.models[mode.model_name].generate(
                 **inputs,
-                max_new_tokens=64,
-                do_sample=True,
-                top_k=50,
-                top_p=0.95,
-                temperature=0.85,
-                num_return_sequences=1
+                **self.decoding_kwargs(mode, num_sequences),
+                **self.stopping_criteria([cancel_token])
+            )
+        self.record_generate(outputs, time.perf_counter() - start, tokenizer)
+        if cancel_token is not None:
+            # Sequences cut short by the stopping criterion are discarded
+            cancel_token.raise_if_cancelled()
+        return self.decode(outputs, tokenizer)
+
+    def sample_batch(self, input_ids: list, num_sequences: list, cancel_tokens: list = None,
+                     mode: str = None) -> list:
+        # Sample several prompts of one tier in one padded batch; prompt i gets num_sequences[i]
+        # candidates. Decoding stops early only when every prompt's request has been cancelled.
+        mode = self.modes[mode or self.default_mode]
+        if mode.decoding != SAMPLE:
+            return self.beam_batch(input_ids, num_sequences, cancel_tokens, mode)
+        model = self.models[mode.model_name]
+        tokenizer = self.tokenizers[mode.model_name]
+        padded_ids, padding_mask = self.pad(input_ids, tokenizer.pad_token_id)
+
+        repeats = torch.tensor(num_sequences)
+        with torch.no_grad(), profile_generate():
+            # Encode each prompt once, then expand the encoder states per requested sequence
+            with ENCODE_SECONDS.time():
+                encoder_outputs = model.get_encoder()(input_ids=padded_ids, attention_mask=padding_mask)
+                hidden_states = encoder_outputs.last_hidden_state.repeat_interleave(repeats, dim=0)
+                attention_mask = padding_mask.repeat_interleave(repeats, dim=0)
+            start = time.perf_counter()
+            outputs = model.generate(
+                encoder_outputs=BaseModelOutput(last_hidden_state=hidden_states),
+                attention_mask=attention_mask,
+                **self.generation_kwargs,
+                **self.stopping_criteria(cancel_tokens)
             )
-            output_text = self.tokenizer.decode(outputs[0], skip_special_tokens=True)
-            question = output_text.split("Question:")[-1].strip()
-            if question and question not in questions:
-                questions.add(question)
-            tries += 1
-
-        # If still not enough, fill with a generic question
-        while len(questions) < num_questions:
-            questions.add(f"Can you provide more information about {name}?")
-        return list(questions)
\ No newline at end of file
+            self.record_generate(outputs, time.perf_counter() - start, tokenizer)
+        questions = self.decode(outputs, tokenizer)
+
+        results = []
+        offset = 0
+        for count in num_sequences:
+            results.append(questions[offset:offset + count])
+            offset += count
+        return results
+
+    def beam_batch(self, input_ids: list, num_sequences: list, cancel_tokens: list,
+                   mode: GenerationMode) -> list:
+        # Beam search needs the same beam count for every prompt of a generate call,
+        # so prompts are grouped by their number of sequences
+        model = self.models[mode.model_name]
+        tokenizer = self.tokenizers[mode.model_name]
+        groups = {}
+        for row, count in enumerate(num_sequences):
+            groups.setdefault(count, []).append(row)
+
+        results = [None] * len(input_ids)
+        for count, rows in groups.items():
+            padded_ids, padding_mask = self.pad([input_ids[row] for row in rows], tokenizer.pad_token_id)
+            tokens = None if cancel_tokens is None else [cancel_tokens[row] for row in rows]
+            with torch.no_grad(), profile_generate():
+                with ENCODE_SECONDS.time():
+                    encoder_outputs = model.get_encoder()(input_ids=padded_ids, attention_mask=padding_mask)
+                start = time.perf_counter()
+                # generate() expands the encoder states per beam itself
+                outputs = model.generate(
+                    encoder_outputs=encoder_outputs,
+                    attention_mask=padding_mask,
+                    **self.decoding_kwargs(mode, count),
+                    **self.stopping_criteria(tokens)
+                )
+                self.record_generate(outputs, time.perf_counter() - start, tokenizer)
+            questions = self.decode(outputs, tokenizer)
+            for index, row in enumerate(rows):
+                results[row] = questions[index * count:(index + 1) * count]
+        return results
+
+    @staticmethod
+    def pad(input_ids: list, pad_token_id: int):
+        # Right-pad token ID lists into an input tensor and its attention mask
+        max_length = max(len(ids) for ids in input_ids)
+        padded_ids = torch.full((len(input_ids), max_length), pad_token_id, dtype=torch.long)
+        padding_mask = torch.zeros((len(input_ids), max_length), dtype=torch.long)
+        for row, ids in enumerate(input_ids):
+            padded_ids[row, :len(ids)] = torch.tensor(ids, dtype=torch.long)
+            padding_mask[row, :len(ids)] = 1
+        return padded_ids, padding_mask
+
+    def generate(self, product_info: dict, num_questions: int = 5, deadline: float = None,
+                 cancel_token=None, mode: str = None, outcome: dict = None) -> list:
+        return list(self.iter_generate(product_info, num_questions, deadline=deadline, cancel_token=cancel_token,
+                                       mode=mode, outcome=outcome))
+
+    def is_near_duplicate(self, tokens: frozenset, accepted: list) -> bool:
+        # Compare a candidate against every accepted question (at most num_questions of them)
+        return any(token_set_similarity(tokens, other) >= self.similarity_threshold for other in accepted)
+
+    def iter_generate(self, product_info: dict, num_questions: int = 5, streaming: bool = False,
+                      deadline: float = None, cancel_token=None, mode: str = None, outcome: dict = None):
+        # Runs in the given tier (default_mode when None); resolve_mode picks the tier for a request.
+        # When given, outcome["complete"] tells whether the questions are fit to be cached and indexed.
+        mode = self.modes[mode or self.default_mode]
+        with self._mode_lock:
+            self._in_flight[mode.name] += 1
+            self._mode_requests[mode.name] += 1
+        try:
+            yield from self._iter_generate(product_info, num_questions, streaming, deadline, cancel_token, mode,
+                                           {} if outcome is None else outcome)
+        finally:
+            with self._mode_lock:
+                self._in_flight[mode.name] -= 1
+
+    def _iter_generate(self, product_info: dict, num_questions: int, streaming: bool, deadline: float,
+                       cancel_token, mode: GenerationMode, outcome: dict):
+        # Yield each unique question as soon as it has been decoded and deduplicated.
+        # In streaming mode sampling starts with a single sequence and doubles the chunk
+        # size each round, so the first question only waits for one decode.
+        # deadline is a time.monotonic() timestamp; by default the request gets deadline_seconds.
+        # Sampling stops early when the deadline would be missed or when a round yields
+        # almost only duplicates, and the remaining slots are filled with generic questions.
+        # A cancelled cancel_token (client gone or its hard deadline passed) aborts with
+        # GenerationCancelled between rounds and inside model.generate.
+        # outcome["complete"] is set once every question has been yielded: False when sampling was
+        # cut short or generic questions filled slots, since such a result depends on this request's
+        # deadline or luck and must not be served to later requests.
+        outcome["complete"] = False
+        complete = True
+        start = time.monotonic()
+        if deadline is None and self.deadline_seconds > 0:
+            deadline = start + self.deadline_seconds
+        if cancel_token is not None and cancel_token.deadline is not None:
+            # Prefer returning best-so-far questions over being aborted at the client's deadline
+            deadline = min(deadline or cancel_token.deadline, cancel_token.deadline)
+
+        name = product_info.get("name", "product")
+        # Encode the prompt once and reuse it for every sampling round
+        inputs = self.prompt_inputs(product_info, mode.name)
+
+        seen = set()
+        accepted = []
+        produced = 0
+        rounds = 0
+        drawn = 0
+        chunk_size = 1
+        last_round_seconds = 0.0
+        # Beam search returns the same candidates every time, so beam tiers sample one round
+        sampling = mode.decoding == SAMPLE
+        max_rounds = self.max_rounds if sampling else 1
+        budget = num_questions * self.oversample_factor * max_rounds
+        while produced < num_questions:
+            missing = num_questions - produced
+            if streaming and sampling:
+                if drawn >= budget:
+                    break
+                num_sequences = min(chunk_size, missing * self.oversample_factor, budget - drawn,
+                                    self.max_batch_sequences)
+                chunk_size *= 2
+            else:
+                if rounds >= max_rounds:
+                    break
+                # Over-sample so duplicates rarely force another round
+                num_sequences = min(missing * self.oversample_factor, self.max_batch_sequences)
+            if cancel_token is not None:
+                cancel_token.raise_if_cancelled()
+            # Skip a round that would likely finish after the deadline
+            if deadline is not None and rounds and time.monotonic() + last_round_seconds > deadline:
+                DEADLINE_STOPS.inc()
+                complete = False
+                break
+            rounds += 1
+            drawn += num_sequences
+
+            round_start = time.monotonic()
+            new_questions = 0
+            for question in self.sample(inputs, num_sequences, cancel_token, mode.name):
+                if not question:
+                    EMPTY_REJECTS.inc()
+                    continue
+                if question in seen:
+                    DUPLICATE_REJECTS.inc()
+                    continue
+                tokens = question_tokens(question)
+                if self.is_near_duplicate(tokens, accepted):
+                    NEAR_DUPLICATE_REJECTS.inc()
+                    continue
+                seen.add(question)
+                accepted.append(tokens)
+                produced += 1
+                new_questions += 1
+                MODEL_QUESTIONS.inc()
+                yield question
+                if produced == num_questions:
+                    break
+            last_round_seconds = time.monotonic() - round_start
+
+            # More rounds are unlikely to help once nearly every candidate is a repeat
+            low_yield = num_sequences >= 2 and new_questions / num_sequences < self.min_unique_yield
+            if produced < num_questions and low_yield:
+                LOW_YIELD_STOPS.inc()
+                complete = False
+                break
+        generation_rounds.observe(rounds)
+
+        # If still not enough, fill with generic questions
+        for template in FALLBACK_QUESTIONS:
+            if produced >= num_questions:
+                break
+            question = template.format(name=name)
+            tokens = question_tokens(question)
+            if question not in seen and not self.is_near_duplicate(tokens, accepted):
+                seen.add(question)
+                accepted.append(tokens)
+                produced += 1
+                complete = False
+                FALLBACK_FILLS.inc()
+                yield question
+        # Then with topic questions, so the request always gets num_questions (up to 20). They
+        # only differ in their topic, which the near-duplicate check would reject, so only
+        # exact repeats are skipped.
+        for topic in FALLBACK_TOPICS:
+            if produced >= num_questions:
+                break
+            question = FALLBACK_TOPIC_QUESTION.format(topic=topic, name=name)
+            if question not in seen:
+                seen.add(question)
+                produced += 1
+                complete = False
+                FALLBACK_FILLS.inc()
+                yield question
+        generation_mode_duration.labels(mode.name).observe(time.monotonic() - start)
+        outcome["complete"] = complete
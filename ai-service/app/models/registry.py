@@ -0,0 +1,256 @@
+import os
+import logging
+import threading
+import time
+from concurrent.futures import Future
+from typing import Dict, Any, Optional, TYPE_CHECKING
+
+from app.models.batch_scheduler import BatchScheduler
+from app.models.transparency_scorer import TransparencyScorer
+
+if TYPE_CHECKING:
+    from app.models.question_generator import QuestionGenerator
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Model load states reported by /ready
+NOT_LOADED = "not_loaded"
+LOADING = "loading"
+READY = "ready"
+FAILED = "failed"
+
+
+class ModelRegistry:
+    """Process-wide holder for the service's models
+
+    Models are loaded once and the same instances are handed out to every
+    request. The question generator pulls in torch and transformers, so it is
+    imported and loaded on a background thread; the scorer is loaded eagerly.
+    """
+
+    def __init__(self):
+        """Initialize an empty registry"""
+        self._lock = threading.Lock()
+        self._generator_future: Optional[Future] = None
+        # Generator constructed ahead of the load, e.g. before forking worker processes
+        self._preloaded_generator: Optional["QuestionGenerator"] = None
+        self._preload_seconds: Dict[str, float] = {}
+        self._transparency_scorer: Optional[TransparencyScorer] = None
+        self._scheduler: Optional[BatchScheduler] = None
+        self._stats: Dict[str, Dict[str, Any]] = {}
+        self._states: Dict[str, Dict[str, Any]] = {
+            "question_generator": {"state": NOT_LOADED},
+            "transparency_scorer": {"state": NOT_LOADED},
+        }
+
+    def _record(self, name: str, model_name: str, load_seconds: float, warmup_seconds: float,
+                memory_bytes: int, import_seconds: float = 0.0) -> None:
+        """Store load statistics for a model"""
+        self._stats[name] = {
+            "model_name": model_name,
+            "import_seconds": round(import_seconds, 3),
+            "load_seconds": round(load_seconds, 3),
+            "warmup_seconds": round(warmup_seconds, 3),
+            "memory_bytes": memory_bytes,
+            "memory_mb": round(memory_bytes / (1024 * 1024), 1),
+        }
+
+    def _load_question_generator(self) -> "QuestionGenerator":
+        """Import, load and warm up the question generator"""
+        if self._preloaded_generator is not None:
+            # Constructed ahead of time, e.g. by the parent process whose weights are shared copy-on-write
+            generator, self._preloaded_generator = self._preloaded_generator, None
+            import_seconds = self._preload_seconds["import"]
+            load_seconds = self._preload_seconds["load"]
+        else:
+            start = time.perf_counter()
+            # Deferred so that importing the app does not pay for torch and transformers
+            from app.models.question_generator import QuestionGenerator
+            import_seconds = time.perf_counter() - start
+            logger.info(f"Imported question generation dependencies in {import_seconds:.2f}s")
+
+            start = time.perf_counter()
+            generator = QuestionGenerator()
+            load_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        generator.warmup()
+        warmup_seconds = time.perf_counter() - start
+
+        self._record("question_generator", generator.model_id, load_seconds, warmup_seconds,
+                     generator.memory_footprint(), import_seconds)
+        logger.info(
+            f"Loaded question generator {generator.model_id} in {load_seconds:.2f}s "
+            f"(warmup {warmup_seconds:.2f}s, modes: {', '.join(generator.modes)})"
+        )
+
+        # Merge prompts from concurrent requests into shared generate calls
+        if os.getenv("QUESTION_BATCHING_ENABLED", "true").lower() == "true":
+            self._scheduler = BatchScheduler(
+                generator,
+                max_batch_size=int(os.getenv("QUESTION_BATCH_MAX_SIZE", 32)),
+                max_wait_ms=float(os.getenv("QUESTION_BATCH_MAX_WAIT_MS", 10)),
+                bucket_width=int(os.getenv("QUESTION_BATCH_BUCKET_WIDTH", 32))
+            )
+            self._scheduler.start()
+            generator.scheduler = self._scheduler
+        return generator
+
+    def _run_generator_load(self, future: Future) -> None:
+        """Background thread body: load the generator and resolve the future"""
+        start = time.perf_counter()
+        try:
+            generator = self._load_question_generator()
+        except Exception as e:
+            logger.error(f"Failed to load question generator: {str(e)}", exc_info=True)
+            self._states["question_generator"] = {"state": FAILED, "error": str(e)}
+            future.set_exception(e)
+        else:
+            self._states["question_generator"] = {
+                "state": READY,
+                "ready_after_seconds": round(time.perf_counter() - start, 3)
+            }
+            future.set_result(generator)
+
+    def _load_transparency_scorer(self) -> TransparencyScorer:
+        """Load and warm up the transparency scorer"""
+        start = time.perf_counter()
+        scorer = TransparencyScorer()
+        load_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        scorer.warmup()
+        warmup_seconds = time.perf_counter() - start
+
+        self._record("transparency_scorer", scorer.model_name, load_seconds, warmup_seconds, 0)
+        logger.info(f"Loaded transparency scorer {scorer.model_name} in {load_seconds:.2f}s")
+        return scorer
+
+    def preload_for_fork(self) -> None:
+        """Load the generator weights in a parent process that will fork workers
+
+        Only the weights are loaded: no warmup, inference or threads run here,
+        so forked workers inherit the weights copy-on-write and finish loading
+        (warmup and batch scheduler) in their own lifespan.
+        """
+        start = time.perf_counter()
+        from app.models.question_generator import QuestionGenerator
+        import_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        generator = QuestionGenerator()
+        load_seconds = time.perf_counter() - start
+        self.set_question_generator(generator, import_seconds, load_seconds)
+        logger.info(f"Preloaded question generator {generator.model_id} in {load_seconds:.2f}s for forked workers")
+
+    def set_question_generator(self, generator: "QuestionGenerator", import_seconds: float = 0.0,
+                               load_seconds: float = 0.0) -> None:
+        """Use an already constructed generator for the next load instead of building one
+
+        The generator is warmed up and attached to the batch scheduler when the
+        registry loads it, exactly like a generator it constructed itself.
+
+        Args:
+            generator: QuestionGenerator (or compatible stub) to serve
+            import_seconds: Import time to report in the load statistics
+            load_seconds: Load time to report in the load statistics
+        """
+        self._preloaded_generator = generator
+        self._preload_seconds = {"import": import_seconds, "load": load_seconds}
+
+    def load(self, preload_generator: bool = True) -> None:
+        """Load the scorer now and start loading the generator in the background
+
+        Args:
+            preload_generator: Start loading the question generator immediately
+                instead of on the first request that needs it
+        """
+        self.get_transparency_scorer()
+        if preload_generator:
+            self.question_generator_future()
+
+    def question_generator_future(self) -> Future:
+        """Return a future for the shared question generator, starting the load if needed
+
+        A load that failed is retried on the next call.
+        """
+        with self._lock:
+            future = self._generator_future
+            if future is None or (future.done() and future.exception() is not None):
+                future = Future()
+                self._generator_future = future
+                self._states["question_generator"] = {"state": LOADING}
+                threading.Thread(
+                    target=self._run_generator_load,
+                    args=(future,),
+                    name="question-generator-loader",
+                    daemon=True
+                ).start()
+            return future
+
+    def get_question_generator(self) -> "QuestionGenerator":
+        """Return the shared question generator, blocking until it is loaded"""
+        return self.question_generator_future().result()
+
+    def get_transparency_scorer(self) -> TransparencyScorer:
+        """Return the shared transparency scorer, loading it on first use"""
+        if self._transparency_scorer is None:
+            with self._lock:
+                if self._transparency_scorer is None:
+                    self._states["transparency_scorer"] = {"state": LOADING}
+                    self._transparency_scorer = self._load_transparency_scorer()
+                    self._states["transparency_scorer"] = {"state": READY}
+        return self._transparency_scorer
+
+    def unload(self) -> None:
+        """Drop references to the loaded models"""
+        with self._lock:
+            future = self._generator_future
+        if future is not None:
+            # Let an in-progress load finish before tearing down
+            future.exception()
+        with self._lock:
+            if self._scheduler is not None:
+                self._scheduler.stop()
+                self._scheduler = None
+            self._generator_future = None
+            self._transparency_scorer = None
+            self._stats = {}
+            self._states = {name: {"state": NOT_LOADED} for name in self._states}
+
+    def is_ready(self) -> bool:
+        """Whether every model is loaded"""
+        return all(state["state"] == READY for state in self._states.values())
+
+    def states(self) -> Dict[str, Dict[str, Any]]:
+        """Return the load state of every model"""
+        return {name: dict(state) for name, state in self._states.items()}
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Return load time and memory statistics for loaded models"""
+        return {name: dict(values) for name, values in self._stats.items()}
+
+    def generation_mode_stats(self) -> Optional[Dict[str, Any]]:
+        """Return the generator's latency tiers and their load, or None until it is loaded"""
+        future = self._generator_future
+        if future is None or not future.done() or future.exception() is not None:
+            return None
+        return future.result().mode_stats()
+
+    def prompt_stats(self) -> Optional[Dict[str, Any]]:
+        """Return prompt budgets and tokenization cache use per model, or None until the generator is loaded"""
+        future = self._generator_future
+        if future is None or not future.done() or future.exception() is not None:
+            return None
+        return future.result().prompt_stats()
+
+    def scheduler_stats(self) -> Optional[Dict[str, Any]]:
+        """Return batching statistics, or None when batching is disabled"""
+        if self._scheduler is None:
+            return None
+        return self._scheduler.stats()
+
+
+# Shared registry used by the API dependencies and the application lifespan
+model_registry = ModelRegistry()
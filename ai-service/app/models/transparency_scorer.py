@@ -1,8 +1,11 @@
 import os
 import logging
 import random
-from typing import Dict, List, Any, Tuple, Optional
+import time
+from typing import Dict, List, Any, FrozenSet, NamedTuple, Set, Tuple, Optional
+import numpy as np
 from dotenv import load_dotenv
+from app.utils.metrics import scoring_stage_duration
 
 # Load environment variables
 load_dotenv()
@@ -10,6 +13,43 @@ load_dotenv()
 # Configure logging
 logger = logging.getLogger(__name__)
 
+# Per-stage timers of calculate_score exposed at /metrics
+FEATURES_SECONDS = scoring_stage_duration.labels("features")
+CRITERIA_SECONDS = scoring_stage_duration.labels("criteria")
+IMPROVEMENT_AREAS_SECONDS = scoring_stage_duration.labels("improvement_areas")
+FEEDBACK_SECONDS = scoring_stage_duration.labels("feedback")
+
+class AnswerFeatures(NamedTuple):
+    """Features of a single question-answer pair, extracted once per request"""
+    length: int
+    specificity_hits: int
+    verifiable: bool
+    topics: FrozenSet[str]
+    quality: float
+
+
+class KeywordMatcher:
+    """Matcher for a fixed, combined set of keywords
+    
+    Keywords from several lists are merged and deduplicated once, so each
+    text is lowercased once and every distinct keyword is looked up once.
+    Lookups use CPython's substring search, which measured faster here than
+    a compiled alternation regex for these short keyword lists.
+    """
+    
+    def __init__(self, keywords: List[str]):
+        """Build the matcher
+        
+        Args:
+            keywords: Lowercase keywords to look for
+        """
+        self.keywords = tuple(dict.fromkeys(keywords))
+    
+    def find(self, text: str) -> FrozenSet[str]:
+        """Return the keywords contained in already lowercased text"""
+        return frozenset([keyword for keyword in self.keywords if keyword in text])
+
+
 class TransparencyScorer:
     """Model for calculating product transparency scores"""
     
@@ -58,42 +98,95 @@ class TransparencyScorer:
             "claim_substantiation": "Provide better substantiation for product claims",
             "supply_chain_transparency": "Increase transparency about the supply chain"
         }
+        
+        # Terms indicating specific, detailed answers
+        self.specificity_indicators = [
+            "%", "mg", "kg", "certified", "tested", "verified",
+            "sourced from", "manufactured in", "approved by"
+        ]
+        
+        # Terms indicating claims that can be verified by third parties
+        self.verifiable_terms = ["certified", "tested", "verified", "approved", "registered", "compliant"]
+        
+        # Question terms per topic, keyed by the improvement area suggested when the topic is weak
+        self.topic_terms = {
+            "environmental_impact": ["environment", "sustainable", "eco", "green"],
+            "ethical_practices": ["ethic", "fair", "labor", "worker", "animal"],
+            "testing_methods": ["test", "verify", "measure", "quality"]
+        }
+        
+        # Specificity score for each number of matched indicators, accumulated exactly
+        # like _evaluate_answer_quality so the vectorized path gives identical results
+        self._specificity_scores = []
+        for hits in range(len(self.specificity_indicators) + 1):
+            specificity_score = 0.0
+            for _ in range(hits):
+                specificity_score += 0.1
+            self._specificity_scores.append(min(1.0, specificity_score))
+        self._specificity_scores = np.array(self._specificity_scores)
+        self._specificity_score_list = self._specificity_scores.tolist()
+        
+        # Compiled matchers: one pass over each answer and each question
+        self._specificity_set = frozenset(self.specificity_indicators)
+        self._verifiable_set = frozenset(self.verifiable_terms)
+        self._answer_matcher = KeywordMatcher(self.specificity_indicators + self.verifiable_terms)
+        self._question_matcher = KeywordMatcher([term for terms in self.topic_terms.values() for term in terms])
+        self._topic_sets = {area: frozenset(terms) for area, terms in self.topic_terms.items()}
     
-    def _evaluate_answer_quality(self, question: str, answer: str) -> float:
-        """Evaluate the quality of an answer
+    def warmup(self) -> None:
+        """Score a dummy product once so the first real request is not slower"""
+        self.calculate_score(
+            product_info={"name": "Warmup product", "description": "Warmup"},
+            answers={"Is this product tested?": "Yes, it is tested and certified."}
+        )
+    
+    def _extract_answer_features(self, question: str, answer: str) -> AnswerFeatures:
+        """Extract every feature the scoring criteria need from one answer
         
         Args:
             question: The question being answered
             answer: The provided answer
             
         Returns:
-            Score between 0 and 1 indicating answer quality
+            AnswerFeatures record for the pair
         """
+        answer_terms = self._answer_matcher.find(answer.lower())
+        question_terms = self._question_matcher.find(question.lower())
+        specificity_hits = len(answer_terms & self._specificity_set)
+        
         # In a real implementation, this would use NLP to evaluate answer quality
         # For this prototype, we'll use simple heuristics
         
         # Check if answer is empty or too short
         if not answer or len(answer) < 5:
-            return 0.0
-        
-        # Check answer length (longer answers tend to be more informative)
-        length_score = min(1.0, len(answer) / 200)  # Cap at 200 characters
-        
-        # Check for specificity (presence of numbers, percentages, specific terms)
-        specificity_indicators = [
-            "%", "mg", "kg", "certified", "tested", "verified",
-            "sourced from", "manufactured in", "approved by"
-        ]
-        specificity_score = 0.0
-        for indicator in specificity_indicators:
-            if indicator in answer.lower():
-                specificity_score += 0.1
-        specificity_score = min(1.0, specificity_score)  # Cap at 1.0
-        
-        # Calculate final score (weighted average)
-        final_score = 0.7 * length_score + 0.3 * specificity_score
+            quality = 0.0
+        else:
+            # Check answer length (longer answers tend to be more informative)
+            length_score = min(1.0, len(answer) / 200)  # Cap at 200 characters
+            # Check for specificity (presence of numbers, percentages, specific terms), capped at 1.0
+            specificity_score = self._specificity_score_list[specificity_hits]
+            # Calculate final score (weighted average)
+            quality = 0.7 * length_score + 0.3 * specificity_score
+        
+        return AnswerFeatures(
+            length=len(answer),
+            specificity_hits=specificity_hits,
+            verifiable=bool(answer_terms & self._verifiable_set),
+            topics=frozenset(area for area, terms in self._topic_sets.items() if question_terms & terms),
+            quality=quality
+        )
+    
+    def _evaluate_answer_quality(self, question: str, answer: str) -> float:
+        """Evaluate the quality of an answer
         
-        return final_score
+        Args:
+            question: The question being answered
+            answer: The provided answer
+            
+        Returns:
+            Score between 0 and 1 indicating answer quality
+        """
+        return self._extract_answer_features(question, answer).quality
     
     def _evaluate_product_info_completeness(self, product_info: Dict[str, Any]) -> float:
         """Evaluate the completeness of product information
@@ -134,12 +227,31 @@ class TransparencyScorer:
         
         return score / total_weight
     
-    def _identify_improvement_areas(self, product_info: Dict[str, Any], answers: Dict[str, str]) -> List[str]:
+    def _identify_improvement_areas(self, product_info: Dict[str, Any], answers: Dict[str, str],
+                                    features: Optional[List[AnswerFeatures]] = None) -> List[str]:
         """Identify areas for improvement in transparency
         
         Args:
             product_info: Dictionary containing product information
             answers: Dictionary of question-answer pairs
+            features: Features already extracted for the answers, in the same order
+            
+        Returns:
+            List of improvement areas
+        """
+        if features is None:
+            features = [self._extract_answer_features(q, a) for q, a in answers.items()]
+        
+        # Topic areas with at least one good answer
+        covered_areas = {area for area in self.topic_terms if any(area in f.topics and f.quality >= 0.5 for f in features)}
+        return self._improvement_areas_for(product_info, covered_areas)
+    
+    def _improvement_areas_for(self, product_info: Dict[str, Any], covered_areas: Set[str]) -> List[str]:
+        """Identify areas for improvement given the topic areas answered well
+        
+        Args:
+            product_info: Dictionary containing product information
+            covered_areas: Topic areas with at least one answer of quality 0.5 or more
             
         Returns:
             List of improvement areas
@@ -160,17 +272,10 @@ class TransparencyScorer:
             improvement_areas.append(self.improvement_areas["certification_verification"])
         
         # Check answer quality for specific topics
-        environmental_questions = [q for q in answers.keys() if any(term in q.lower() for term in ["environment", "sustainable", "eco", "green"])]
-        if not environmental_questions or all(self._evaluate_answer_quality(q, answers[q]) < 0.5 for q in environmental_questions):
-            improvement_areas.append(self.improvement_areas["environmental_impact"])
-        
-        ethical_questions = [q for q in answers.keys() if any(term in q.lower() for term in ["ethic", "fair", "labor", "worker", "animal"])]
-        if not ethical_questions or all(self._evaluate_answer_quality(q, answers[q]) < 0.5 for q in ethical_questions):
-            improvement_areas.append(self.improvement_areas["ethical_practices"])
-        
-        testing_questions = [q for q in answers.keys() if any(term in q.lower() for term in ["test", "verify", "measure", "quality"])]
-        if not testing_questions or all(self._evaluate_answer_quality(q, answers[q]) < 0.5 for q in testing_questions):
-            improvement_areas.append(self.improvement_areas["testing_methods"])
+        # (an area is weak when none of its questions has a good answer)
+        for area in self.topic_terms:
+            if area not in covered_areas:
+                improvement_areas.append(self.improvement_areas[area])
         
         # Limit to top 5 improvement areas
         if len(improvement_areas) == 0:
@@ -226,26 +331,69 @@ class TransparencyScorer:
         """
         logger.info(f"Calculating transparency score for product: {product_info.get('name', 'Unknown')}")
         
+        # Extract per-answer features once and reuse them for every criterion
+        start = time.perf_counter()
+        features = [self._extract_answer_features(q, a) for q, a in answers.items()]
+        FEATURES_SECONDS.observe(time.perf_counter() - start)
+        
+        start = time.perf_counter()
+        criteria_scores, final_score = self._criteria_from_totals(
+            product_info,
+            num_answers=len(answers),
+            quality_sum=sum(f.quality for f in features),
+            verifiable_answers=sum(1 for f in features if f.verifiable),
+            length_sum=sum(f.length for f in features)
+        )
+        CRITERIA_SECONDS.observe(time.perf_counter() - start)
+        
+        # Identify areas for improvement
+        start = time.perf_counter()
+        improvement_areas = self._identify_improvement_areas(product_info, answers, features)
+        IMPROVEMENT_AREAS_SECONDS.observe(time.perf_counter() - start)
+        
+        # Generate feedback
+        start = time.perf_counter()
+        feedback = self._generate_feedback(final_score, improvement_areas)
+        FEEDBACK_SECONDS.observe(time.perf_counter() - start)
+        
+        return self._format_result(final_score, feedback, improvement_areas, criteria_scores)
+    
+    def _criteria_from_totals(self, product_info: Dict[str, Any], num_answers: int, quality_sum: float,
+                              verifiable_answers: int, length_sum: int) -> Tuple[Dict[str, float], float]:
+        """Derive criteria scores from answer totals
+        
+        Every answer-dependent criterion only needs sums over the per-answer
+        features, which lets incremental scoring keep running totals instead
+        of the answers' features.
+        
+        Args:
+            product_info: Dictionary containing product information
+            num_answers: Number of question-answer pairs
+            quality_sum: Sum of the answers' quality, accumulated left to right in answer order
+            verifiable_answers: Number of answers with verifiable claims
+            length_sum: Total answer length in characters
+            
+        Returns:
+            Tuple of criteria scores (0-1) and the final score (0-10)
+        """
         # Calculate criteria scores
         criteria_scores = {}
         
         # Completeness: based on product info completeness and answer coverage
         product_completeness = self._evaluate_product_info_completeness(product_info)
-        answer_completeness = sum(self._evaluate_answer_quality(q, a) for q, a in answers.items()) / max(1, len(answers))
+        answer_completeness = quality_sum / max(1, num_answers)
         criteria_scores["completeness"] = 0.4 * product_completeness + 0.6 * answer_completeness
         
         # Clarity: based on answer quality
-        criteria_scores["clarity"] = sum(self._evaluate_answer_quality(q, a) for q, a in answers.items()) / max(1, len(answers))
+        criteria_scores["clarity"] = answer_completeness
         
         # Verifiability: presence of certifications and verifiable claims
         has_certifications = bool(product_info.get("certifications"))
-        verifiable_terms = ["certified", "tested", "verified", "approved", "registered", "compliant"]
-        verifiable_answers = sum(1 for a in answers.values() if any(term in a.lower() for term in verifiable_terms))
-        criteria_scores["verifiability"] = 0.5 * has_certifications + 0.5 * (verifiable_answers / max(1, len(answers)))
+        criteria_scores["verifiability"] = 0.5 * has_certifications + 0.5 * (verifiable_answers / max(1, num_answers))
         
         # Accessibility: based on description clarity and answer comprehensiveness
         has_description = bool(product_info.get("description"))
-        answer_length = sum(len(a) for a in answers.values()) / max(1, len(answers))
+        answer_length = length_sum / max(1, num_answers)
         criteria_scores["accessibility"] = 0.3 * has_description + 0.7 * min(1.0, answer_length / 150)
         
         # Consistency: consistency across answers
@@ -256,17 +404,112 @@ class TransparencyScorer:
         weighted_score = sum(score * self.criteria[criterion]["weight"] for criterion, score in criteria_scores.items())
         
         # Scale to 0-10
-        final_score = weighted_score * 10
-        
-        # Identify areas for improvement
-        improvement_areas = self._identify_improvement_areas(product_info, answers)
-        
-        # Generate feedback
-        feedback = self._generate_feedback(final_score, improvement_areas)
-        
+        return criteria_scores, weighted_score * 10
+    
+    @staticmethod
+    def _format_result(final_score: float, feedback: str, improvement_areas: List[str],
+                       criteria_scores: Dict[str, float]) -> Dict[str, Any]:
+        """Build the result dictionary returned by calculate_score"""
         return {
             "score": round(final_score, 1),
             "feedback": feedback,
             "areas_for_improvement": improvement_areas,
             "criteria_scores": {criterion: round(score * 10, 1) for criterion, score in criteria_scores.items()}
-        }
\ No newline at end of file
+        }
+    
+    def calculate_scores(self, items: List[Tuple[Dict[str, Any], Dict[str, str]]]) -> List[Dict[str, Any]]:
+        """Calculate transparency scores for many products at once
+        
+        Per-answer features are extracted once into (product, answer) arrays and
+        every criterion is derived with array operations. Sums are accumulated
+        column by column so results match calculate_score exactly.
+        
+        Args:
+            items: List of (product information, question-answer pairs) tuples
+            
+        Returns:
+            List of results in input order, as returned by calculate_score
+        """
+        if not items:
+            return []
+        
+        num_products = len(items)
+        width = max(1, max(len(answers) for _, answers in items))
+        
+        # Extract per-answer features into padded matrices
+        lengths = np.zeros((num_products, width), dtype=np.int64)
+        specificity_hits = np.zeros((num_products, width), dtype=np.int64)
+        verifiable = np.zeros((num_products, width), dtype=bool)
+        topics = {area: np.zeros((num_products, width), dtype=bool) for area in self.topic_terms}
+        for row, (_, answers) in enumerate(items):
+            for col, (question, answer) in enumerate(answers.items()):
+                features = self._extract_answer_features(question, answer)
+                lengths[row, col] = features.length
+                specificity_hits[row, col] = features.specificity_hits
+                verifiable[row, col] = features.verifiable
+                for area in features.topics:
+                    topics[area][row, col] = True
+        
+        # Answer quality, identical to _evaluate_answer_quality (padding has length 0)
+        length_score = np.minimum(1.0, lengths / 200)
+        specificity_score = self._specificity_scores[specificity_hits]
+        quality = np.where(lengths >= 5, 0.7 * length_score + 0.3 * specificity_score, 0.0)
+        
+        # Accumulate sequentially per answer position to reproduce Python's sum()
+        quality_sum = np.zeros(num_products)
+        for col in range(width):
+            quality_sum = quality_sum + quality[:, col]
+        answer_counts = np.array([max(1, len(answers)) for _, answers in items])
+        
+        # Product-level features
+        product_completeness = np.array([self._evaluate_product_info_completeness(product_info) for product_info, _ in items])
+        has_certifications = np.array([bool(product_info.get("certifications")) for product_info, _ in items])
+        has_description = np.array([bool(product_info.get("description")) for product_info, _ in items])
+        
+        # Criteria scores
+        answer_quality = quality_sum / answer_counts
+        criteria_scores = {
+            "completeness": 0.4 * product_completeness + 0.6 * answer_quality,
+            "clarity": answer_quality,
+            "verifiability": 0.5 * has_certifications + 0.5 * (verifiable.sum(axis=1) / answer_counts),
+            "accessibility": 0.3 * has_description + 0.7 * np.minimum(1.0, (lengths.sum(axis=1) / answer_counts) / 150),
+            "consistency": np.full(num_products, 0.8)
+        }
+        weighted_score = np.zeros(num_products)
+        for criterion, scores in criteria_scores.items():
+            weighted_score = weighted_score + scores * self.criteria[criterion]["weight"]
+        final_scores = weighted_score * 10
+        
+        # Improvement areas as a (product, area) mask, in the order used by _identify_improvement_areas
+        area_keys = ["ingredient_disclosure", "manufacturing_details", "sourcing_transparency", "certification_verification"]
+        area_masks = [
+            np.array([not product_info.get("ingredients") for product_info, _ in items]),
+            np.array([not product_info.get("manufacturing_process") for product_info, _ in items]),
+            np.array([not product_info.get("country_of_origin") for product_info, _ in items]),
+            np.array([
+                not (isinstance(product_info.get("certifications"), list) and product_info.get("certifications"))
+                for product_info, _ in items
+            ])
+        ]
+        good_answers = quality >= 0.5
+        for area, topic in topics.items():
+            area_keys.append(area)
+            area_masks.append(~(topic & good_answers).any(axis=1))
+        area_mask = np.stack(area_masks, axis=1)
+        default_areas = [
+            self.improvement_areas["claim_substantiation"],
+            self.improvement_areas["supply_chain_transparency"]
+        ]
+        
+        results = []
+        for row in range(num_products):
+            improvement_areas = [self.improvement_areas[area_keys[col]] for col in np.flatnonzero(area_mask[row])]
+            improvement_areas = (improvement_areas or default_areas)[:5]
+            final_score = float(final_scores[row])
+            results.append({
+                "score": round(final_score, 1),
+                "feedback": self._generate_feedback(final_score, improvement_areas),
+                "areas_for_improvement": improvement_areas,
+                "criteria_scores": {criterion: round(float(scores[row]) * 10, 1) for criterion, scores in criteria_scores.items()}
+            })
+        return results
@@ -0,0 +1 @@
+# tests package initialization
@@ -0,0 +1,8 @@
+import pytest
+
+from app.models.transparency_scorer import TransparencyScorer
+
+
+@pytest.fixture(scope="session")
+def scorer() -> TransparencyScorer:
+    return TransparencyScorer()
@@ -0,0 +1,57 @@
+"""Random products and answers for scorer parity tests"""
+import random
+import string
+from typing import Dict, Any
+
+# Fragments that hit the scorer's specificity, verifiability and topic terms
+ANSWER_FRAGMENTS = [
+    "", "n/a", "ok", "Yes.", "100% organic", "certified by the Soil Association", "tested in an independent lab",
+    "sourced from small farms in Peru", "manufactured in Italy", "contains 12 mg of vitamin C per 100 kg",
+    "verified and approved by the regulator", "registered and compliant with EU rules", "We do not disclose this.",
+]
+QUESTION_FRAGMENTS = [
+    "How sustainable is the packaging?", "Are workers paid a fair wage?", "How is quality tested?",
+    "Is the product eco friendly?", "How do you verify animal welfare?", "Where is it made?",
+    "What is in it?", "How do you measure green claims?", "Who are your suppliers?",
+]
+
+
+def random_product(rng: random.Random) -> Dict[str, Any]:
+    """A product with each optional field randomly missing, empty, short or long"""
+    def text(length: int) -> str:
+        return "".join(rng.choice(string.ascii_lowercase + " ") for _ in range(length))
+
+    product: Dict[str, Any] = {"name": f"Product {rng.randint(1, 999)}"}
+    for field in ("description", "category", "ingredients", "manufacturing_process", "country_of_origin"):
+        choice = rng.random()
+        if choice < 0.25:
+            continue
+        product[field] = "" if choice < 0.35 else text(rng.choice([3, 40, 150]))
+    choice = rng.random()
+    if choice < 0.3:
+        product["certifications"] = None
+    elif choice < 0.45:
+        product["certifications"] = []
+    elif choice < 1.0:
+        product["certifications"] = rng.sample(["Organic", "Fair Trade", "B Corp", "ISO 9001", "Vegan", "FSC"],
+                                               rng.randint(1, 6))
+    return product
+
+
+def random_answer(rng: random.Random) -> str:
+    """An answer that is empty, under 5 characters or built from scoring terms"""
+    choice = rng.random()
+    if choice < 0.15:
+        return rng.choice(["", "no", "n/a", "ok"])
+    parts = rng.sample(ANSWER_FRAGMENTS, rng.randint(1, 4))
+    if choice > 0.85:
+        parts.append("x" * rng.randint(50, 300))
+    return " ".join(parts).strip()
+
+
+def random_answers(rng: random.Random, max_answers: int = 12) -> Dict[str, str]:
+    """Question-answer pairs, possibly none"""
+    return {
+        f"{rng.choice(QUESTION_FRAGMENTS)} ({index})": random_answer(rng)
+        for index in range(rng.randint(0, max_answers))
+    }
@@ -0,0 +1,34 @@
+import random
+
+from app.models.transparency_scorer import TransparencyScorer
+from app.tests.factories import random_answers, random_product
+
+
+def test_calculate_scores_matches_calculate_score(scorer: TransparencyScorer):
+    rng = random.Random(6)
+    items = [(random_product(rng), random_answers(rng)) for _ in range(2000)]
+
+    results = scorer.calculate_scores(items)
+
+    assert len(results) == len(items)
+    for (product_info, answers), result in zip(items, results):
+        assert result == scorer.calculate_score(product_info, answers)
+
+
+def test_calculate_scores_edge_cases(scorer: TransparencyScorer):
+    items = [
+        ({"name": "No answers"}, {}),
+        ({"name": "Empty answers", "certifications": []}, {"How is it tested?": "", "Is it fair?": ""}),
+        ({"name": "Short answers", "country_of_origin": ""}, {"How is it tested?": "ok", "Is it green?": "1234"}),
+        ({"name": "Five characters", "certifications": None}, {"How is quality tested?": "12345"}),
+        ({"name": "No certifications or origin", "description": "A plain product"},
+         {"Where is it made?": "manufactured in Italy, tested and certified"}),
+    ]
+
+    results = scorer.calculate_scores(items)
+
+    assert results == [scorer.calculate_score(product_info, answers) for product_info, answers in items]
+
+
+def test_calculate_scores_empty(scorer: TransparencyScorer):
+    assert scorer.calculate_scores([]) == []
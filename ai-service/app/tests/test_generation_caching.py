@@ -0,0 +1,87 @@
+import asyncio
+import json
+import time
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.api.routes import get_question_generator, question_router
+from app.utils.question_cache import QuestionCache, question_cache
+from app.utils.question_index import question_index
+from benchmarks.stub_generator import StubQuestionGenerator
+
+PRODUCT = {"name": "Harvest Honey Granola", "category": "food"}
+
+
+@pytest.fixture(scope="module")
+def generator() -> StubQuestionGenerator:
+    return StubQuestionGenerator(decode_ms=0, per_sequence_ms=0)
+
+
+@pytest.fixture
+def client(generator: StubQuestionGenerator, monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setattr(question_index, "enabled", True)
+    question_cache.clear()
+    question_index.clear()
+    app = FastAPI()
+    app.include_router(question_router, prefix="/api")
+    app.dependency_overrides[get_question_generator] = lambda: generator
+    with TestClient(app) as test_client:
+        yield test_client
+    question_cache.clear()
+    question_index.clear()
+
+
+def cached(generator: StubQuestionGenerator, num_questions: int, mode: str = "quality"):
+    key = question_cache.make_key(PRODUCT, generator.prompt_fields, num_questions, generator.modes[mode].model_id)
+    return question_cache.get(key)
+
+
+def indexed(generator: StubQuestionGenerator, num_questions: int, mode: str = "quality"):
+    return question_index.lookup(PRODUCT, generator.prompt_fields, num_questions, generator.modes[mode].model_id)
+
+
+def test_outcome_reports_cut_short_generations(generator: StubQuestionGenerator):
+    outcome = {}
+    generator.generate(PRODUCT, 1, outcome=outcome)
+    assert outcome == {"complete": True}
+
+    # Seven distinct candidates cannot fill 20 slots: low-yield stop and generic fill
+    generator.generate(PRODUCT, 20, outcome=outcome)
+    assert outcome == {"complete": False}
+
+    generator.generate({"name": "Oat Milk"}, 5, deadline=time.monotonic() - 1, outcome=outcome)
+    assert outcome == {"complete": False}
+
+
+@pytest.mark.parametrize("path", ["/api/generate-questions", "/api/generate-questions/stream"])
+def test_padded_questions_are_returned_but_not_cached(client: TestClient, generator: StubQuestionGenerator,
+                                                      path: str):
+    response = client.post(path, json={"product": PRODUCT, "num_questions": 20})
+    assert response.status_code == 200
+    if path.endswith("stream"):
+        events = [json.loads(line) for line in response.text.splitlines()]
+        assert events[-1]["count"] == 20
+    else:
+        assert len(response.json()["questions"]) == 20
+    assert cached(generator, 20) is None
+    assert indexed(generator, 20) is None
+
+    response = client.post(path, json={"product": PRODUCT, "num_questions": 1})
+    assert response.status_code == 200
+    assert cached(generator, 1) is not None
+    assert indexed(generator, 1) is not None
+
+
+def test_get_or_generate_skips_uncacheable_results():
+    cache = QuestionCache()
+
+    async def generate():
+        return ["Where is it made?"], None, False
+
+    async def run():
+        return await cache.get_or_generate("key", generate)
+
+    assert asyncio.run(run()) == (["Where is it made?"], "key")
+    assert cache.get("key") is None
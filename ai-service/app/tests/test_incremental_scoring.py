@@ -0,0 +1,122 @@
+import math
+import random
+from typing import Dict, Any
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.api.routes import transparency_router
+from app.models.incremental_scorer import IncrementalScorer, UnknownProductError
+from app.models.transparency_scorer import TransparencyScorer
+from app.tests.factories import random_answer, random_answers, random_product
+
+
+@pytest.fixture
+def client():
+    from app.models.incremental_scorer import incremental_scorer
+    incremental_scorer.clear()
+    app = FastAPI()
+    app.include_router(transparency_router, prefix="/api")
+    with TestClient(app) as test_client:
+        yield test_client
+    incremental_scorer.clear()
+
+
+def random_delta(rng: random.Random, answers: Dict[str, str]) -> Dict[str, Any]:
+    """Removed, changed and added answers against the current answers"""
+    questions = list(answers)
+    removed = rng.sample(questions, rng.randint(0, min(3, len(questions))))
+    changed = {question: random_answer(rng) for question in rng.sample(questions, rng.randint(0, min(3, len(questions))))
+               if question not in removed}
+    added = random_answers(rng, max_answers=3)
+    return {"removed": removed, "answers": dict(changed, **{f"New {question}": answer for question, answer in added.items()})}
+
+
+def apply_delta(answers: Dict[str, str], delta: Dict[str, Any]) -> None:
+    """Apply a delta the way a client editing a dict of answers would"""
+    for question in delta["removed"]:
+        answers.pop(question, None)
+    answers.update(delta["answers"])
+
+
+def test_update_sequences_match_full_recompute(scorer: TransparencyScorer):
+    rng = random.Random(17)
+    store = IncrementalScorer(max_products=100)
+    for product_number in range(200):
+        product_id = f"product-{product_number}"
+        product_info, answers = random_product(rng), random_answers(rng)
+        assert store.register(scorer, product_id, product_info, answers)["verified"] is None
+        for _ in range(rng.randint(1, 8)):
+            delta = random_delta(rng, answers)
+            if rng.random() < 0.1:
+                product_info = random_product(rng)
+                result = store.update(scorer, product_id, product_info=product_info, **delta)
+            else:
+                result = store.update(scorer, product_id, **delta)
+            apply_delta(answers, delta)
+
+            expected = scorer.calculate_score(product_info, answers)
+            assert {key: result[key] for key in expected} == expected
+            assert result["answer_count"] == len(answers)
+            # The running total only differs from the left-to-right sum by float rounding
+            expected_sum = sum(scorer._evaluate_answer_quality(question, answer) for question, answer in answers.items())
+            assert math.isclose(store._states[product_id].quality_sum, expected_sum, rel_tol=1e-12, abs_tol=1e-12)
+
+
+def test_changed_answer_keeps_its_position(scorer: TransparencyScorer):
+    store = IncrementalScorer()
+    answers = {"How is it tested?": "tested", "Is it fair?": "certified fair trade", "Is it green?": "no"}
+    store.register(scorer, "p", {"name": "Tea"}, answers)
+    result = store.update(scorer, "p", answers={"How is it tested?": "tested in an independent lab, 100% verified"},
+                          verify=True)
+    assert result["verified"] is True
+
+
+def test_mismatch_resyncs_from_raw_answers(scorer: TransparencyScorer):
+    store = IncrementalScorer()
+    answers = {"How is it tested?": "tested in an independent lab", "Is it fair?": "certified fair trade"}
+    store.register(scorer, "p", {"name": "Tea"}, answers)
+    # Corrupt the cached features and totals so a rebuild from them would repeat the error
+    state = store._states["p"]
+    for question in answers:
+        state.add(question, answers[question], scorer._extract_answer_features(question, "no"))
+
+    result = store.update(scorer, "p", verify=True)
+    assert result["verified"] is False
+    assert result["score"] == scorer.calculate_score({"name": "Tea"}, answers)["score"]
+    assert store.update(scorer, "p", verify=True)["verified"] is True
+    assert store.stats()["mismatches"] == 1
+
+
+def test_update_of_unknown_product_raises(scorer: TransparencyScorer):
+    with pytest.raises(UnknownProductError):
+        IncrementalScorer().update(scorer, "missing", answers={"Q?": "A"})
+
+
+def test_put_patch_delete_match_calculate_score(client: TestClient, scorer: TransparencyScorer):
+    rng = random.Random(170)
+    for product_number in range(30):
+        path = f"/api/products/p{product_number}/transparency-score"
+        product_info = {key: value for key, value in random_product(rng).items() if value is not None}
+        answers = random_answers(rng)
+
+        response = client.put(path, json={"product": product_info, "answers": answers})
+        assert response.status_code == 200
+        for _ in range(rng.randint(1, 5)):
+            delta = random_delta(rng, answers)
+            response = client.patch(path, json=delta)
+            assert response.status_code == 200
+            apply_delta(answers, delta)
+
+            body = response.json()
+            expected = scorer.calculate_score(product_info, answers)
+            assert body["score"] == expected["score"]
+            assert body["feedback"] == expected["feedback"]
+            assert body["areas_for_improvement"] == expected["areas_for_improvement"]
+            assert body["answer_count"] == len(answers)
+
+        assert client.patch(path + "?verify=true", json={"answers": {}}).json()["verified"] is True
+        assert client.delete(path).status_code == 204
+        assert client.delete(path).status_code == 404
+        assert client.patch(path, json={"answers": {"Q?": "A"}}).status_code == 404
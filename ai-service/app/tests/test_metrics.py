@@ -0,0 +1,40 @@
+import threading
+
+from app.utils.metrics import Counter, Gauge, Histogram
+
+
+def run_threads(target, count: int) -> None:
+    for _ in range(count):
+        thread = threading.Thread(target=target)
+        thread.start()
+        thread.join()
+
+
+def test_exited_threads_are_merged_and_dropped():
+    counter = Counter("test_requests_total", "Requests")
+    histogram = Histogram("test_latency_seconds", "Latency", buckets=(0.1, 1.0))
+    gauge = Gauge("test_in_flight", "In flight")
+
+    def record():
+        counter.inc()
+        histogram.observe(0.5)
+        gauge.inc(2)
+
+    run_threads(record, 500)
+    counter.inc()
+
+    assert counter.value() == 501
+    assert histogram.snapshot() == {"count": 500, "sum": 250.0}
+    assert gauge.value() == 1000
+    # Only the calling thread's array is left
+    for metric in (counter, histogram, gauge):
+        assert len(metric._shards._arrays) <= 1
+    assert 'test_latency_seconds_bucket{le="1"} 500' in histogram.render()
+
+
+def test_arrays_are_pruned_without_reads():
+    counter = Counter("test_jobs_total", "Jobs")
+    run_threads(counter.inc, 100)
+
+    assert len(counter._shards._arrays) == 1
+    assert counter.value() == 100
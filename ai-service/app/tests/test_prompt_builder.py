@@ -0,0 +1,106 @@
+import os
+import random
+from typing import Dict, Any
+
+import pytest
+
+from app.models.prompt_builder import FIELD_LABELS, PREAMBLE, PROMPT_FIELDS, SUFFIX, PromptBuilder, parse_budgets
+from app.tests.factories import random_product
+
+# Tokenizer of the deployed model; point at a local copy to run offline
+TEST_TOKENIZER = os.getenv("QUESTION_TEST_TOKENIZER", "google/flan-t5-base")
+
+
+@pytest.fixture(scope="module")
+def tokenizer():
+    transformers = pytest.importorskip("transformers")
+    try:
+        return transformers.AutoTokenizer.from_pretrained(TEST_TOKENIZER)
+    except (OSError, ValueError) as e:
+        pytest.skip(f"Tokenizer {TEST_TOKENIZER} is not available: {e}")
+
+
+def full_prompt(product_info: Dict[str, Any]) -> str:
+    """The untruncated prompt text of a product"""
+    prompt = PREAMBLE
+    for field in PROMPT_FIELDS:
+        text = PromptBuilder.field_text(product_info, field)
+        if text:
+            prompt += f"{FIELD_LABELS[field]}: {text}\n"
+    return prompt + SUFFIX
+
+
+def long_product(rng: random.Random) -> Dict[str, Any]:
+    sentences = [f"Batch {i} of our granola is baked slowly and loved by families everywhere." for i in range(300)]
+    rng.shuffle(sentences)
+    return {
+        "name": "Harvest Honey Granola " * 20,
+        "description": " ".join(sentences) + " The oats are grown on certified organic farms in Sweden.",
+        "category": "food",
+        "ingredients": ["rolled oats", "honey", "sunflower seeds", "almonds"] * 40,
+        "manufacturing_process": "Mixed, baked and packed in our own bakery. " * 50,
+        "country_of_origin": "Sweden",
+        "certifications": ["EU Organic", "Fair Trade", "Vegan"] * 10,
+    }
+
+
+def test_build_matches_whole_prompt_tokenization(tokenizer):
+    builder = PromptBuilder(tokenizer)
+    products = [
+        {"name": ""},
+        {"name": "Organic Honey", "ingredients": ["honey", "", "bee pollen"]},
+        {"name": "Organic Honey", "description": "Raw honey from NZ. Cold extracted.", "category": "food",
+         "country_of_origin": "New Zealand", "certifications": ["organic"]},
+        # Whitespace and punctuation that tokenize differently on their own than inside the prompt
+        {"name": "Granola", "category": " "},
+        {"name": '".', "country_of_origin": "\t "},
+        {"name": " \n", "description": " ", "ingredients": ";", "country_of_origin": "\xa0"},
+    ]
+
+    for product_info in products:
+        assert builder.build(product_info) == tokenizer(full_prompt(product_info)).input_ids
+    assert builder.stats()["truncations"] == {}
+
+
+def test_build_without_truncation_matches_whole_prompt_tokenization(tokenizer):
+    rng = random.Random(23)
+    builder = PromptBuilder(tokenizer, budgets={field: 10 ** 6 for field in PROMPT_FIELDS}, max_tokens=10 ** 6)
+
+    for _ in range(200):
+        product_info = random_product(rng)
+        assert builder.build(product_info) == tokenizer(full_prompt(product_info)).input_ids
+    assert builder.stats()["truncations"] == {}
+
+
+@pytest.mark.parametrize("field_tokens", [0, 16, 64, 256])
+def test_build_stays_within_max_tokens(tokenizer, field_tokens: int):
+    rng = random.Random(field_tokens)
+    max_tokens = len(tokenizer(PREAMBLE + SUFFIX).input_ids) + field_tokens
+    builder = PromptBuilder(tokenizer, max_tokens=max_tokens)
+
+    for _ in range(5):
+        ids = builder.build(long_product(rng))
+        assert len(ids) <= max_tokens
+        assert ids[-1] == tokenizer.eos_token_id
+    assert bool(builder.stats()["truncations"]) == (field_tokens > 0)
+
+
+def test_input_ids_are_cached(tokenizer):
+    builder = PromptBuilder(tokenizer, cache_size=1)
+    product_info = {"name": "Organic Honey", "category": "food"}
+
+    first = builder.input_ids(product_info)
+    assert builder.input_ids(dict(product_info)) == first
+    builder.input_ids({"name": "Oat Milk"})
+    builder.input_ids(product_info)
+
+    stats = builder.stats()
+    assert (stats["builds"], stats["cache_hits"], stats["cached_prompts"]) == (3, 1, 1)
+
+
+def test_parse_budgets():
+    assert parse_budgets("") == {}
+    assert parse_budgets(" description=256, ingredients = 32 ,") == {"description": 256, "ingredients": 32}
+    for value in ("colour=8", "description", "description=-1", "description=many"):
+        with pytest.raises(ValueError):
+            parse_budgets(value)
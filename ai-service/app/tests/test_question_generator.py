@@ -0,0 +1,42 @@
+import time
+
+import pytest
+
+from app.models.question_generator import FALLBACK_QUESTIONS
+from benchmarks.stub_generator import StubQuestionGenerator
+
+
+class SilentGenerator(StubQuestionGenerator):
+    """Stub whose model only ever produces empty candidates"""
+
+    def sample(self, inputs, num_sequences: int, cancel_token=None, mode: str = None) -> list:
+        return [""] * num_sequences
+
+
+@pytest.fixture(scope="module")
+def generator() -> StubQuestionGenerator:
+    return StubQuestionGenerator(decode_ms=0, per_sequence_ms=0)
+
+
+@pytest.mark.parametrize("num_questions", [1, 5, 12, 20])
+def test_low_yield_still_returns_num_questions(generator: StubQuestionGenerator, num_questions: int):
+    # The stub has only seven distinct candidates, so larger requests stop on low yield
+    questions = generator.generate({"name": "Harvest Honey Granola"}, num_questions)
+
+    assert len(questions) == num_questions
+    assert len(set(questions)) == num_questions
+
+
+@pytest.mark.parametrize("mode", ["fast", "balanced", "quality"])
+def test_deadline_stop_still_returns_num_questions(generator: StubQuestionGenerator, mode: str):
+    questions = generator.generate({"name": "Oat Milk"}, 20, deadline=time.monotonic() - 1, mode=mode)
+
+    assert len(questions) == 20
+    assert len(set(questions)) == 20
+
+
+def test_fallbacks_fill_every_slot_without_model_questions():
+    questions = SilentGenerator(decode_ms=0, per_sequence_ms=0).generate({"name": "Tea"}, 20)
+
+    assert len(set(questions)) == 20
+    assert questions[:len(FALLBACK_QUESTIONS)] == [template.format(name="Tea") for template in FALLBACK_QUESTIONS]
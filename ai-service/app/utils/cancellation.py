@@ -0,0 +1,75 @@
+import time
+import threading
+from typing import Optional
+
+# Cancellation reasons
+DISCONNECTED = "disconnected"
+DEADLINE = "deadline"
+# Background jobs: the job was deleted, or the service is shutting down
+JOB_DELETED = "job_deleted"
+SHUTDOWN = "shutdown"
+
+
+class GenerationCancelled(Exception):
+    """Raised inside generation when its request was cancelled"""
+
+    def __init__(self, reason: str):
+        super().__init__(f"Generation cancelled ({reason})")
+        self.reason = reason
+
+
+class CancellationToken:
+    """Request-scoped cancellation flag shared between the event loop and pool threads
+
+    The token is cancelled explicitly (e.g. when the client disconnects) or
+    implicitly once its deadline passes. Checking it is cheap enough to do
+    on every decoding step.
+    """
+
+    def __init__(self, deadline: Optional[float] = None):
+        """Initialize the token
+
+        Args:
+            deadline: Optional time.monotonic() timestamp after which the token counts as cancelled
+        """
+        self.deadline = deadline
+        self.reason: Optional[str] = None
+        self._event = threading.Event()
+
+    def cancel(self, reason: str) -> None:
+        """Cancel the token; the first reason wins"""
+        if not self._event.is_set():
+            self.reason = reason
+            self._event.set()
+
+    @property
+    def cancelled(self) -> bool:
+        """Whether work for this request should stop"""
+        if self._event.is_set():
+            return True
+        if self.deadline is not None and time.monotonic() >= self.deadline:
+            self.cancel(DEADLINE)
+            return True
+        return False
+
+    def raise_if_cancelled(self) -> None:
+        """Raise GenerationCancelled if the token is cancelled"""
+        if self.cancelled:
+            raise GenerationCancelled(self.reason)
+
+
+def parse_deadline_header(value: str) -> float:
+    """Convert an X-Request-Deadline header to a time.monotonic() timestamp
+
+    The header holds the absolute Unix time after which the client stops
+    waiting, in seconds (fractions allowed) or milliseconds, as produced
+    by Date.now() in JavaScript.
+
+    Raises:
+        ValueError: If the value is not a number
+    """
+    timestamp = float(value)
+    if timestamp > 1e11:
+        # Milliseconds since the epoch
+        timestamp /= 1000
+    return time.monotonic() + (timestamp - time.time())
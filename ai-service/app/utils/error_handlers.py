@@ -1,4 +1,4 @@
-from fastapi import Request, status
+from fastapi import Request, HTTPException, status
 from fastapi.responses import JSONResponse
 from fastapi.exceptions import RequestValidationError
 from typing import Dict, Any, List, Union
@@ -40,6 +40,29 @@ async def validation_exception_handler(request: Request, exc: RequestValidationE
         }
     )
 
+async def http_exception_handler(request: Request, exc: HTTPException) -> JSONResponse:
+    """Handle HTTP exceptions and return a standardized response
+    
+    Args:
+        request: The request that caused the exception
+        exc: The HTTP exception
+        
+    Returns:
+        JSONResponse with the exception's status code and headers
+    """
+    # Log the HTTP error
+    logger.error(f"HTTP error: {exc.detail}")
+    
+    # Return standardized error response, keeping headers such as Retry-After
+    return JSONResponse(
+        status_code=exc.status_code,
+        content={
+            "status": "error",
+            "message": exc.detail
+        },
+        headers=exc.headers
+    )
+
 async def general_exception_handler(request: Request, exc: Exception) -> JSONResponse:
     """Handle general exceptions and return a standardized response
     
@@ -0,0 +1,207 @@
+import os
+import asyncio
+import contextvars
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Dict, Any, AsyncIterator, Callable, Iterator, Optional
+from dotenv import load_dotenv
+
+from app.utils.profiling import active_profile
+
+# Load environment variables
+load_dotenv()
+
+
+# Marks the end of a streamed iterator
+_STREAM_END = object()
+
+
+class PoolSaturatedError(Exception):
+    """Raised when an inference pool cannot admit more work"""
+
+    def __init__(self, pool_name: str, retry_after: int):
+        super().__init__(f"{pool_name} pool is saturated, retry after {retry_after}s")
+        self.pool_name = pool_name
+        self.retry_after = retry_after
+
+
+class InferencePool:
+    """Dedicated executor with a bounded admission queue
+
+    Blocking model calls run on the pool's own threads so the event loop
+    stays free for other requests. At most ``max_concurrency`` calls run at
+    once and at most ``max_queue`` more wait; anything beyond that is
+    rejected immediately with PoolSaturatedError. Background work from other
+    threads is admitted through try_run, under the same concurrency limit.
+    """
+
+    def __init__(self, name: str, max_concurrency: int, max_queue: int, retry_after: int):
+        """Initialize the pool
+
+        Args:
+            name: Pool name used in logs and statistics
+            max_concurrency: Number of calls allowed to run at the same time
+            max_queue: Number of admitted calls allowed to wait for a thread
+            retry_after: Seconds suggested to rejected clients
+        """
+        self.name = name
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_queue = max(0, max_queue)
+        self.retry_after = retry_after
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+        # Admission is decided on the event loop and, for try_run, on background threads
+        self._lock = threading.Lock()
+        self._admitted = 0
+        self._completed = 0
+        self._rejected = 0
+
+    def submit(self, func: Callable, *args, **kwargs) -> asyncio.Future:
+        """Admit a blocking callable and start it on the pool
+
+        Must be called from the event loop. Admission is decided synchronously,
+        so callers can reject a request before sending any response.
+
+        Raises:
+            PoolSaturatedError: If the pool and its queue are full
+        """
+        executor = self._admit(self.max_concurrency + self.max_queue, count_rejection=True)
+        loop = asyncio.get_running_loop()
+        session = active_profile.get()
+        if session is not None:
+            # Profiled request: run cProfile on the pool thread for this call
+            func = partial(session.run, func)
+        # Run in a copy of the caller's context so request-scoped values such as the request ID follow the call
+        context = contextvars.copy_context()
+        future = loop.run_in_executor(executor, partial(context.run, func, *args, **kwargs))
+        # Release the slot when the call actually finishes, even if the caller stopped waiting
+        future.add_done_callback(self._release)
+        return future
+
+    def _admit(self, limit: int, count_rejection: bool) -> ThreadPoolExecutor:
+        """Take an admission slot if fewer than limit are taken; returns the executor, created on first use"""
+        with self._lock:
+            if self._admitted >= limit:
+                self._rejected += count_rejection
+                raise PoolSaturatedError(self.name, self.retry_after)
+            self._admitted += 1
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_concurrency,
+                    thread_name_prefix=f"{self.name}-pool"
+                )
+            return self._executor
+
+    def _release(self, future) -> None:
+        """Free an admission slot"""
+        with self._lock:
+            self._admitted -= 1
+            self._completed += 1
+
+    def try_run(self, func: Callable, *args, **kwargs) -> Any:
+        """Run a blocking callable on the pool from a thread outside the event loop
+
+        Background work is admitted only while a pool thread is free and never
+        takes a queue slot, so it cannot push requests into rejection; callers
+        retry later. Rejections here are not counted in the statistics.
+
+        Raises:
+            PoolSaturatedError: If every pool thread is busy or queued work is waiting
+        """
+        executor = self._admit(self.max_concurrency, count_rejection=False)
+        try:
+            future = executor.submit(contextvars.copy_context().run, func, *args, **kwargs)
+        except RuntimeError:
+            # The pool was shut down after admission
+            self._release(None)
+            raise
+        future.add_done_callback(self._release)
+        return future.result()
+
+    async def run(self, func: Callable, *args, **kwargs) -> Any:
+        """Run a blocking callable on the pool and wait for its result
+
+        Raises:
+            PoolSaturatedError: If the pool and its queue are full
+        """
+        # Shield the executor future so a cancelled caller doesn't free the slot early
+        return await asyncio.shield(self.submit(func, *args, **kwargs))
+
+    def stream(self, make_iterator: Callable[[], Iterator]) -> AsyncIterator:
+        """Admit a blocking iterator and consume it on the pool
+
+        Items are handed to the event loop as soon as the iterator produces them.
+        Closing the returned async iterator stops the blocking iterator before
+        its next item.
+
+        Args:
+            make_iterator: Callable returning the iterator, called on a pool thread
+
+        Returns:
+            Async iterator over the produced items; re-raises the iterator's error
+
+        Raises:
+            PoolSaturatedError: If the pool and its queue are full
+        """
+        loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue()
+        stop = threading.Event()
+
+        def produce():
+            try:
+                for item in make_iterator():
+                    if stop.is_set():
+                        break
+                    loop.call_soon_threadsafe(queue.put_nowait, item)
+            finally:
+                loop.call_soon_threadsafe(queue.put_nowait, _STREAM_END)
+
+        future = self.submit(produce)
+
+        async def items():
+            try:
+                while True:
+                    item = await queue.get()
+                    if item is _STREAM_END:
+                        break
+                    yield item
+                await future
+            finally:
+                stop.set()
+
+        return items()
+
+    def shutdown(self) -> None:
+        """Wait for running calls and release the threads"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    def stats(self) -> Dict[str, Any]:
+        """Return admission statistics"""
+        return {
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+            "in_flight": min(self._admitted, self.max_concurrency),
+            "queued": max(0, self._admitted - self.max_concurrency),
+            "completed": self._completed,
+            "rejected": self._rejected,
+        }
+
+
+# Question generation is slow and memory heavy, so it gets a small pool
+generation_pool = InferencePool(
+    "generation",
+    max_concurrency=int(os.getenv("GENERATION_MAX_CONCURRENCY", 8)),
+    max_queue=int(os.getenv("GENERATION_MAX_QUEUE", 16)),
+    retry_after=int(os.getenv("GENERATION_RETRY_AFTER", 5))
+)
+
+# Scoring is cheap, so it gets its own larger pool and is never starved by generation
+scoring_pool = InferencePool(
+    "scoring",
+    max_concurrency=int(os.getenv("SCORING_MAX_CONCURRENCY", 8)),
+    max_queue=int(os.getenv("SCORING_MAX_QUEUE", 64)),
+    retry_after=int(os.getenv("SCORING_RETRY_AFTER", 1))
+)
@@ -0,0 +1,491 @@
+import os
+import json
+import time
+import uuid
+import socket
+import logging
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Dict, Any, Callable, Iterator, List, Optional, Tuple
+from dotenv import load_dotenv
+
+from app.utils.cancellation import CancellationToken, GenerationCancelled, JOB_DELETED, SHUTDOWN
+from app.utils.metrics import job_submissions, job_items, job_queue_wait
+
+# Load environment variables
+load_dotenv()
+
+# Configure logger
+logger = logging.getLogger(__name__)
+
+# Priority names and their sort order (lower runs first)
+PRIORITIES = {"high": 0, "normal": 1, "low": 2}
+PRIORITY_NAMES = {value: name for name, value in PRIORITIES.items()}
+
+# Job states
+QUEUED = "queued"
+RUNNING = "running"
+COMPLETED = "completed"
+FAILED = "failed"
+
+# Item states (queued and running as above)
+DONE = "done"
+ERROR = "error"
+
+ITEMS_COMPLETED = job_items.labels("completed")
+ITEMS_FAILED = job_items.labels("failed")
+ITEMS_REQUEUED = job_items.labels("requeued")
+
+# Handler for one item: (product, job options, cancel token) -> JSON-serializable result
+ItemHandler = Callable[[Dict[str, Any], Dict[str, Any], CancellationToken], Dict[str, Any]]
+
+
+def pid_alive(pid: int) -> bool:
+    """Whether a process with this pid exists on this host"""
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class JobQueueFullError(Exception):
+    """Raised when a submission would exceed the number of queued items allowed"""
+
+    def __init__(self, queued: int, retry_after: int):
+        super().__init__(f"Job queue is full ({queued} items queued), retry after {retry_after}s")
+        self.queued = queued
+        self.retry_after = retry_after
+
+
+class JobQueue:
+    """Persistent priority queue of question generation jobs with an in-process worker pool
+
+    A job holds one or more products. Jobs and their items live in SQLite, so
+    queued work survives restarts, and worker threads claim single items
+    ordered by priority, then submission order. A large job is therefore
+    spread over every worker, and a high-priority job overtakes queued
+    lower-priority items. A claimed item holds a lease; items whose worker
+    died are queued again once the lease runs out, at most max_attempts
+    times. Several processes can share one database file. Results are kept
+    for a job's result TTL after it finishes, then deleted.
+    """
+
+    def __init__(self, db_path: Optional[str] = None, workers: int = 2, result_ttl: float = 86400,
+                 lease_seconds: float = 300, max_attempts: int = 3, max_queued_items: int = 10000,
+                 poll_interval: float = 1.0, retry_after: int = 30):
+        """Initialize the queue
+
+        Args:
+            db_path: SQLite file holding jobs; None keeps them in memory only
+            workers: Number of worker threads processing items
+            result_ttl: Default seconds a finished job's results are kept
+            lease_seconds: Seconds a claimed item may run before it is queued again
+            max_attempts: Claims an item gets before it is failed
+            max_queued_items: Unfinished items allowed before submissions are rejected
+            poll_interval: Seconds idle workers wait before checking the database again
+            retry_after: Seconds suggested to rejected clients
+        """
+        self.db_path = db_path
+        self.workers = max(0, workers)
+        self.result_ttl = result_ttl
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max(1, max_attempts)
+        self.max_queued_items = max(1, max_queued_items)
+        self.poll_interval = poll_interval
+        self.retry_after = retry_after
+
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._threads: List[threading.Thread] = []
+        self._handler: Optional[ItemHandler] = None
+        self._last_sweep = 0.0
+        # Cancel tokens of the items running in this process, by job sequence number
+        self._running: Dict[int, List[CancellationToken]] = {}
+
+        # Opened lazily and per process, since SQLite connections must not cross a fork
+        self._db: Optional[sqlite3.Connection] = None
+        self._db_pid: Optional[int] = None
+
+        # Counters
+        self._submitted = 0
+        self._completed = 0
+        self._failed = 0
+        self._requeued = 0
+        self._expired = 0
+
+    def _connection(self) -> sqlite3.Connection:
+        """Return this process's connection to the job store; called with the lock held"""
+        if self._db is None or self._db_pid != os.getpid():
+            # Autocommit mode: transactions are opened explicitly with BEGIN IMMEDIATE
+            self._db = sqlite3.connect(self.db_path or ":memory:", check_same_thread=False,
+                                       isolation_level=None, timeout=30)
+            self._db_pid = os.getpid()
+            if self.db_path:
+                self._db.execute("PRAGMA journal_mode=WAL")
+                self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.executescript(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                "seq INTEGER PRIMARY KEY AUTOINCREMENT, id TEXT NOT NULL UNIQUE, priority INTEGER NOT NULL, "
+                "status TEXT NOT NULL, options TEXT NOT NULL, total INTEGER NOT NULL, "
+                "completed INTEGER NOT NULL DEFAULT 0, failed INTEGER NOT NULL DEFAULT 0, "
+                "created_at REAL NOT NULL, started_at REAL, finished_at REAL, "
+                "result_ttl REAL NOT NULL, expires_at REAL);"
+                "CREATE TABLE IF NOT EXISTS job_items ("
+                "job_seq INTEGER NOT NULL, idx INTEGER NOT NULL, priority INTEGER NOT NULL, "
+                "state TEXT NOT NULL, product TEXT NOT NULL, result TEXT, error TEXT, "
+                "claim TEXT, lease_until REAL, attempts INTEGER NOT NULL DEFAULT 0, "
+                "PRIMARY KEY (job_seq, idx));"
+                "CREATE INDEX IF NOT EXISTS job_items_by_state ON job_items (state, priority, job_seq, idx);"
+                "CREATE INDEX IF NOT EXISTS jobs_by_expiry ON jobs (expires_at);"
+            )
+            if self.db_path:
+                logger.info(f"Job queue persisting to {self.db_path}")
+        return self._db
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        """Hold the lock and a write transaction, committed on success and rolled back on error"""
+        with self._lock:
+            db = self._connection()
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                yield db
+            except BaseException:
+                db.execute("ROLLBACK")
+                raise
+            db.execute("COMMIT")
+
+    def start(self, handler: ItemHandler) -> None:
+        """Start the worker threads
+
+        Args:
+            handler: Called with (product, job options, cancel token) for each item;
+                its return value is stored as the item's result
+        """
+        if self._threads:
+            return
+        self._handler = handler
+        self._stopping.clear()
+        if self.workers:
+            self._recover()
+        for number in range(self.workers):
+            thread = threading.Thread(target=self._work, name=f"job-worker-{number}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        if self.workers:
+            logger.info(f"Job queue started with {self.workers} workers")
+
+    def stop(self) -> None:
+        """Stop the workers; items they are running are cancelled and queued again"""
+        if not self._threads:
+            return
+        self._stopping.set()
+        self._wakeup.set()
+        with self._lock:
+            for tokens in self._running.values():
+                for token in tokens:
+                    token.cancel(SHUTDOWN)
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+
+    def submit(self, products: List[Dict[str, Any]], options: Dict[str, Any], priority: str = "normal",
+               result_ttl: Optional[float] = None) -> Dict[str, Any]:
+        """Queue a job
+
+        Args:
+            products: Products to generate questions for, one item each
+            options: Job-wide settings passed to the handler with every product
+            priority: high, normal or low
+            result_ttl: Seconds the results are kept after the job finishes (default result_ttl)
+
+        Returns:
+            The job as returned by get, without results
+
+        Raises:
+            JobQueueFullError: If the queue already holds max_queued_items unfinished items
+        """
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        with self._transaction() as db:
+            queued = db.execute(
+                "SELECT COUNT(*) FROM job_items WHERE state IN (?, ?)", (QUEUED, RUNNING)
+            ).fetchone()[0]
+            if queued + len(products) > self.max_queued_items:
+                raise JobQueueFullError(queued, self.retry_after)
+            seq = db.execute(
+                "INSERT INTO jobs (id, priority, status, options, total, created_at, result_ttl) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (job_id, PRIORITIES[priority], QUEUED, json.dumps(options), len(products), now,
+                 result_ttl or self.result_ttl)
+            ).lastrowid
+            db.executemany(
+                "INSERT INTO job_items (job_seq, idx, priority, state, product) VALUES (?, ?, ?, ?, ?)",
+                [(seq, index, PRIORITIES[priority], QUEUED, json.dumps(product))
+                 for index, product in enumerate(products)]
+            )
+        self._submitted += 1
+        job_submissions.labels(priority).inc()
+        self._wakeup.set()
+        return self.get(job_id, include_results=False)
+
+    def get(self, job_id: str, include_results: bool = True) -> Optional[Dict[str, Any]]:
+        """Return a job's status and, optionally, the results of its finished items
+
+        Returns:
+            Dictionary with job_id, status, priority, total, completed, failed,
+            timestamps and results (a list of {index, ...result} or {index, error}
+            ordered by index), or None if the job is unknown or expired
+        """
+        with self._lock:
+            db = self._connection()
+            row = db.execute(
+                "SELECT seq, id, priority, status, total, completed, failed, created_at, started_at, "
+                "finished_at, expires_at FROM jobs WHERE id = ?", (job_id,)
+            ).fetchone()
+            if row is None or (row[10] is not None and row[10] <= time.time()):
+                return None
+            items = []
+            if include_results:
+                items = db.execute(
+                    "SELECT idx, state, result, error FROM job_items WHERE job_seq = ? AND state IN (?, ?) "
+                    "ORDER BY idx", (row[0], DONE, ERROR)
+                ).fetchall()
+
+        job = {
+            "job_id": row[1],
+            "status": row[3],
+            "priority": PRIORITY_NAMES[row[2]],
+            "total": row[4],
+            "completed": row[5],
+            "failed": row[6],
+            "created_at": row[7],
+            "started_at": row[8],
+            "finished_at": row[9],
+            "expires_at": row[10],
+            "results": None,
+        }
+        if include_results:
+            job["results"] = [
+                dict(json.loads(result), index=index) if state == DONE else {"index": index, "error": error}
+                for index, state, result, error in items
+            ]
+        return job
+
+    def delete(self, job_id: str) -> bool:
+        """Delete a job and its results, cancelling its running items; returns False if unknown"""
+        with self._transaction() as db:
+            row = db.execute("SELECT seq FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if row is None:
+                return False
+            db.execute("DELETE FROM job_items WHERE job_seq = ?", (row[0],))
+            db.execute("DELETE FROM jobs WHERE seq = ?", (row[0],))
+            # Items of this job running in other processes find their rows gone and are dropped
+            for token in self._running.get(row[0], ()):
+                token.cancel(JOB_DELETED)
+        return True
+
+    def _claim(self) -> Optional[Tuple[int, int, str, float, Dict[str, Any], Dict[str, Any]]]:
+        """Lease the next queued item: (job seq, index, claim, job created_at, product, options)"""
+        now = time.time()
+        claim = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        with self._transaction() as db:
+            row = db.execute(
+                "SELECT job_seq, idx, product FROM job_items WHERE state = ? "
+                "ORDER BY priority, job_seq, idx LIMIT 1", (QUEUED,)
+            ).fetchone()
+            if row is None:
+                return None
+            job_seq, index, product = row
+            db.execute(
+                "UPDATE job_items SET state = ?, claim = ?, lease_until = ?, attempts = attempts + 1 "
+                "WHERE job_seq = ? AND idx = ?", (RUNNING, claim, now + self.lease_seconds, job_seq, index)
+            )
+            db.execute(
+                "UPDATE jobs SET status = ?, started_at = COALESCE(started_at, ?) WHERE seq = ? AND status = ?",
+                (RUNNING, now, job_seq, QUEUED)
+            )
+            options, created_at = db.execute(
+                "SELECT options, created_at FROM jobs WHERE seq = ?", (job_seq,)
+            ).fetchone()
+        return job_seq, index, claim, created_at, json.loads(product), json.loads(options)
+
+    def _finish(self, job_seq: int, index: int, claim: str, result: Optional[Dict[str, Any]],
+                error: Optional[str]) -> None:
+        """Store an item's result or error and finish the job once every item is done"""
+        now = time.time()
+        with self._transaction() as db:
+            updated = db.execute(
+                "UPDATE job_items SET state = ?, result = ?, error = ?, lease_until = NULL "
+                "WHERE job_seq = ? AND idx = ? AND state = ? AND claim = ?",
+                (ERROR if error is not None else DONE, None if result is None else json.dumps(result), error,
+                 job_seq, index, RUNNING, claim)
+            ).rowcount
+            if not updated:
+                # Deleted meanwhile, or the lease ran out and another worker took the item over
+                return
+            self._count_finished(db, job_seq, failed=error is not None, now=now)
+
+    def _count_finished(self, db: sqlite3.Connection, job_seq: int, failed: bool, now: float) -> None:
+        """Add a finished item to its job's totals; called inside a transaction"""
+        column = "failed" if failed else "completed"
+        db.execute(f"UPDATE jobs SET {column} = {column} + 1 WHERE seq = ?", (job_seq,))
+        total, completed, failed_items, result_ttl = db.execute(
+            "SELECT total, completed, failed, result_ttl FROM jobs WHERE seq = ?", (job_seq,)
+        ).fetchone()
+        if completed + failed_items == total:
+            # A job fails only when none of its items succeeded
+            db.execute(
+                "UPDATE jobs SET status = ?, finished_at = ?, expires_at = ? WHERE seq = ?",
+                (COMPLETED if completed else FAILED, now, now + result_ttl, job_seq)
+            )
+
+    def _requeue(self, job_seq: int, index: int, claim: str) -> None:
+        """Put an item interrupted by shutdown back in the queue without counting the attempt"""
+        with self._transaction() as db:
+            db.execute(
+                "UPDATE job_items SET state = ?, claim = NULL, lease_until = NULL, attempts = attempts - 1 "
+                "WHERE job_seq = ? AND idx = ? AND state = ? AND claim = ?",
+                (QUEUED, job_seq, index, RUNNING, claim)
+            )
+
+    def _release(self, db: sqlite3.Connection, stale: List[Tuple[int, int, int]], now: float) -> None:
+        """Queue again (job seq, index, attempts) items whose worker is gone; called inside a transaction
+
+        Items that used up their attempts are failed instead, so a product that
+        crashes the process cannot take down every restart.
+        """
+        for job_seq, index, attempts in stale:
+            if attempts >= self.max_attempts:
+                db.execute(
+                    "UPDATE job_items SET state = ?, error = ?, lease_until = NULL WHERE job_seq = ? AND idx = ?",
+                    (ERROR, f"Abandoned after {attempts} attempts", job_seq, index)
+                )
+                self._count_finished(db, job_seq, failed=True, now=now)
+                self._failed += 1
+                ITEMS_FAILED.inc()
+            else:
+                db.execute(
+                    "UPDATE job_items SET state = ?, claim = NULL, lease_until = NULL WHERE job_seq = ? AND idx = ?",
+                    (QUEUED, job_seq, index)
+                )
+                self._requeued += 1
+                ITEMS_REQUEUED.inc()
+
+    def _recover(self) -> None:
+        """Release items left running by earlier processes on this host without waiting for their lease"""
+        host = socket.gethostname()
+        with self._transaction() as db:
+            stale = []
+            for job_seq, index, attempts, claim in db.execute(
+                "SELECT job_seq, idx, attempts, claim FROM job_items WHERE state = ? AND claim LIKE ?",
+                (RUNNING, f"{host}:%")
+            ).fetchall():
+                pid = int(claim.split(":")[1])
+                # Nothing has been claimed yet, so a claim under this pid is from a previous run
+                if pid == os.getpid() or not pid_alive(pid):
+                    stale.append((job_seq, index, attempts))
+            self._release(db, stale, time.time())
+        if stale:
+            logger.info(f"Job queue released {len(stale)} items interrupted by a restart")
+
+    def _sweep(self) -> None:
+        """Queue again items whose lease ran out and delete expired jobs"""
+        now = time.time()
+        with self._transaction() as db:
+            stale = db.execute(
+                "SELECT job_seq, idx, attempts FROM job_items WHERE state = ? AND lease_until < ?", (RUNNING, now)
+            ).fetchall()
+            self._release(db, stale, now)
+            expired = [seq for (seq,) in db.execute("SELECT seq FROM jobs WHERE expires_at <= ?", (now,))]
+            for seq in expired:
+                db.execute("DELETE FROM job_items WHERE job_seq = ?", (seq,))
+                db.execute("DELETE FROM jobs WHERE seq = ?", (seq,))
+            self._expired += len(expired)
+        if stale:
+            logger.warning(f"Job queue requeued or failed {len(stale)} items whose lease ran out")
+        self._last_sweep = now
+
+    def _work(self) -> None:
+        """Worker thread loop"""
+        while not self._stopping.is_set():
+            try:
+                if time.time() - self._last_sweep >= self.poll_interval * 10:
+                    self._sweep()
+                claimed = self._claim()
+            except Exception as e:
+                logger.error(f"Job queue error: {str(e)}", exc_info=True)
+                claimed = None
+            if claimed is None:
+                self._wakeup.wait(self.poll_interval)
+                self._wakeup.clear()
+                continue
+            self._run_item(*claimed)
+
+    def _run_item(self, job_seq: int, index: int, claim: str, created_at: float, product: Dict[str, Any],
+                  options: Dict[str, Any]) -> None:
+        """Run the handler on a claimed item and record the outcome"""
+        job_queue_wait.observe(max(0.0, time.time() - created_at))
+        token = CancellationToken()
+        with self._lock:
+            self._running.setdefault(job_seq, []).append(token)
+        result, error = None, None
+        try:
+            result = self._handler(product, options, token)
+        except GenerationCancelled as e:
+            if e.reason == SHUTDOWN:
+                self._requeue(job_seq, index, claim)
+            return
+        except Exception as e:
+            logger.error(f"Job item {index} failed: {str(e)}")
+            error = str(e)
+        finally:
+            with self._lock:
+                tokens = self._running[job_seq]
+                tokens.remove(token)
+                if not tokens:
+                    del self._running[job_seq]
+
+        self._finish(job_seq, index, claim, result, error)
+        if error is None:
+            self._completed += 1
+            ITEMS_COMPLETED.inc()
+        else:
+            self._failed += 1
+            ITEMS_FAILED.inc()
+
+    def stats(self) -> Dict[str, Any]:
+        """Return queue depth and item counters"""
+        with self._lock:
+            counts = dict(self._connection().execute(
+                "SELECT state, COUNT(*) FROM job_items WHERE state IN (?, ?) GROUP BY state", (QUEUED, RUNNING)
+            ).fetchall())
+        return {
+            "workers": len(self._threads),
+            "persistent": bool(self.db_path),
+            "queued_items": counts.get(QUEUED, 0),
+            "running_items": counts.get(RUNNING, 0),
+            "max_queued_items": self.max_queued_items,
+            "submitted_jobs": self._submitted,
+            "completed_items": self._completed,
+            "failed_items": self._failed,
+            "requeued_items": self._requeued,
+            "expired_jobs": self._expired,
+        }
+
+
+# Shared queue for the /api/jobs endpoints
+job_queue = JobQueue(
+    db_path=os.getenv("JOB_DB", "jobs.db") or None,
+    workers=int(os.getenv("JOB_WORKERS", 2)),
+    result_ttl=float(os.getenv("JOB_RESULT_TTL", 86400)),
+    lease_seconds=float(os.getenv("JOB_LEASE_SECONDS", 300)),
+    max_attempts=int(os.getenv("JOB_MAX_ATTEMPTS", 3)),
+    max_queued_items=int(os.getenv("JOB_MAX_QUEUED_ITEMS", 10000)),
+    retry_after=int(os.getenv("JOB_RETRY_AFTER", 30))
+)
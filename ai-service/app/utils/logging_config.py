@@ -1,32 +1,253 @@
 import os
-import logging
 import sys
-from typing import Dict, Any, Optional
+import json
+import uuid
+import queue
+import atexit
+import random
+import logging
+import logging.handlers
+from contextvars import ContextVar
+from typing import Dict, List, Optional
 from dotenv import load_dotenv
 
 # Load environment variables
 load_dotenv()
 
+# Request ID of the request being handled, attached to every log record
+request_id_var: ContextVar[str] = ContextVar("request_id", default="-")
+
+TEXT_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+
+# Background listener writing queued records, when queued logging is enabled
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+class RequestIdFilter(logging.Filter):
+    """Attach the current request ID to each record"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = request_id_var.get()
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """Keep only a fraction of low-severity records from selected loggers
+
+    Warnings and errors are always kept. A rate configured for a logger also
+    applies to its children, the most specific configured name winning.
+    """
+
+    def __init__(self, rates: Dict[str, float]):
+        """Initialize the filter
+
+        Args:
+            rates: Logger name to fraction of INFO/DEBUG records to keep
+        """
+        super().__init__()
+        self.rates = rates
+        self._resolved: Dict[str, float] = {}
+
+    def _rate(self, name: str) -> float:
+        """Sampling rate for a logger name"""
+        rate = self._resolved.get(name)
+        if rate is None:
+            rate = 1.0
+            prefix = name
+            while prefix:
+                if prefix in self.rates:
+                    rate = self.rates[prefix]
+                    break
+                prefix = prefix.rpartition(".")[0]
+            self._resolved[name] = rate
+        return rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+        rate = self._rate(record.name)
+        return rate >= 1.0 or random.random() < rate
+
+
+class JsonFormatter(logging.Formatter):
+    """Format records as one JSON object per line"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "timestamp": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "request_id": getattr(record, "request_id", "-"),
+            "process": record.process,
+            "thread": record.threadName,
+        }
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False)
+
+
+class RequestIdMiddleware:
+    """ASGI middleware assigning a request ID to every HTTP request
+
+    The ID is taken from the X-Request-ID header or generated, stored in
+    request_id_var for the duration of the request and echoed in the response.
+    """
+
+    def __init__(self, app):
+        """Wrap an ASGI application"""
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_id = None
+        for name, value in scope["headers"]:
+            if name == b"x-request-id":
+                request_id = value.decode("latin-1")[:128]
+                break
+        if not request_id:
+            request_id = uuid.uuid4().hex
+
+        async def send_with_request_id(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", [])) + [(b"x-request-id", request_id.encode("latin-1"))]
+            await send(message)
+
+        token = request_id_var.set(request_id)
+        try:
+            await self.app(scope, receive, send_with_request_id)
+        finally:
+            request_id_var.reset(token)
+
+
+def parse_sampling(value: str) -> Dict[str, float]:
+    """Parse LOG_SAMPLING, e.g. "app.api.routes=0.1,app.models.transparency_scorer=0.01"
+
+    Raises:
+        ValueError: If an entry is not logger=rate with a rate between 0 and 1
+    """
+    rates = {}
+    for entry in filter(None, (part.strip() for part in value.split(","))):
+        name, _, rate = entry.partition("=")
+        rate_value = float(rate)
+        if not name or not 0.0 <= rate_value <= 1.0:
+            raise ValueError(f"Invalid LOG_SAMPLING entry '{entry}', expected logger=rate with 0 <= rate <= 1")
+        rates[name.strip()] = rate_value
+    return rates
+
+
+def _file_handler(path: str) -> logging.Handler:
+    """File handler with the rotation selected by LOG_ROTATION (none, size or time)"""
+    rotation = os.getenv("LOG_ROTATION", "none").lower()
+    backup_count = int(os.getenv("LOG_BACKUP_COUNT", 5))
+    if rotation == "size":
+        return logging.handlers.RotatingFileHandler(
+            path, maxBytes=int(os.getenv("LOG_MAX_BYTES", 10 * 1024 * 1024)), backupCount=backup_count
+        )
+    if rotation == "time":
+        return logging.handlers.TimedRotatingFileHandler(
+            path,
+            when=os.getenv("LOG_ROTATION_WHEN", "midnight"),
+            interval=int(os.getenv("LOG_ROTATION_INTERVAL", 1)),
+            backupCount=backup_count
+        )
+    if rotation != "none":
+        raise ValueError(f"Unknown LOG_ROTATION '{rotation}', expected none, size or time")
+    return logging.FileHandler(path)
+
+
+def _start_listener(handler: logging.handlers.QueueHandler, handlers: List[logging.Handler]) -> None:
+    """Start the background thread writing records queued by handler"""
+    global _listener
+    _listener = logging.handlers.QueueListener(handler.queue, *handlers, respect_handler_level=True)
+    _listener.start()
+
+
+def _stop_listener() -> None:
+    """Flush queued records and stop the listener thread"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def _restart_listener_in_child() -> None:
+    """Threads don't survive fork, so a forked worker needs its own queue and listener"""
+    global _listener
+    if _listener is None:
+        return
+    handlers = _listener.handlers
+    for handler in logging.getLogger().handlers:
+        if isinstance(handler, logging.handlers.QueueHandler):
+            handler.queue = queue.SimpleQueue()
+            _listener = None
+            _start_listener(handler, list(handlers))
+            break
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_restart_listener_in_child)
+atexit.register(_stop_listener)
+
+
 def configure_logging(log_level: Optional[str] = None) -> None:
     """Configure logging for the application
-    
+
+    With LOG_QUEUE_ENABLED (the default) request handlers only enqueue
+    records; formatting and file I/O happen on a background listener thread.
+    Calling this again replaces the previous configuration.
+
     Args:
         log_level: Optional log level to override environment variable
     """
     # Get log level from environment or use provided level
     level = log_level or os.getenv("LOG_LEVEL", "INFO").upper()
     numeric_level = getattr(logging, level, logging.INFO)
-    
-    # Configure root logger
-    logging.basicConfig(
-        level=numeric_level,
-        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
-        handlers=[
-            logging.StreamHandler(sys.stdout),
-            logging.FileHandler(os.getenv("LOG_FILE", "ai_service.log"))
-        ]
-    )
-    
+
+    formatter: logging.Formatter
+    if os.getenv("LOG_FORMAT", "text").lower() == "json":
+        formatter = JsonFormatter()
+    else:
+        formatter = logging.Formatter(TEXT_FORMAT)
+
+    output_handlers: List[logging.Handler] = [
+        logging.StreamHandler(sys.stdout),
+        _file_handler(os.getenv("LOG_FILE", "ai_service.log"))
+    ]
+    for handler in output_handlers:
+        handler.setFormatter(formatter)
+
+    # Filters run on the calling thread, before a record is enqueued. RequestIdFilter has to: the
+    # request ID is a context variable of the request. Sampling there costs a dict lookup and a
+    # random draw, and a dropped record is never formatted by QueueHandler.prepare, queued or written
+    filters: List[logging.Filter] = [RequestIdFilter()]
+    sampling = parse_sampling(os.getenv("LOG_SAMPLING", ""))
+    if sampling:
+        filters.insert(0, SamplingFilter(sampling))
+
+    # Replace handlers from an earlier call
+    root = logging.getLogger()
+    _stop_listener()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+        handler.close()
+
+    if os.getenv("LOG_QUEUE_ENABLED", "true").lower() == "true":
+        queue_handler = logging.handlers.QueueHandler(queue.SimpleQueue())
+        for log_filter in filters:
+            queue_handler.addFilter(log_filter)
+        root.addHandler(queue_handler)
+        _start_listener(queue_handler, output_handlers)
+    else:
+        for handler in output_handlers:
+            for log_filter in filters:
+                handler.addFilter(log_filter)
+            root.addHandler(handler)
+    root.setLevel(numeric_level)
+
     # Set log levels for specific loggers
     if os.getenv("DEBUG", "false").lower() == "true":
         # Enable debug logging for app modules
@@ -35,6 +256,6 @@ def configure_logging(log_level: Optional[str] = None) -> None:
         # Set conservative log levels for external libraries
         logging.getLogger("uvicorn").setLevel(logging.WARNING)
         logging.getLogger("fastapi").setLevel(logging.WARNING)
-    
+
     # Log configuration complete
-    logging.getLogger(__name__).info(f"Logging configured with level: {level}")
\ No newline at end of file
+    logging.getLogger(__name__).info(f"Logging configured with level: {level}")
@@ -0,0 +1,476 @@
+import os
+import time
+import threading
+import weakref
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+# Latency buckets in seconds, from fast scoring calls to slow generations
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class _Shards:
+    """Per-thread value arrays summed on read
+
+    Each thread only ever writes its own array, so recording needs no lock and
+    no atomic read-modify-write. The lock is taken once per thread, when its
+    array is created, and by readers. Pool threads come and go, so the arrays
+    of threads that have exited are folded into a shared base and dropped
+    whenever an array is created or the values are read.
+    """
+
+    def __init__(self, size: int):
+        self._size = size
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._base = [0.0] * size
+        self._arrays: List[Tuple["weakref.ref[threading.Thread]", List[float]]] = []
+
+    def local(self) -> List[float]:
+        """Return the calling thread's array"""
+        try:
+            return self._local.values
+        except AttributeError:
+            values = [0.0] * self._size
+            with self._lock:
+                self._merge_finished()
+                self._arrays.append((weakref.ref(threading.current_thread()), values))
+            self._local.values = values
+            return values
+
+    def _merge_finished(self) -> List[List[float]]:
+        """Fold the arrays of exited threads into the base; returns the live arrays. Called with the lock held"""
+        live = []
+        for thread_ref, values in self._arrays:
+            thread = thread_ref()
+            if thread is not None and thread.is_alive():
+                live.append((thread_ref, values))
+                continue
+            # The thread can no longer write, so its values are final
+            for index, value in enumerate(values):
+                self._base[index] += value
+        self._arrays = live
+        return [values for _, values in live]
+
+    def totals(self) -> List[float]:
+        """Sum every thread's array"""
+        with self._lock:
+            arrays = self._merge_finished()
+            totals = list(self._base)
+        for values in arrays:
+            for index, value in enumerate(values):
+                totals[index] += value
+        return totals
+
+
+class Metric:
+    """Base class for a named metric family with optional labels"""
+
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        """Initialize the metric
+
+        Args:
+            name: Metric name in Prometheus format
+            documentation: Help text
+            labelnames: Names of the labels children are created with
+        """
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], "Metric"] = {}
+        self._lock = threading.Lock()
+
+    def _new_child(self) -> "Metric":
+        raise NotImplementedError
+
+    def labels(self, *values: str) -> "Metric":
+        """Return the child for these label values, creating it on first use"""
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}, got {values}")
+            with self._lock:
+                child = self._children.setdefault(values, self._new_child())
+        return child
+
+    def _series(self) -> Iterable[Tuple[Tuple[str, ...], "Metric"]]:
+        """Label values and child metric of every series"""
+        if self.labelnames:
+            return list(self._children.items())
+        return [((), self)]
+
+    def _label_text(self, values: Tuple[str, ...], extra: Tuple[Tuple[str, str], ...] = ()) -> str:
+        pairs = list(zip(self.labelnames, values)) + list(extra)
+        if not pairs:
+            return ""
+        return "{" + ",".join(f'{name}="{_escape(str(value))}"' for name, value in pairs) + "}"
+
+    def render(self) -> List[str]:
+        """Return the metric family in the Prometheus text format"""
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for values, child in self._series():
+            lines.extend(child._render_child(self, values))
+        return lines
+
+    def _render_child(self, family: "Metric", values: Tuple[str, ...]) -> List[str]:
+        raise NotImplementedError
+
+
+def _escape(value: str) -> str:
+    """Escape a label value"""
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format(value: float) -> str:
+    """Format a sample value"""
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class Counter(Metric):
+    """Monotonically increasing count"""
+
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._shards = _Shards(1)
+
+    def _new_child(self) -> "Counter":
+        return Counter(self.name, self.documentation)
+
+    def inc(self, amount: float = 1) -> None:
+        """Increase the count"""
+        self._shards.local()[0] += amount
+
+    def value(self) -> float:
+        """Current count"""
+        return self._shards.totals()[0]
+
+    def _render_child(self, family: Metric, values: Tuple[str, ...]) -> List[str]:
+        return [f"{family.name}{family._label_text(values)} {_format(self.value())}"]
+
+
+class Gauge(Metric):
+    """Value that can go up and down, or is read from a callback at scrape time"""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 function: Optional[Callable[[], float]] = None):
+        """Initialize the gauge
+
+        Args:
+            name: Metric name in Prometheus format
+            documentation: Help text
+            labelnames: Names of the labels children are created with
+            function: Optional callback returning the value when scraped
+        """
+        super().__init__(name, documentation, labelnames)
+        self.function = function
+        self._value = 0.0
+        self._shards = _Shards(1)
+
+    def _new_child(self) -> "Gauge":
+        return Gauge(self.name, self.documentation)
+
+    def set(self, value: float) -> None:
+        """Set the value, discarding earlier increments"""
+        self._value = value - self._shards.totals()[0]
+
+    def inc(self, amount: float = 1) -> None:
+        """Increase the value"""
+        self._shards.local()[0] += amount
+
+    def dec(self, amount: float = 1) -> None:
+        """Decrease the value"""
+        self._shards.local()[0] -= amount
+
+    def value(self) -> float:
+        """Current value"""
+        if self.function is not None:
+            return self.function()
+        return self._value + self._shards.totals()[0]
+
+    def _render_child(self, family: Metric, values: Tuple[str, ...]) -> List[str]:
+        return [f"{family.name}{family._label_text(values)} {_format(self.value())}"]
+
+
+class Histogram(Metric):
+    """Distribution of observed values over fixed buckets"""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        """Initialize the histogram
+
+        Args:
+            name: Metric name in Prometheus format
+            documentation: Help text
+            labelnames: Names of the labels children are created with
+            buckets: Sorted upper bounds; +Inf is added automatically
+        """
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # One count per bucket, one for +Inf, then the sum of observations
+        self._shards = _Shards(len(self.buckets) + 2)
+
+    def _new_child(self) -> "Histogram":
+        return Histogram(self.name, self.documentation, buckets=self.buckets)
+
+    def observe(self, value: float) -> None:
+        """Record one observation"""
+        values = self._shards.local()
+        values[bisect_left(self.buckets, value)] += 1
+        values[-1] += value
+
+    def time(self) -> "_Timer":
+        """Context manager observing the duration of its block in seconds"""
+        return _Timer(self)
+
+    def snapshot(self) -> Dict[str, float]:
+        """Return count and sum of the observations"""
+        totals = self._shards.totals()
+        return {"count": sum(totals[:-1]), "sum": totals[-1]}
+
+    def _render_child(self, family: Metric, values: Tuple[str, ...]) -> List[str]:
+        totals = self._shards.totals()
+        lines = []
+        cumulative = 0.0
+        for bound, count in zip(self.buckets + (float("inf"),), totals[:-1]):
+            cumulative += count
+            labels = family._label_text(values, (("le", _format(bound)),))
+            lines.append(f"{family.name}_bucket{labels} {_format(cumulative)}")
+        labels = family._label_text(values)
+        lines.append(f"{family.name}_sum{labels} {_format(totals[-1])}")
+        lines.append(f"{family.name}_count{labels} {_format(cumulative)}")
+        return lines
+
+
+class _Timer:
+    """Observe the duration of a with block"""
+
+    __slots__ = ("histogram", "start")
+
+    def __init__(self, histogram: Histogram):
+        self.histogram = histogram
+
+    def __enter__(self) -> "_Timer":
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.histogram.observe(time.perf_counter() - self.start)
+
+
+class MetricsRegistry:
+    """Collection of metrics rendered together by /metrics"""
+
+    def __init__(self):
+        """Initialize an empty registry"""
+        self._metrics: Dict[str, Metric] = {}
+
+    def register(self, metric: Metric) -> Metric:
+        """Add a metric, returning the one already registered under its name if any"""
+        return self._metrics.setdefault(metric.name, metric)
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        """Create and register a counter"""
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+              function: Optional[Callable[[], float]] = None) -> Gauge:
+        """Create and register a gauge"""
+        return self.register(Gauge(name, documentation, labelnames, function))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        """Create and register a histogram"""
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        """Return every metric in the Prometheus text exposition format"""
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording request counts, latency and in-flight requests
+
+    Requests are labelled with the matched route's path template rather than
+    the raw URL, so unknown paths can't create unbounded label values.
+    """
+
+    def __init__(self, app):
+        """Wrap an ASGI application"""
+        self.app = app
+        self._route_paths: Dict[Callable, str] = {}
+
+    def _route_label(self, scope) -> str:
+        """Path template of the route that handled the request"""
+        endpoint = scope.get("endpoint")
+        if endpoint is None:
+            return "unmatched"
+        path = self._route_paths.get(endpoint)
+        if path is None:
+            for route in getattr(scope.get("app"), "routes", ()):
+                if getattr(route, "endpoint", None) is endpoint:
+                    path = route.path
+                    break
+            else:
+                path = "unmatched"
+            self._route_paths[endpoint] = path
+        return path
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        http_requests_in_flight.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - start
+            http_requests_in_flight.dec()
+            method = scope["method"]
+            route = self._route_label(scope)
+            http_requests.labels(method, route, str(status)).inc()
+            http_request_duration.labels(method, route).observe(elapsed)
+
+
+def resident_memory_bytes() -> float:
+    """Resident set size of this process"""
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+# Shared registry exposed at /metrics
+metrics = MetricsRegistry()
+
+# HTTP layer
+http_requests = metrics.counter(
+    "http_requests_total", "HTTP requests by route, method and status code", ("method", "route", "status")
+)
+http_request_duration = metrics.histogram(
+    "http_request_duration_seconds", "HTTP request latency until the response body is sent", ("method", "route")
+)
+http_requests_in_flight = metrics.gauge("http_requests_in_flight", "HTTP requests currently being served")
+
+# Question generation stages
+generation_stage_duration = metrics.histogram(
+    "question_generation_stage_seconds",
+    "Time spent in each question generation stage (tokenize, encode, generate, decode)",
+    ("stage",)
+)
+generation_rounds = metrics.histogram(
+    "question_generation_sampling_rounds",
+    "Sampling rounds used per request; compare with question_generation_max_sampling_rounds",
+    buckets=(1, 2, 3, 4, 6, 8, 12, 16)
+)
+generation_max_rounds = metrics.gauge(
+    "question_generation_max_sampling_rounds", "Sampling rounds allowed per non-streaming request"
+)
+generated_questions = metrics.counter(
+    "question_generation_questions_total",
+    "Questions returned, by source (model, fallback template or index of past generations)", ("source",)
+)
+rejected_candidates = metrics.counter(
+    "question_generation_rejected_candidates_total",
+    "Sampled candidates discarded, by reason (empty, duplicate, near_duplicate)", ("reason",)
+)
+generation_early_stops = metrics.counter(
+    "question_generation_early_stops_total",
+    "Requests that stopped sampling before max rounds, by reason (deadline, low_yield)", ("reason",)
+)
+generation_cancellations = metrics.counter(
+    "question_generation_cancelled_total",
+    "Generations aborted before completion, by reason (disconnected, deadline)", ("reason",)
+)
+generated_tokens = metrics.counter(
+    "question_generation_tokens_total", "Tokens produced by the question generation model"
+)
+generation_tokens_per_second = metrics.gauge(
+    "question_generation_tokens_per_second", "Decoder throughput of the most recent generate call"
+)
+prompt_tokens = metrics.histogram(
+    "question_prompt_tokens", "Prompt length in tokens after per-field budgets",
+    buckets=(32, 64, 96, 128, 192, 256, 320, 384, 448, 512, 1024)
+)
+prompt_truncations = metrics.counter(
+    "question_prompt_truncations_total", "Product fields shortened to fit their token budget, by field", ("field",)
+)
+generation_mode_duration = metrics.histogram(
+    "question_generation_mode_seconds", "Generation time per request, by latency tier (fast, balanced, quality)",
+    ("mode",)
+)
+generation_mode_fallbacks = metrics.counter(
+    "question_generation_mode_fallbacks_total",
+    "Requests served by the fast tier because the requested tier's queue was too deep, by requested tier",
+    ("requested",)
+)
+question_index_lookups = metrics.counter(
+    "question_index_lookups_total", "Similarity index lookups, by result (hit reuses stored questions, miss)", ("result",)
+)
+question_index_lookup_duration = metrics.histogram(
+    "question_index_lookup_seconds", "Time to find the most similar indexed product",
+    buckets=(0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1)
+)
+
+# Asynchronous generation jobs
+job_submissions = metrics.counter(
+    "question_jobs_submitted_total", "Question generation jobs submitted, by priority", ("priority",)
+)
+job_items = metrics.counter(
+    "question_job_items_total",
+    "Job products processed, by result (completed, failed, requeued after their worker died)", ("result",)
+)
+job_queue_wait = metrics.histogram(
+    "question_job_queue_wait_seconds", "Time from job submission until one of its products starts",
+    buckets=(0.01, 0.1, 0.5, 1.0, 5.0, 10.0, 30.0, 60.0, 300.0, 900.0, 3600.0)
+)
+
+# Transparency scoring stages
+scoring_stage_duration = metrics.histogram(
+    "transparency_scoring_stage_seconds",
+    "Time spent in each calculate_score stage (features, criteria, improvement_areas, feedback)",
+    ("stage",)
+)
+incremental_scoring_updates = metrics.counter(
+    "transparency_incremental_updates_total", "Answer deltas applied to incremental scoring state"
+)
+incremental_scoring_verifications = metrics.counter(
+    "transparency_incremental_verifications_total",
+    "Incremental scores checked against a full recompute, by result (match, mismatch)", ("result",)
+)
+
+# Request profiling
+profiled_requests = metrics.counter(
+    "profiled_requests_total", "Requests profiled, by trigger (header, query, sampled)", ("trigger",)
+)
+
+# Process
+process_resident_memory = metrics.gauge(
+    "process_resident_memory_bytes", "Resident memory size in bytes", function=resident_memory_bytes
+)
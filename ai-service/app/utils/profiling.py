@@ -0,0 +1,428 @@
+import os
+import re
+import json
+import time
+import uuid
+import random
+import pstats
+import cProfile
+import logging
+import asyncio
+import threading
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+from typing import Dict, Any, Callable, Iterator, List, Optional, Tuple
+from urllib.parse import parse_qs
+from dotenv import load_dotenv
+
+from app.utils.logging_config import request_id_var
+from app.utils.metrics import profiled_requests
+
+# Load environment variables
+load_dotenv()
+
+# Configure logger
+logger = logging.getLogger(__name__)
+
+# Profile session of the request being served, if it is profiled
+active_profile: ContextVar[Optional["ProfileSession"]] = ContextVar("active_profile", default=None)
+
+# The torch profiler is process-wide, so only one generate call is recorded at a time
+_torch_lock = threading.Lock()
+
+PROFILE_ID_PATTERN = re.compile(r"^[0-9A-Za-z-]+$")
+FLAG_VALUES = ("1", "true", "yes")
+
+
+def frame_label(function) -> str:
+    """Flame graph frame name of a pstats function key"""
+    filename, line, name = function
+    if filename == "~":
+        label = name
+    else:
+        label = f"{name} ({os.path.basename(filename)}:{line})"
+    # ";" separates frames in the collapsed stack format
+    return label.replace(";", ":")
+
+
+def pstats_to_folded(stats: pstats.Stats, min_fraction: float = 0.001, max_depth: int = 128) -> Dict[str, int]:
+    """Convert profile statistics to collapsed stacks, in microseconds of own time
+
+    cProfile records caller/callee pairs rather than whole stacks, so stacks are
+    rebuilt top-down from the functions nobody called: a callee's time under
+    a path is its time via that caller, scaled by the caller's share on the
+    path. Recursion is cut at the first repeated function and paths below
+    min_fraction of the total time are dropped.
+
+    Args:
+        stats: Merged statistics of every profiled thread
+        min_fraction: Smallest share of the total time a path must account for
+        max_depth: Deepest stack reconstructed
+
+    Returns:
+        Mapping of "root;...;leaf" stacks to microseconds, as read by flamegraph.pl and speedscope
+    """
+    entries = stats.stats
+    callees: Dict[Any, List] = {}
+    for function, (_, _, _, _, callers) in entries.items():
+        for caller, caller_stats in callers.items():
+            # caller_stats[3] is the cumulative time of function when called from caller
+            callees.setdefault(caller, []).append((function, caller_stats[3]))
+    roots = [function for function, (_, _, _, _, callers) in entries.items() if not callers]
+    total = sum(entries[function][3] for function in roots)
+    if total <= 0:
+        return {}
+    threshold = total * min_fraction
+    folded: Dict[str, int] = {}
+
+    def walk(function, scale: float, path: List, names: List[str]) -> None:
+        names = names + [frame_label(function)]
+        own = int(entries[function][2] * scale * 1e6)
+        if own > 0:
+            stack = ";".join(names)
+            folded[stack] = folded.get(stack, 0) + own
+        if len(names) >= max_depth:
+            return
+        for callee, seconds in callees.get(function, ()):
+            seconds *= scale
+            callee_total = entries[callee][3]
+            if callee in path or seconds < threshold or callee_total <= 0:
+                continue
+            walk(callee, min(1.0, seconds / callee_total), path + [callee], names)
+
+    for root in roots:
+        if entries[root][3] >= threshold:
+            walk(root, 1.0, [root], [])
+    return folded
+
+
+def write_folded(path: str, folded: Dict[str, int]) -> None:
+    """Write collapsed stacks, heaviest first"""
+    with open(path, "w", encoding="utf-8") as folded_file:
+        for stack, value in sorted(folded.items(), key=lambda item: -item[1]):
+            folded_file.write(f"{stack} {value}\n")
+
+
+class ProfileSession:
+    """Profiles collected for one request
+
+    cProfile only sees the thread it runs on, so every thread working on the
+    request (inference pool threads, the batch scheduler) runs its own
+    profiler and the statistics are merged when the session is saved.
+    Torch operators are recorded around the request's model.generate calls
+    and aggregated by operator nesting.
+    """
+
+    def __init__(self, profile_id: str, method: str, path: str, trigger: str, torch_enabled: bool = True):
+        self.profile_id = profile_id
+        self.method = method
+        self.path = path
+        self.trigger = trigger
+        self.torch_enabled = torch_enabled
+        self.request_id = request_id_var.get()
+        self.started_at = time.time()
+
+        self._lock = threading.Lock()
+        self._profiles: List[cProfile.Profile] = []
+        # Threads currently running a profiler for this session
+        self._threads: set = set()
+        self._generate_calls = 0
+        # Torch profilers of recorded generate calls; their events are parsed when saving,
+        # which takes longer than the call itself and must not delay the response
+        self._torch_profilers: List[Any] = []
+
+    @contextmanager
+    def activate(self) -> Iterator[None]:
+        """Run cProfile on the calling thread with this session active for the duration of the block"""
+        thread = threading.get_ident()
+        with self._lock:
+            nested = thread in self._threads
+            self._threads.add(thread)
+        if nested:
+            yield
+            return
+
+        profile = cProfile.Profile()
+        context_token = active_profile.set(self)
+        try:
+            profile.enable()
+        except ValueError:
+            # Another profiler already runs on this thread
+            profile = None
+        try:
+            yield
+        finally:
+            if profile is not None:
+                profile.disable()
+            active_profile.reset(context_token)
+            with self._lock:
+                self._threads.discard(thread)
+                if profile is not None:
+                    self._profiles.append(profile)
+
+    def run(self, func: Callable, *args, **kwargs) -> Any:
+        """Call func with this session active on the calling thread"""
+        with self.activate():
+            return func(*args, **kwargs)
+
+    @contextmanager
+    def torch_profile(self) -> Iterator[None]:
+        """Record the torch operators run on this thread during the block"""
+        with self._lock:
+            self._generate_calls += 1
+        if not self.torch_enabled or not _torch_lock.acquire(blocking=False):
+            # Another request's generate call is being recorded
+            yield
+            return
+        try:
+            from torch.profiler import profile, ProfilerActivity
+
+            with profile(activities=[ProfilerActivity.CPU]) as torch_profiler:
+                yield
+            with self._lock:
+                self._torch_profilers.append(torch_profiler)
+        finally:
+            _torch_lock.release()
+
+    @staticmethod
+    def fold_torch_events(torch_profilers: List[Any]) -> Tuple[Dict[str, int], Dict[str, List[float]]]:
+        """Collapsed operator stacks (microseconds of own CPU time) and per-operator totals"""
+        stacks: Dict[str, int] = {}
+        operators: Dict[str, List[float]] = {}
+        for torch_profiler in torch_profilers:
+            for event in torch_profiler.events():
+                names = []
+                parent = event
+                while parent is not None:
+                    names.append(parent.name.replace(";", ":"))
+                    parent = parent.cpu_parent
+                stack = "generate;" + ";".join(reversed(names))
+                stacks[stack] = stacks.get(stack, 0) + int(event.self_cpu_time_total)
+                totals = operators.setdefault(event.name, [0, 0.0, 0.0])
+                totals[0] += 1
+                totals[1] += event.self_cpu_time_total
+                totals[2] += event.cpu_time_total
+        return stacks, operators
+
+    def save(self, directory: str, status: int, duration: float) -> Dict[str, Any]:
+        """Write the profiles and their metadata to directory
+
+        Files are named after the profile ID:
+            .pstats: merged cProfile statistics (pstats, snakeviz)
+            .python.folded: Python collapsed stacks (flamegraph.pl, speedscope)
+            .torch.folded: torch operator collapsed stacks, under a "generate" root
+            .torch.txt: torch operators by own CPU time
+            .json: metadata, written last
+
+        Returns:
+            The metadata
+        """
+        with self._lock:
+            profiles = list(self._profiles)
+            torch_profilers = list(self._torch_profilers)
+        torch_stacks, torch_ops = self.fold_torch_events(torch_profilers)
+
+        prefix = os.path.join(directory, self.profile_id)
+        files = []
+        if profiles:
+            stats = pstats.Stats(profiles[0])
+            for profile in profiles[1:]:
+                stats.add(profile)
+            stats.dump_stats(prefix + ".pstats")
+            write_folded(prefix + ".python.folded", pstats_to_folded(stats))
+            files += [self.profile_id + ".pstats", self.profile_id + ".python.folded"]
+        if torch_stacks:
+            write_folded(prefix + ".torch.folded", torch_stacks)
+            with open(prefix + ".torch.txt", "w", encoding="utf-8") as table:
+                table.write(f"{'operator':<48} {'calls':>8} {'self_cpu_ms':>12} {'cpu_total_ms':>12}\n")
+                for name, (calls, own, total) in sorted(torch_ops.items(), key=lambda item: -item[1][1]):
+                    table.write(f"{name[:48]:<48} {calls:>8} {own / 1000:>12.3f} {total / 1000:>12.3f}\n")
+            files += [self.profile_id + ".torch.folded", self.profile_id + ".torch.txt"]
+
+        metadata = {
+            "profile_id": self.profile_id,
+            "method": self.method,
+            "path": self.path,
+            "trigger": self.trigger,
+            "request_id": self.request_id,
+            "status": status,
+            "started_at": self.started_at,
+            "duration_ms": round(duration * 1000, 3),
+            "python_threads": len(profiles),
+            "generate_calls": self._generate_calls,
+            "torch_profiled_calls": len(torch_profilers),
+            "files": files,
+        }
+        temporary_path = prefix + ".json.tmp"
+        with open(temporary_path, "w", encoding="utf-8") as metadata_file:
+            json.dump(metadata, metadata_file)
+        os.replace(temporary_path, prefix + ".json")
+        return metadata
+
+
+def profile_generate():
+    """Context recording the torch operators of a generate call when the current request is profiled"""
+    session = active_profile.get()
+    if session is None:
+        return nullcontext()
+    return session.torch_profile()
+
+
+class RequestProfiler:
+    """Opt-in per-request profiling of the API endpoints
+
+    A request is profiled when it sends an X-Profile header or a profile
+    query flag, or is picked at sample_rate. Profiles are written to
+    directory and the most recent max_profiles are kept. When disabled,
+    main.py installs neither the middleware nor the admin endpoints.
+    """
+
+    def __init__(self, enabled: bool = False, directory: str = "profiles", sample_rate: float = 0.0,
+                 max_profiles: int = 100, torch_enabled: bool = True):
+        """Initialize the profiler
+
+        Args:
+            enabled: Whether requests can be profiled at all
+            directory: Where profiles are written
+            sample_rate: Fraction of API requests profiled without being asked (0-1)
+            max_profiles: Number of most recent profiles kept on disk
+            torch_enabled: Also record torch operators of model.generate calls
+        """
+        self.enabled = enabled
+        self.directory = directory
+        self.sample_rate = sample_rate
+        self.max_profiles = max(1, max_profiles)
+        self.torch_enabled = torch_enabled
+        self._lock = threading.Lock()
+
+    def warmup(self) -> None:
+        """Initialize the torch profiler, which takes seconds the first time, ahead of the first profiled request"""
+        if not self.torch_enabled:
+            return
+        from torch.profiler import profile, ProfilerActivity
+
+        with _torch_lock:
+            with profile(activities=[ProfilerActivity.CPU]):
+                pass
+
+    def trigger(self, scope) -> Optional[str]:
+        """How an incoming request asks to be profiled (header, query or sampled), or None"""
+        path = scope["path"]
+        if not path.startswith("/api/") or path.startswith("/api/profiles"):
+            return None
+        for name, value in scope["headers"]:
+            if name == b"x-profile" and value.decode("latin-1").lower() in FLAG_VALUES:
+                return "header"
+        if b"profile" in scope["query_string"]:
+            values = parse_qs(scope["query_string"].decode("latin-1")).get("profile", [])
+            if any(value.lower() in FLAG_VALUES for value in values):
+                return "query"
+        if self.sample_rate > 0 and random.random() < self.sample_rate:
+            return "sampled"
+        return None
+
+    def start(self, method: str, path: str, trigger: str) -> ProfileSession:
+        """Create the session of a profiled request"""
+        profile_id = f"{time.strftime('%Y%m%dT%H%M%S')}-{uuid.uuid4().hex[:8]}"
+        profiled_requests.labels(trigger).inc()
+        return ProfileSession(profile_id, method, path, trigger, torch_enabled=self.torch_enabled)
+
+    def save(self, session: ProfileSession, status: int, duration: float) -> None:
+        """Write a finished session and drop the oldest profiles beyond max_profiles"""
+        with self._lock:
+            os.makedirs(self.directory, exist_ok=True)
+            metadata = session.save(self.directory, status, duration)
+            # IDs start with a timestamp, so name order is age order
+            profile_ids = sorted(name[:-len(".json")] for name in os.listdir(self.directory) if name.endswith(".json"))
+            for profile_id in profile_ids[:-self.max_profiles]:
+                for name in os.listdir(self.directory):
+                    if name.startswith(profile_id + "."):
+                        os.remove(os.path.join(self.directory, name))
+        logger.info(f"Profiled {session.method} {session.path} in {metadata['duration_ms']:.1f} ms "
+                    f"({session.trigger}): {self.directory}/{session.profile_id}.*")
+
+    def list(self, limit: int = 50) -> List[Dict[str, Any]]:
+        """Return the metadata of the most recent profiles, newest first"""
+        if not os.path.isdir(self.directory):
+            return []
+        names = sorted((name for name in os.listdir(self.directory) if name.endswith(".json")), reverse=True)
+        profiles = []
+        for name in names[:limit]:
+            metadata = self.get(name[:-len(".json")])
+            if metadata is not None:
+                profiles.append(metadata)
+        return profiles
+
+    def get(self, profile_id: str) -> Optional[Dict[str, Any]]:
+        """Return a profile's metadata, or None if there is no such profile"""
+        if not PROFILE_ID_PATTERN.match(profile_id):
+            return None
+        try:
+            with open(os.path.join(self.directory, profile_id + ".json"), encoding="utf-8") as metadata_file:
+                return json.load(metadata_file)
+        except (OSError, ValueError):
+            return None
+
+    def file_path(self, profile_id: str, file_name: str) -> Optional[str]:
+        """Path of one of a profile's files, or None if the profile has no such file"""
+        metadata = self.get(profile_id)
+        if metadata is None or file_name not in metadata["files"]:
+            return None
+        path = os.path.join(self.directory, file_name)
+        return path if os.path.exists(path) else None
+
+
+class ProfilingMiddleware:
+    """ASGI middleware profiling the requests that ask for it
+
+    The profile ID is returned in the X-Profile-Id response header. Profiles
+    are written after the response has been sent, off the event loop.
+    """
+
+    def __init__(self, app, profiler: RequestProfiler):
+        """Wrap an ASGI application"""
+        self.app = app
+        self.profiler = profiler
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        trigger = self.profiler.trigger(scope)
+        if trigger is None:
+            await self.app(scope, receive, send)
+            return
+
+        session = self.profiler.start(scope["method"], scope["path"], trigger)
+        status = 500
+
+        async def send_with_profile_id(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                message["headers"] = list(message.get("headers", [])) + [
+                    (b"x-profile-id", session.profile_id.encode("latin-1"))
+                ]
+            await send(message)
+
+        token = active_profile.set(session)
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_profile_id)
+        finally:
+            duration = time.perf_counter() - start
+            active_profile.reset(token)
+            try:
+                await asyncio.get_running_loop().run_in_executor(None, self.profiler.save, session, status, duration)
+            except Exception as e:
+                logger.error(f"Failed to save profile {session.profile_id}: {str(e)}")
+
+
+# Shared profiler; the middleware and /api/profiles are only installed when enabled
+request_profiler = RequestProfiler(
+    enabled=os.getenv("PROFILING_ENABLED", "false").lower() == "true",
+    directory=os.getenv("PROFILING_DIR", "profiles"),
+    sample_rate=float(os.getenv("PROFILING_SAMPLE_RATE", 0.0)),
+    max_profiles=int(os.getenv("PROFILING_MAX_PROFILES", 100)),
+    torch_enabled=os.getenv("PROFILING_TORCH", "true").lower() == "true"
+)
@@ -0,0 +1,313 @@
+import os
+import json
+import time
+import asyncio
+import hashlib
+import logging
+import sqlite3
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, Awaitable, Callable, Iterable, List, Optional, Tuple
+from dotenv import load_dotenv
+
+from app.utils.cancellation import GenerationCancelled
+
+# Load environment variables
+load_dotenv()
+
+# Configure logger
+logger = logging.getLogger(__name__)
+
+
+class QuestionCache:
+    """Content-addressed cache for generated questions
+
+    Entries are keyed by a hash of the normalized product fields the
+    generator actually uses, the number of questions and the model name.
+    An in-memory LRU with TTL sits in front of an optional SQLite tier that
+    survives restarts. Concurrent identical misses share one generation.
+    The async methods only touch the LRU on the event loop; SQLite runs on a
+    dedicated thread, so a busy database file shared by several workers never
+    blocks the loop.
+    """
+
+    # Seconds between deletions of expired rows from the SQLite tier
+    SWEEP_INTERVAL = 300
+
+    def __init__(self, max_entries: int = 1024, ttl_seconds: float = 86400, db_path: Optional[str] = None):
+        """Initialize the cache
+
+        Args:
+            max_entries: Maximum number of entries kept in memory
+            ttl_seconds: Seconds an entry stays valid
+            db_path: Optional SQLite file for the persistent tier
+        """
+        self.max_entries = max(1, max_entries)
+        self.ttl_seconds = ttl_seconds
+        self.db_path = db_path
+
+        self._lock = threading.Lock()
+        # Serializes use of the SQLite connection, which is shared by threads
+        self._db_lock = threading.Lock()
+        self._entries: "OrderedDict[str, Tuple[float, List[str]]]" = OrderedDict()
+        self._inflight: Dict[str, asyncio.Future] = {}
+
+        # Opened lazily and per process, since SQLite connections must not cross a fork
+        self._db: Optional[sqlite3.Connection] = None
+        self._db_pid: Optional[int] = None
+        self._disk_executor: Optional[ThreadPoolExecutor] = None
+        self._disk_executor_pid: Optional[int] = None
+        self._last_sweep = 0.0
+
+        # Counters
+        self._memory_hits = 0
+        self._disk_hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._expirations = 0
+        self._shared = 0
+
+    def _connection(self) -> sqlite3.Connection:
+        """Return this process's connection to the persistent tier"""
+        if self._db is None or self._db_pid != os.getpid():
+            self._db = sqlite3.connect(self.db_path, check_same_thread=False)
+            self._db_pid = os.getpid()
+            # WAL with normal sync keeps writes cheap enough for the request path
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS question_cache "
+                "(key TEXT PRIMARY KEY, questions TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+            self._db.commit()
+            logger.info(f"Question cache persisting to {self.db_path}")
+        return self._db
+
+    @staticmethod
+    def make_key(product_info: Dict[str, Any], fields: Iterable[str], num_questions: int, model_name: str) -> str:
+        """Build a stable cache key
+
+        Args:
+            product_info: Dictionary containing product information
+            fields: Product fields that influence generation
+            num_questions: Number of questions requested
+            model_name: Identifier of the generation model and backend
+
+        Returns:
+            Hex digest identifying equivalent requests
+        """
+        normalized = {}
+        for field in fields:
+            value = product_info.get(field)
+            if isinstance(value, str):
+                # Whitespace differences don't change the generated questions
+                value = " ".join(value.split()) or None
+            elif isinstance(value, list):
+                value = sorted(" ".join(str(item).split()) for item in value) or None
+            normalized[field] = value
+        payload = json.dumps(
+            {"product": normalized, "num_questions": num_questions, "model": model_name},
+            sort_keys=True
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _store_memory(self, key: str, expires_at: float, questions: List[str]) -> None:
+        """Insert into the LRU, evicting the least recently used entries"""
+        self._entries[key] = (expires_at, questions)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self._evictions += 1
+
+    def _get_memory(self, key: str, now: float) -> Optional[List[str]]:
+        """Look up the in-memory tier; the caller holds the lock"""
+        entry = self._entries.get(key)
+        if entry is not None:
+            expires_at, questions = entry
+            if expires_at > now:
+                self._entries.move_to_end(key)
+                self._memory_hits += 1
+                return list(questions)
+            del self._entries[key]
+            self._expirations += 1
+        return None
+
+    def _get_disk(self, key: str, now: float) -> Optional[List[str]]:
+        """Look up the persistent tier, promoting hits into memory
+
+        Expired rows are skipped rather than deleted, so reads never write;
+        the periodic sweep in _set_disk removes them.
+        """
+        with self._db_lock:
+            row = self._connection().execute(
+                "SELECT questions, expires_at FROM question_cache WHERE key = ? AND expires_at > ?", (key, now)
+            ).fetchone()
+        with self._lock:
+            if row is None:
+                self._misses += 1
+                return None
+            questions = json.loads(row[0])
+            self._store_memory(key, row[1], questions)
+            self._disk_hits += 1
+            return list(questions)
+
+    def _set_disk(self, key: str, expires_at: float, questions: List[str]) -> None:
+        """Write an entry to the persistent tier, sweeping expired rows now and then"""
+        with self._db_lock:
+            db = self._connection()
+            db.execute(
+                "INSERT OR REPLACE INTO question_cache (key, questions, expires_at) VALUES (?, ?, ?)",
+                (key, json.dumps(questions), expires_at)
+            )
+            now = time.time()
+            if now - self._last_sweep >= self.SWEEP_INTERVAL:
+                self._last_sweep = now
+                swept = db.execute("DELETE FROM question_cache WHERE expires_at <= ?", (now,)).rowcount
+                with self._lock:
+                    self._expirations += max(0, swept)
+            db.commit()
+
+    async def _run_disk(self, func: Callable, *args):
+        """Run a persistent-tier operation on the cache's database thread"""
+        if self._disk_executor is None or self._disk_executor_pid != os.getpid():
+            self._disk_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="question-cache-db")
+            self._disk_executor_pid = os.getpid()
+        return await asyncio.get_running_loop().run_in_executor(self._disk_executor, func, *args)
+
+    def get(self, key: str) -> Optional[List[str]]:
+        """Return cached questions, or None on a miss
+
+        Blocks on the persistent tier, so use it from worker threads; on the
+        event loop, use aget.
+        """
+        now = time.time()
+        with self._lock:
+            questions = self._get_memory(key, now)
+            if questions is not None or not self.db_path:
+                self._misses += questions is None
+                return questions
+        return self._get_disk(key, now)
+
+    async def aget(self, key: str) -> Optional[List[str]]:
+        """Return cached questions, or None on a miss, without blocking the event loop"""
+        now = time.time()
+        with self._lock:
+            questions = self._get_memory(key, now)
+            if questions is not None or not self.db_path:
+                self._misses += questions is None
+                return questions
+        return await self._run_disk(self._get_disk, key, now)
+
+    def _set_memory(self, key: str, questions: List[str]) -> Tuple[float, List[str]]:
+        expires_at = time.time() + self.ttl_seconds
+        questions = list(questions)
+        with self._lock:
+            self._store_memory(key, expires_at, questions)
+        return expires_at, questions
+
+    def set(self, key: str, questions: List[str]) -> None:
+        """Store questions in memory and, if enabled, on disk (blocking; see aset)"""
+        expires_at, questions = self._set_memory(key, questions)
+        if self.db_path:
+            self._set_disk(key, expires_at, questions)
+
+    async def aset(self, key: str, questions: List[str]) -> None:
+        """Store questions in memory, and on disk from the database thread"""
+        expires_at, questions = self._set_memory(key, questions)
+        if self.db_path:
+            await self._run_disk(self._set_disk, key, expires_at, questions)
+
+    async def get_or_generate(self, key: str,
+                              generate: Callable[[], Awaitable[Tuple[List[str], Optional[str], bool]]],
+                              refresh: bool = False) -> Tuple[List[str], str]:
+        """Return cached questions or generate them once for all concurrent callers
+
+        Args:
+            key: Cache key from make_key
+            generate: Coroutine factory producing the questions on a miss, the key to
+                store them under instead of key when they answer another request (such as
+                a fallback tier's) or None, and whether they may be stored at all; results
+                cut short for one request are returned to the callers sharing the
+                generation but not cached
+            refresh: Skip the cached value and regenerate
+
+        Returns:
+            List of questions, and the key they are (or, when not cacheable, would be) cached under
+        """
+        if not refresh:
+            cached = await self.aget(key)
+            if cached is not None:
+                return cached, key
+
+        # Single flight: identical requests wait for the generation already running.
+        # If that generation is abandoned (its own request was cancelled), generate here instead.
+        inflight = self._inflight.get(key)
+        while inflight is not None:
+            self._shared += 1
+            try:
+                questions, stored_key = await asyncio.shield(inflight)
+                return list(questions), stored_key
+            except asyncio.CancelledError:
+                if not inflight.cancelled():
+                    raise
+            inflight = self._inflight.get(key)
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            questions, stored_key, cacheable = await generate()
+            stored_key = stored_key or key
+        except BaseException as e:
+            if isinstance(e, (asyncio.CancelledError, GenerationCancelled)):
+                # Aborted work is never cached and doesn't fail the requests sharing it
+                future.cancel()
+            else:
+                future.set_exception(e)
+                # Mark the exception as retrieved when nobody else was waiting
+                future.exception()
+            raise
+        else:
+            future.set_result((questions, stored_key))
+            if cacheable:
+                await self.aset(stored_key, questions)
+            return list(questions), stored_key
+        finally:
+            self._inflight.pop(key, None)
+
+    def clear(self) -> None:
+        """Remove all entries from both tiers"""
+        with self._lock:
+            self._entries.clear()
+        if self.db_path:
+            with self._db_lock:
+                db = self._connection()
+                db.execute("DELETE FROM question_cache")
+                db.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        """Return hit, miss and eviction counters"""
+        hits = self._memory_hits + self._disk_hits
+        lookups = hits + self._misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "persistent": bool(self.db_path),
+            "memory_hits": self._memory_hits,
+            "disk_hits": self._disk_hits,
+            "misses": self._misses,
+            "hit_rate": round(hits / lookups, 3) if lookups else 0.0,
+            "evictions": self._evictions,
+            "expirations": self._expirations,
+            "shared_generations": self._shared,
+            "in_flight": len(self._inflight),
+        }
+
+
+# Shared cache for /api/generate-questions
+question_cache = QuestionCache(
+    max_entries=int(os.getenv("QUESTION_CACHE_SIZE", 1024)),
+    ttl_seconds=float(os.getenv("QUESTION_CACHE_TTL", 86400)),
+    db_path=os.getenv("QUESTION_CACHE_DB") or None
+)
@@ -0,0 +1,331 @@
+import os
+import re
+import json
+import time
+import logging
+import sqlite3
+import threading
+from collections import deque
+from typing import Dict, Any, Iterable, List, Optional, Tuple
+from dotenv import load_dotenv
+
+from app.utils.metrics import generated_questions, question_index_lookups, question_index_lookup_duration
+
+# Load environment variables
+load_dotenv()
+
+# Configure logger
+logger = logging.getLogger(__name__)
+
+INDEX_QUESTIONS = generated_questions.labels("index")
+INDEX_HITS = question_index_lookups.labels("hit")
+INDEX_MISSES = question_index_lookups.labels("miss")
+
+
+class QuestionIndex:
+    """Similarity index of past generations, used to skip generation for near-identical products
+
+    Products are embedded from the prompt fields with scikit-learn's
+    HashingVectorizer (word unigrams and bigrams, L2-normalized). Hashed vectors
+    need no fitting, so entries are added incrementally and the index is
+    persisted as raw text in SQLite. A lookup is a brute-force cosine
+    nearest-neighbour search over the stored vectors; when the closest
+    product generated by the same model is at least as similar as the
+    threshold, its questions are reused with the product name swapped in.
+    """
+
+    def __init__(self, enabled: bool = False, threshold: float = 0.9, max_entries: int = 50000,
+                 db_path: Optional[str] = None, sync_interval: float = 1.0, stats_window: int = 1000):
+        """Initialize the index
+
+        Args:
+            enabled: Whether lookups can return stored questions
+            threshold: Minimum cosine similarity (0-1) for reuse
+            max_entries: Maximum number of generations kept; the oldest are dropped first
+            db_path: Optional SQLite file persisting the index across restarts and workers
+            sync_interval: Seconds between checks for entries added by other processes
+            stats_window: Number of recent lookup latencies kept for percentiles
+        """
+        self.enabled = enabled
+        self.threshold = threshold
+        self.max_entries = max(1, max_entries)
+        self.db_path = db_path
+        self.sync_interval = sync_interval
+
+        self._lock = threading.Lock()
+        self._vectorizer = None
+        # Vectors in blocks of (sparse rows, model codes), oldest first. New entries form
+        # a block and blocks no larger than their predecessor are merged into it, so an
+        # insert copies O(log n) rows amortized and a lookup multiplies O(log n) blocks.
+        self._blocks: List[Tuple[Any, Any]] = []
+        # Entries aligned with the stacked block rows: (product name, questions)
+        self._entries: List[Tuple[str, List[str]]] = []
+        # Entries ever dropped from the front of _entries, which maps a row of a
+        # lookup's snapshot to its entry after the lock was released
+        self._dropped = 0
+        self._model_codes: Dict[str, int] = {}
+        self._loaded = False
+
+        # Opened lazily and per process, since SQLite connections must not cross a fork
+        self._db: Optional[sqlite3.Connection] = None
+        self._db_pid: Optional[int] = None
+        self._last_row_id = 0
+        self._own_row_ids: set = set()
+        self._last_sync = 0.0
+
+        # Counters
+        self._lookups = 0
+        self._hits = 0
+        self._adds = 0
+        self._evictions = 0
+        self._lookup_seconds: deque = deque(maxlen=stats_window)
+
+    def _connection(self) -> sqlite3.Connection:
+        """Return this process's connection to the persistent index"""
+        if self._db is None or self._db_pid != os.getpid():
+            self._db = sqlite3.connect(self.db_path, check_same_thread=False)
+            self._db_pid = os.getpid()
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS question_index (id INTEGER PRIMARY KEY AUTOINCREMENT, "
+                "model TEXT NOT NULL, text TEXT NOT NULL, name TEXT NOT NULL, questions TEXT NOT NULL)"
+            )
+            self._db.commit()
+        return self._db
+
+    @staticmethod
+    def product_text(product_info: Dict[str, Any], fields: Iterable[str]) -> str:
+        """Text embedded for a product: its prompt fields, whitespace-normalized"""
+        parts = []
+        for field in fields:
+            value = product_info.get(field)
+            if isinstance(value, list):
+                value = " ".join(str(item) for item in value)
+            if value:
+                parts.append(f"{field}: {' '.join(str(value).split())}")
+        return "\n".join(parts)
+
+    @staticmethod
+    def adapt(questions: List[str], source_name: str, target_name: str) -> List[str]:
+        """Replace the indexed product's name with the new product's name"""
+        if not source_name or source_name == target_name:
+            return list(questions)
+        pattern = re.compile(re.escape(source_name), re.IGNORECASE)
+        return [pattern.sub(lambda match: target_name, question) for question in questions]
+
+    def _ensure_loaded(self) -> None:
+        """Create the vectorizer and load persisted entries; called with the lock held"""
+        if self._loaded:
+            return
+        # Deferred so that importing the app does not pay for scikit-learn
+        from sklearn.feature_extraction.text import HashingVectorizer
+
+        self._vectorizer = HashingVectorizer(
+            analyzer="word", ngram_range=(1, 2), n_features=2 ** 18, alternate_sign=False, norm="l2"
+        )
+        self._loaded = True
+        if self.db_path:
+            rows = self._connection().execute(
+                "SELECT id, model, text, name, questions FROM question_index ORDER BY id DESC LIMIT ?",
+                (self.max_entries,)
+            ).fetchall()
+            self._append_rows(reversed(rows))
+            self._last_sync = time.monotonic()
+            logger.info(f"Question index loaded {len(self._entries)} entries from {self.db_path}")
+
+    def _append_rows(self, rows: Iterable[Tuple[int, str, str, str, str]]) -> None:
+        """Add persisted rows to the in-memory index; called with the lock held"""
+        entries = []
+        for row_id, model_id, text, name, questions in rows:
+            self._last_row_id = max(self._last_row_id, row_id)
+            if row_id in self._own_row_ids:
+                self._own_row_ids.discard(row_id)
+                continue
+            entries.append((model_id, text, name, json.loads(questions)))
+        if entries:
+            self._append(entries)
+
+    def _append(self, entries: List[Tuple[str, str, str, List[str]]]) -> None:
+        """Add (model id, text, name, questions) entries to the in-memory index; called with the lock held"""
+        import numpy as np
+        from scipy.sparse import vstack
+
+        codes = [self._model_codes.setdefault(model_id, len(self._model_codes)) for model_id, _, _, _ in entries]
+        self._blocks.append((self._vectorizer.transform([text for _, text, _, _ in entries]), np.array(codes)))
+        self._entries.extend((name, questions) for _, _, name, questions in entries)
+        while len(self._blocks) > 1 and self._blocks[-1][0].shape[0] >= self._blocks[-2][0].shape[0]:
+            vectors, models = self._blocks.pop()
+            previous_vectors, previous_models = self._blocks[-1]
+            self._blocks[-1] = (vstack([previous_vectors, vectors], format="csr"),
+                                np.concatenate([previous_models, models]))
+
+        # Over the limit, drop the oldest tenth at once so eviction copies rarely
+        excess = len(self._entries) - self.max_entries
+        if excess > 0:
+            excess += self.max_entries // 10
+            self._evictions += min(excess, len(self._entries))
+            self._dropped += min(excess, len(self._entries))
+            del self._entries[:excess]
+            while excess > 0 and self._blocks:
+                vectors, models = self._blocks[0]
+                if vectors.shape[0] <= excess:
+                    self._blocks.pop(0)
+                    excess -= vectors.shape[0]
+                else:
+                    self._blocks[0] = (vectors[excess:], models[excess:])
+                    excess = 0
+
+    def _sync(self) -> None:
+        """Pick up entries other processes added to the persistent index; called with the lock held"""
+        now = time.monotonic()
+        if not self.db_path or now - self._last_sync < self.sync_interval:
+            return
+        self._last_sync = now
+        rows = self._connection().execute(
+            "SELECT id, model, text, name, questions FROM question_index WHERE id > ? ORDER BY id",
+            (self._last_row_id,)
+        ).fetchall()
+        self._append_rows(rows)
+
+    def load(self) -> None:
+        """Import scikit-learn and load persisted entries ahead of the first lookup"""
+        with self._lock:
+            self._ensure_loaded()
+
+    def lookup(self, product_info: Dict[str, Any], fields: Iterable[str], num_questions: int,
+               model_id: str) -> Optional[List[str]]:
+        """Return questions of the most similar indexed product, adapted to this one, or None
+
+        Args:
+            product_info: Dictionary containing product information
+            fields: Product fields used in the prompt
+            num_questions: Number of questions requested
+            model_id: Generation model; only its own generations are reused
+
+        Returns:
+            num_questions questions, or None when no indexed product is similar enough
+        """
+        if not self.enabled:
+            return None
+        import numpy as np
+
+        start = time.perf_counter()
+        text = self.product_text(product_info, fields)
+        # Snapshot the blocks under the lock and search them outside it, so concurrent
+        # lookups don't queue behind each other's matrix products. Blocks are never
+        # modified in place, only replaced, so the snapshot stays consistent.
+        with self._lock:
+            self._ensure_loaded()
+            self._sync()
+            code = self._model_codes.get(model_id)
+            blocks = list(self._blocks) if self._entries else []
+            dropped = self._dropped
+            vectorizer = self._vectorizer
+
+        match = None
+        best_similarity, best = -1.0, None
+        if blocks and code is not None:
+            # A dense query makes each block product a sparse matrix-vector product
+            query = vectorizer.transform([text])
+            vector = np.zeros(query.shape[1])
+            vector[query.indices] = query.data
+            offset = 0
+            for vectors, models in blocks:
+                # Rows are L2-normalized, so the dot product is the cosine similarity
+                similarities = vectors @ vector
+                similarities[models != code] = -1.0
+                row = int(similarities.argmax())
+                if similarities[row] > best_similarity:
+                    best_similarity, best = float(similarities[row]), offset + row
+                offset += vectors.shape[0]
+
+        with self._lock:
+            if best is not None and best_similarity >= self.threshold:
+                # Entries are only appended or dropped from the front while the lock was free
+                index = best + dropped - self._dropped
+                if index >= 0:
+                    name, questions = self._entries[index]
+                    if len(questions) >= num_questions:
+                        match = (name, questions[:num_questions])
+            self._lookups += 1
+            if match is not None:
+                self._hits += 1
+            seconds = time.perf_counter() - start
+            self._lookup_seconds.append(seconds)
+        question_index_lookup_duration.observe(seconds)
+
+        if match is None:
+            INDEX_MISSES.inc()
+            return None
+        INDEX_HITS.inc()
+        INDEX_QUESTIONS.inc(len(match[1]))
+        return self.adapt(match[1], match[0], product_info.get("name", ""))
+
+    def add(self, product_info: Dict[str, Any], fields: Iterable[str], model_id: str, questions: List[str]) -> None:
+        """Index the questions generated for a product"""
+        if not self.enabled or not questions:
+            return
+        text = self.product_text(product_info, fields)
+        name = product_info.get("name", "")
+        questions = list(questions)
+        with self._lock:
+            self._ensure_loaded()
+            if self.db_path:
+                db = self._connection()
+                row_id = db.execute(
+                    "INSERT INTO question_index (model, text, name, questions) VALUES (?, ?, ?, ?)",
+                    (model_id, text, name, json.dumps(questions))
+                ).lastrowid
+                # Keep the table as bounded as the in-memory index
+                db.execute("DELETE FROM question_index WHERE id <= ?", (row_id - self.max_entries,))
+                db.commit()
+                # Already indexed here; skip the row when syncing with other processes
+                self._own_row_ids.add(row_id)
+            self._append([(model_id, text, name, questions)])
+            self._adds += 1
+
+    def clear(self) -> None:
+        """Remove every entry from memory and disk"""
+        with self._lock:
+            self._blocks = []
+            self._dropped += len(self._entries)
+            self._entries = []
+            if self.db_path:
+                db = self._connection()
+                db.execute("DELETE FROM question_index")
+                db.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        """Return reuse rate, lookup latency and size"""
+        latencies = sorted(self._lookup_seconds)
+
+        def percentile(fraction: float) -> float:
+            if not latencies:
+                return 0.0
+            return round(latencies[min(len(latencies) - 1, int(fraction * len(latencies)))] * 1000, 3)
+
+        return {
+            "enabled": self.enabled,
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "threshold": self.threshold,
+            "persistent": bool(self.db_path),
+            "lookups": self._lookups,
+            "hits": self._hits,
+            "reuse_rate": round(self._hits / self._lookups, 3) if self._lookups else 0.0,
+            "adds": self._adds,
+            "evictions": self._evictions,
+            "lookup_ms_p50": percentile(0.50),
+            "lookup_ms_p95": percentile(0.95),
+            "lookup_ms_p99": percentile(0.99),
+        }
+
+
+# Shared index for /api/generate-questions
+question_index = QuestionIndex(
+    enabled=os.getenv("QUESTION_INDEX_ENABLED", "false").lower() == "true",
+    threshold=float(os.getenv("QUESTION_INDEX_THRESHOLD", 0.9)),
+    max_entries=int(os.getenv("QUESTION_INDEX_MAX_ENTRIES", 50000)),
+    db_path=os.getenv("QUESTION_INDEX_DB") or None
+)
@@ -0,0 +1,137 @@
+"""Compare question generation backends on latency, memory and output agreement
+
+Each backend is loaded in a fresh process so resident memory is measured in
+isolation. Agreement is the share of prompts whose greedy output matches the
+eager FP32 backend exactly. Run from the ai-service directory:
+
+    python export_model.py --model google/flan-t5-base        # once, for the onnx backend
+    python -m benchmarks.generation_backends --backends eager int8 onnx --json backends.json
+"""
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import statistics
+import time
+from typing import Dict, Any, List
+
+PRODUCTS = [
+    {"name": "Organic Honey", "description": "Pure organic honey from sustainable apiaries", "category": "food"},
+    {"name": "Bamboo Toothbrush", "description": "Biodegradable handle with charcoal bristles", "category": "personal care"},
+    {"name": "Merino Wool Socks", "description": "Ethically sourced wool hiking socks", "category": "clothing"},
+    {"name": "Cold Brew Coffee", "description": "Single origin beans steeped for 20 hours", "category": "beverages"},
+    {"name": "Recycled Notebook", "description": "A5 notebook made from post-consumer paper", "category": "stationery"},
+    {"name": "Vitamin D3 Drops", "description": "Plant-based vitamin D3 in olive oil", "category": "supplements"},
+]
+
+
+def resident_memory_bytes() -> int:
+    """Current resident set size of this process"""
+    try:
+        with open("/proc/self/status") as status:
+            for line in status:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def measure_backend(model_name: str, backend: str, repeat: int, queue) -> None:
+    """Load one backend and report its measurements through queue (runs in a child process)"""
+    logging.disable(logging.INFO)
+    try:
+        import torch
+        from app.models.question_generator import QuestionGenerator
+
+        rss_before = resident_memory_bytes()
+        start = time.perf_counter()
+        generator = QuestionGenerator(model_name, backend=backend)
+        generator.warmup()
+        load_seconds = time.perf_counter() - start
+        rss_loaded = resident_memory_bytes()
+
+        # Greedy decoding gives deterministic outputs to compare across backends
+        greedy_outputs = []
+        greedy_ms = []
+        for product in PRODUCTS:
+            inputs = generator.prompt_inputs(product)
+            start = time.perf_counter()
+            with torch.no_grad():
+                outputs = generator.model.generate(**inputs, max_new_tokens=64, do_sample=False)
+            greedy_ms.append((time.perf_counter() - start) * 1000)
+            greedy_outputs.append(generator.decode(outputs)[0])
+
+        # End-to-end sampled generation as served by the API
+        generate_ms = []
+        for _ in range(repeat):
+            for product in PRODUCTS:
+                start = time.perf_counter()
+                generator.generate(product, num_questions=5)
+                generate_ms.append((time.perf_counter() - start) * 1000)
+
+        queue.put({
+            "backend": backend,
+            "model_id": generator.model_id,
+            "load_seconds": round(load_seconds, 2),
+            "weights_mb": round(generator.memory_footprint() / (1024 * 1024), 1),
+            "rss_delta_mb": round((rss_loaded - rss_before) / (1024 * 1024), 1),
+            "peak_rss_mb": round(resident_memory_bytes() / (1024 * 1024), 1),
+            "greedy_ms_median": round(statistics.median(greedy_ms), 1),
+            "generate_5_ms_median": round(statistics.median(generate_ms), 1),
+            "generate_5_ms_p95": round(sorted(generate_ms)[int(0.95 * (len(generate_ms) - 1))], 1),
+            "greedy_outputs": greedy_outputs,
+        })
+    except Exception as e:
+        queue.put({"backend": backend, "error": str(e)})
+
+
+def compare(model_name: str, backends: List[str], repeat: int) -> List[Dict[str, Any]]:
+    """Measure every backend in its own process and compute agreement with eager"""
+    context = multiprocessing.get_context("spawn")
+    results = []
+    for backend in backends:
+        queue = context.Queue()
+        process = context.Process(target=measure_backend, args=(model_name, backend, repeat, queue))
+        process.start()
+        results.append(queue.get())
+        process.join()
+
+    reference = next((r for r in results if r["backend"] == "eager" and "error" not in r), None)
+    for result in results:
+        if reference is None or "error" in result:
+            continue
+        matches = sum(a == b for a, b in zip(result["greedy_outputs"], reference["greedy_outputs"]))
+        result["agreement_with_eager"] = round(matches / len(PRODUCTS), 3)
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compare question generation backends")
+    parser.add_argument("--model", default="google/flan-t5-base")
+    parser.add_argument("--backends", nargs="+", default=["eager", "int8", "onnx"])
+    parser.add_argument("--repeat", type=int, default=3, help="Sampled generate() runs per product")
+    parser.add_argument("--json", help="Write the full report to this file")
+    args = parser.parse_args()
+
+    results = compare(args.model, args.backends, args.repeat)
+
+    columns = ["backend", "load_seconds", "weights_mb", "rss_delta_mb", "greedy_ms_median",
+               "generate_5_ms_median", "generate_5_ms_p95", "agreement_with_eager"]
+    print(" ".join(f"{column:>20}" for column in columns))
+    for result in results:
+        if "error" in result:
+            print(f"{result['backend']:>20} error: {result['error']}")
+            continue
+        print(" ".join(f"{str(result.get(column, '-')):>20}" for column in columns))
+
+    if args.json:
+        with open(args.json, "w") as report:
+            json.dump({"model": args.model, "results": results}, report, indent=2)
+        print(f"Report written to {os.path.abspath(args.json)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""Measure the logging cost paid on the request path for each logging mode
+
+For every mode the service's logging is reconfigured through
+configure_logging and two things are timed in the calling thread: a burst
+of the records one scoring request emits, and a full in-process
+POST /api/calculate-transparency-score. Console output goes to /dev/null
+and the log file to a temporary directory. Run from the ai-service directory:
+
+    python -m benchmarks.logging_overhead --requests 2000 --json logging.json
+"""
+import argparse
+import json
+import logging
+import os
+import statistics
+import sys
+import tempfile
+import time
+from typing import Dict, Any, List
+
+# Logging modes as environment overrides for configure_logging
+MODES = {
+    "sync": {"LOG_QUEUE_ENABLED": "false"},
+    "queue": {"LOG_QUEUE_ENABLED": "true"},
+    "queue_json": {"LOG_QUEUE_ENABLED": "true", "LOG_FORMAT": "json"},
+    "queue_sampled": {"LOG_QUEUE_ENABLED": "true", "LOG_SAMPLING": "app.models.transparency_scorer=0.1"},
+    "queue_rotating": {"LOG_QUEUE_ENABLED": "true", "LOG_ROTATION": "size", "LOG_MAX_BYTES": str(1024 * 1024)},
+}
+
+ENV_KEYS = {"LOG_QUEUE_ENABLED", "LOG_FORMAT", "LOG_SAMPLING", "LOG_ROTATION", "LOG_MAX_BYTES", "LOG_FILE"}
+
+REQUEST = {
+    "product": {"name": "Organic Honey", "description": "Pure organic honey", "certifications": ["USDA Organic"]},
+    "answers": {"Where is it sourced?": "Sourced from certified apiaries in New Zealand and lab tested."},
+}
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    """Nearest-rank percentile of sorted values"""
+    return values[int(fraction * (len(values) - 1))]
+
+
+def log_burst() -> None:
+    """Emit the records a single scoring request logs"""
+    logging.getLogger("app.api.routes").info(
+        f"Calculating transparency score for product: {REQUEST['product']['name']}"
+    )
+    logging.getLogger("app.models.transparency_scorer").info(
+        f"Calculating transparency score for product: {REQUEST['product']['name']}"
+    )
+
+
+def measure(mode: str, requests: int, log_dir: str) -> Dict[str, Any]:
+    """Configure one logging mode and time logging and full requests under it"""
+    from fastapi.testclient import TestClient
+    from app.utils.logging_config import configure_logging
+    import main
+
+    for key in ENV_KEYS:
+        os.environ.pop(key, None)
+    os.environ.update(MODES[mode], LOG_FILE=os.path.join(log_dir, f"{mode}.log"))
+    configure_logging()
+
+    burst_us = []
+    for _ in range(requests):
+        start = time.perf_counter()
+        log_burst()
+        burst_us.append((time.perf_counter() - start) * 1e6)
+
+    request_ms = []
+    with TestClient(main.app) as client:
+        for _ in range(requests):
+            start = time.perf_counter()
+            client.post("/api/calculate-transparency-score", json=REQUEST)
+            request_ms.append((time.perf_counter() - start) * 1000)
+
+    burst_us.sort()
+    request_ms.sort()
+    return {
+        "mode": mode,
+        "log_us_p50": round(statistics.median(burst_us), 2),
+        "log_us_p99": round(percentile(burst_us, 0.99), 2),
+        "request_ms_p50": round(statistics.median(request_ms), 3),
+        "request_ms_p99": round(percentile(request_ms, 0.99), 3),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Measure per-request logging overhead")
+    parser.add_argument("--modes", nargs="+", default=list(MODES), choices=list(MODES))
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--json", help="Write the full report to this file")
+    args = parser.parse_args()
+
+    # Keep the console handler from measuring the terminal
+    real_stdout = sys.stdout
+    sys.stdout = open(os.devnull, "w")
+    os.environ["PRELOAD_QUESTION_GENERATOR"] = "false"
+    try:
+        with tempfile.TemporaryDirectory() as log_dir:
+            results = [measure(mode, args.requests, log_dir) for mode in args.modes]
+            logging.shutdown()
+    finally:
+        sys.stdout.close()
+        sys.stdout = real_stdout
+
+    columns = ["mode", "log_us_p50", "log_us_p99", "request_ms_p50", "request_ms_p99"]
+    print(" ".join(f"{column:>15}" for column in columns))
+    for result in results:
+        print(" ".join(f"{str(result[column]):>15}" for column in columns))
+
+    if args.json:
+        with open(args.json, "w") as report:
+            json.dump({"requests": args.requests, "results": results}, report, indent=2)
+        print(f"Report written to {os.path.abspath(args.json)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,192 @@
+"""Measure memory and throughput of serve.py at different worker counts
+
+For each worker count the server is started (with and without the shared
+weight preload), warmed until every worker is ready, then driven with
+concurrent uncached question generation requests. Memory is reported as
+the summed RSS of all server processes, which counts shared pages once per
+process, and the summed PSS, which splits shared pages between the processes
+and so reflects actual memory use. Linux only. Run from the ai-service directory:
+
+    python -m benchmarks.multi_worker --workers 1 2 4 8 --duration 30 --json workers.json
+"""
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List
+
+from benchmarks.generation_backends import PRODUCTS
+
+
+def free_port() -> int:
+    """Pick an unused local port"""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def process_tree(pid: int) -> List[int]:
+    """pid and all of its descendants"""
+    pids = [pid]
+    for task in os.listdir(f"/proc/{pid}/task"):
+        try:
+            with open(f"/proc/{pid}/task/{task}/children") as children:
+                for child in children.read().split():
+                    pids.extend(process_tree(int(child)))
+        except OSError:
+            continue
+    return pids
+
+
+def memory_mb(pids: List[int]) -> Dict[str, float]:
+    """Summed RSS and PSS of the given processes"""
+    totals = {"rss": 0, "pss": 0}
+    for pid in pids:
+        try:
+            with open(f"/proc/{pid}/smaps_rollup") as rollup:
+                for line in rollup:
+                    key = line.split(":")[0].lower()
+                    if key in totals:
+                        totals[key] += int(line.split()[1]) * 1024
+        except OSError:
+            continue
+    return {f"{key}_mb": round(value / (1024 * 1024), 1) for key, value in totals.items()}
+
+
+def post_json(url: str, payload: Dict[str, Any], timeout: float = 120) -> int:
+    """POST a JSON body and return the status code"""
+    request = urllib.request.Request(
+        url, data=json.dumps(payload).encode("utf-8"), headers={"Content-Type": "application/json"}
+    )
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            response.read()
+            return response.status
+    except urllib.error.HTTPError as e:
+        return e.code
+
+
+def wait_ready(base_url: str, workers: int, timeout: float) -> None:
+    """Wait until consecutive /ready probes succeed often enough to have reached every worker"""
+    deadline = time.time() + timeout
+    consecutive = 0
+    while consecutive < 4 * workers:
+        if time.time() > deadline:
+            raise RuntimeError(f"Server at {base_url} was not ready after {timeout:.0f}s")
+        try:
+            with urllib.request.urlopen(f"{base_url}/ready", timeout=5) as response:
+                consecutive = consecutive + 1 if response.status == 200 else 0
+        except (urllib.error.URLError, ConnectionError):
+            consecutive = 0
+            time.sleep(0.2)
+
+
+def drive_load(base_url: str, concurrency: int, duration: float, num_questions: int) -> Dict[str, Any]:
+    """Send uncached generation requests from concurrency threads for duration seconds"""
+    url = f"{base_url}/api/generate-questions"
+    deadline = time.time() + duration
+
+    def client(index: int) -> List[tuple]:
+        results = []
+        sent = 0
+        while time.time() < deadline:
+            product = dict(PRODUCTS[(index + sent) % len(PRODUCTS)])
+            payload = {"product": product, "num_questions": num_questions, "refresh": True}
+            start = time.perf_counter()
+            status = post_json(url, payload)
+            results.append((status, (time.perf_counter() - start) * 1000))
+            sent += 1
+        return results
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = [r for batch in executor.map(client, range(concurrency)) for r in batch]
+    elapsed = time.perf_counter() - start
+
+    latencies = sorted(ms for status, ms in results if status == 200)
+    return {
+        "requests": len(results),
+        "errors": sum(status != 200 for status, _ in results),
+        "rps": round(len(latencies) / elapsed, 2),
+        "latency_ms_p50": round(statistics.median(latencies), 1) if latencies else None,
+        "latency_ms_p95": round(latencies[int(0.95 * (len(latencies) - 1))], 1) if latencies else None,
+    }
+
+
+def run(server: str, workers: int, preload: bool, concurrency: int, duration: float,
+        num_questions: int, ready_timeout: float) -> Dict[str, Any]:
+    """Start the server, measure idle memory, drive load and measure loaded memory"""
+    port = free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    command = [sys.executable, server, "--host", "127.0.0.1", "--port", str(port), "--workers", str(workers)]
+    if not preload:
+        command.append("--no-preload")
+
+    env = dict(os.environ, QUESTION_CACHE_DB="", JOB_DB="", LOG_LEVEL="WARNING")
+    process = subprocess.Popen(command, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        start = time.perf_counter()
+        wait_ready(base_url, workers, ready_timeout)
+        ready_seconds = time.perf_counter() - start
+        idle = memory_mb(process_tree(process.pid))
+        load = drive_load(base_url, concurrency, duration, num_questions)
+        loaded = memory_mb(process_tree(process.pid))
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+    return {
+        "workers": workers,
+        "preload": preload,
+        "ready_seconds": round(ready_seconds, 2),
+        "idle_rss_mb": idle["rss_mb"],
+        "idle_pss_mb": idle["pss_mb"],
+        "loaded_rss_mb": loaded["rss_mb"],
+        "loaded_pss_mb": loaded["pss_mb"],
+        **load,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Measure memory and throughput across worker counts")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--concurrency", type=int, default=0, help="Client threads (default: 2 per worker)")
+    parser.add_argument("--duration", type=float, default=30, help="Seconds of load per configuration")
+    parser.add_argument("--num-questions", type=int, default=5)
+    parser.add_argument("--ready-timeout", type=float, default=600)
+    parser.add_argument("--server", default="serve.py", help="Server script to launch")
+    parser.add_argument("--skip-no-preload", action="store_true", help="Only measure the shared-weights mode")
+    parser.add_argument("--json", help="Write the full report to this file")
+    args = parser.parse_args()
+
+    results = []
+    for workers in args.workers:
+        for preload in ([True] if args.skip_no_preload else [True, False]):
+            concurrency = args.concurrency or 2 * workers
+            results.append(run(args.server, workers, preload, concurrency, args.duration,
+                               args.num_questions, args.ready_timeout))
+
+    columns = ["workers", "preload", "ready_seconds", "idle_rss_mb", "idle_pss_mb", "loaded_pss_mb",
+               "rps", "latency_ms_p50", "latency_ms_p95", "errors"]
+    print(" ".join(f"{column:>15}" for column in columns))
+    for result in results:
+        print(" ".join(f"{str(result[column]):>15}" for column in columns))
+
+    if args.json:
+        with open(args.json, "w") as report:
+            json.dump({"cpu_count": os.cpu_count(), "results": results}, report, indent=2)
+        print(f"Report written to {os.path.abspath(args.json)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+"""Measure prompt length, prompt construction time and encoder latency by description size
+
+Synthetic products with descriptions of growing length are turned into
+prompts two ways. The budgeted way is the generator's PromptBuilder. The
+unbounded way tokenizes every field in full, which is how prompts were built
+before the budgets. For each size the benchmark reports the prompt tokens, the
+cold and cached build time, and the median encoder forward pass. The encoder
+forward pass runs once per generate call. With budgets, the token count and
+encoder latency should stay flat however long the description gets. Run from
+the ai-service directory:
+
+    python -m benchmarks.prompt_budget --sizes 0 500 2000 8000 32000 --json prompt_budget.json
+"""
+import argparse
+import json
+import logging
+import os
+import random
+import statistics
+import time
+from typing import Dict, Any, List, Optional
+
+import torch
+
+from app.models.prompt_builder import PROMPT_FIELDS, PromptBuilder
+from app.models.question_generator import QuestionGenerator, QUALITY
+
+FILLER = [
+    "The jar is sealed with a tamper-evident lid and labelled with a batch code.",
+    "Customers often pair it with yoghurt, fresh fruit or a splash of cold milk.",
+    "Our team has refined the recipe over many seasons of tasting sessions.",
+    "Store in a cool, dry place away from direct sunlight once opened.",
+    "The packaging artwork was designed by an independent studio in Lisbon.",
+    "Each batch is slow baked until golden and left to cool on open racks.",
+]
+SALIENT = "The oats are grown on certified organic farms and the honey is traceable to each hive."
+
+
+def make_product(description_chars: int, rng: random.Random) -> Dict[str, Any]:
+    """A granola product whose description is padded with filler sentences to about description_chars"""
+    sentences = ["Crunchy honey granola baked in small batches."]
+    while sum(len(sentence) + 1 for sentence in sentences) < description_chars:
+        sentences.append(rng.choice(FILLER))
+        if len(sentences) == 4:
+            sentences.append(SALIENT)
+    return {
+        "name": "Harvest Honey Granola 500g",
+        "description": " ".join(sentences) if description_chars else "",
+        "category": "food",
+        "ingredients": ["rolled oats", "honey", "sunflower seeds", "almonds"],
+        "country_of_origin": "New Zealand",
+        "certifications": ["organic", "fair trade"],
+    }
+
+
+def time_ms(function, repeat: int) -> float:
+    """Median wall time of function() in milliseconds"""
+    durations = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        durations.append((time.perf_counter() - start) * 1000)
+    return statistics.median(durations)
+
+
+def measure(generator: QuestionGenerator, unbounded: PromptBuilder, description_chars: int, repeat: int,
+            seed: int, max_encoder_tokens: int) -> Dict[str, Any]:
+    """Build one product's prompt both ways and time construction and the encoder forward pass
+
+    Unbounded prompts longer than max_encoder_tokens are not encoded, since
+    attention memory grows with the square of the prompt length.
+    """
+    product = make_product(description_chars, random.Random(seed))
+    builder = generator.prompt_builders[generator.model_name]
+    encoder = generator.model.get_encoder()
+
+    def encode(input_ids: List[int]) -> Optional[float]:
+        if len(input_ids) > max_encoder_tokens:
+            return None
+        tensor = torch.tensor([input_ids], dtype=torch.long)
+        with torch.no_grad():
+            return round(time_ms(lambda: encoder(input_ids=tensor, attention_mask=torch.ones_like(tensor)), repeat), 2)
+
+    budgeted_ids = builder.build(product)
+    unbounded_ids = unbounded.build(product)
+    builder.input_ids(product)
+    return {
+        "description_chars": len(product["description"]),
+        "unbounded_tokens": len(unbounded_ids),
+        "budgeted_tokens": len(budgeted_ids),
+        "unbounded_build_ms": round(time_ms(lambda: unbounded.build(product), repeat), 3),
+        "budgeted_build_ms": round(time_ms(lambda: builder.build(product), repeat), 3),
+        "cached_build_ms": round(time_ms(lambda: builder.input_ids(product), repeat), 4),
+        "unbounded_encoder_ms": encode(unbounded_ids),
+        "budgeted_encoder_ms": encode(budgeted_ids),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Prompt tokens and encoder latency by description size")
+    parser.add_argument("--model", default="google/flan-t5-base", help="Hugging Face model name or local path")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[0, 500, 2000, 8000, 32000],
+                        help="Description lengths in characters")
+    parser.add_argument("--repeat", type=int, default=10, help="Timed runs per measurement")
+    parser.add_argument("--max-encoder-tokens", type=int, default=8192,
+                        help="Skip the encoder pass of unbounded prompts longer than this")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="Write the full report to this file")
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+    generator = QuestionGenerator(args.model, modes=[QUALITY])
+    generator.warmup()
+    # Budgets no field reaches reproduce the untruncated prompts
+    unbounded = PromptBuilder(generator.tokenizer, budgets={field: 10 ** 9 for field in PROMPT_FIELDS},
+                              max_tokens=10 ** 9)
+    results = [measure(generator, unbounded, size, args.repeat, args.seed, args.max_encoder_tokens)
+               for size in args.sizes]
+
+    columns = ["description_chars", "unbounded_tokens", "budgeted_tokens", "unbounded_build_ms",
+               "budgeted_build_ms", "cached_build_ms", "unbounded_encoder_ms", "budgeted_encoder_ms"]
+    print(" ".join(f"{column:>20}" for column in columns))
+    for result in results:
+        print(" ".join(f"{str(result[column]):>20}" for column in columns))
+
+    if args.json:
+        with open(args.json, "w") as report:
+            json.dump({
+                "model": args.model,
+                "budgets": generator.prompt_builders[generator.model_name].stats()["budgets"],
+                "max_tokens": generator.prompt_builders[generator.model_name].max_tokens,
+                "repeat": args.repeat,
+                "results": results,
+            }, report, indent=2)
+        print(f"Report written to {os.path.abspath(args.json)}")
+
+
+if __name__ == "__main__":
+    main()
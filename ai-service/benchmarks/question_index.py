@@ -0,0 +1,120 @@
+"""Measure reuse rate and lookup latency of the question similarity index
+
+An index is filled with synthetic catalogue products, then queried with
+variants of indexed products (another size or flavour, as in a supplier
+catalogue) and with products that were never indexed. Variants should be
+reused; new products should fall through to generation. Run from the
+ai-service directory:
+
+    python -m benchmarks.question_index --sizes 1000 10000 50000 --json index.json
+"""
+import argparse
+import json
+import logging
+import os
+import random
+import statistics
+import time
+from typing import Dict, Any, List, Tuple
+
+from app.utils.question_index import QuestionIndex
+
+FIELDS = ("name", "description", "category")
+# Indexed products use the even-numbered brands and origins, new products the odd-numbered ones
+BRANDS = ["Acme", "Nordic", "Terra", "Sunvale", "Kiwi", "Alpine", "Coastal", "Harvest", "Urban", "Wild",
+          "Meadow", "Summit", "Riverbend", "Golden", "Evergreen", "Bluebird"]
+ITEMS = {
+    "food": ["Honey", "Granola", "Olive Oil", "Peanut Butter", "Green Tea", "Dark Chocolate", "Oat Milk", "Coffee Beans"],
+    "personal care": ["Shampoo", "Body Lotion", "Toothpaste", "Sunscreen", "Lip Balm", "Hand Soap"],
+    "household": ["Dish Soap", "Laundry Detergent", "Surface Cleaner", "Trash Bags", "Sponges"],
+    "apparel": ["T-Shirt", "Running Socks", "Denim Jacket", "Wool Sweater", "Rain Coat"],
+}
+QUALIFIERS = ["Organic", "Classic", "Premium", "Sensitive", "Original", "Extra Strong", "Light", "Fair Trade"]
+VARIANTS = ["250g", "500g", "1kg", "Family Pack", "Travel Size", "Vanilla", "Lemon", "Unscented", "Large", "Small"]
+ORIGINS = ["New Zealand", "Italy", "Kenya", "Peru", "Canada", "Vietnam", "Spain", "India", "Chile", "Ghana"]
+
+
+def make_product(rng: random.Random, new: bool = False) -> Dict[str, Any]:
+    """A synthetic base product; new products come from brands and origins that are never indexed"""
+    category = rng.choice(list(ITEMS))
+    brand, item, qualifier = rng.choice(BRANDS[new::2]), rng.choice(ITEMS[category]), rng.choice(QUALIFIERS)
+    name = f"{brand} {qualifier} {item} {rng.randint(1, 999)}"
+    description = (f"{qualifier} {item.lower()} made with ingredients sourced from {rng.choice(ORIGINS[new::2])}, "
+                   f"{rng.choice(['packed', 'produced', 'blended', 'made'])} in small batches "
+                   f"by {brand} since {rng.randint(1950, 2020)}.")
+    return {"name": name, "description": description, "category": category}
+
+
+def make_variant(product: Dict[str, Any], rng: random.Random) -> Dict[str, Any]:
+    """The same product in another size or flavour"""
+    return dict(product, name=f"{product['name']} {rng.choice(VARIANTS)}")
+
+
+def questions_for(product: Dict[str, Any]) -> List[str]:
+    name = product["name"]
+    return [f"Where are the ingredients of {name} sourced from?", f"How is {name} tested?",
+            f"Which certifications does {name} hold?", f"How is {name} packaged?", f"Who makes {name}?"]
+
+
+def measure(size: int, queries: int, threshold: float, seed: int) -> Dict[str, Any]:
+    """Fill an index with size products and time variant and new-product lookups"""
+    rng = random.Random(seed)
+    index = QuestionIndex(enabled=True, threshold=threshold, max_entries=size)
+    products = [make_product(rng) for _ in range(size)]
+
+    start = time.perf_counter()
+    for product in products:
+        index.add(product, FIELDS, "benchmark", questions_for(product))
+    add_seconds = time.perf_counter() - start
+
+    def run(batch: List[Dict[str, Any]]) -> Tuple[float, List[float]]:
+        hits, durations = 0, []
+        for product in batch:
+            lookup_start = time.perf_counter()
+            hits += index.lookup(product, FIELDS, 5, "benchmark") is not None
+            durations.append((time.perf_counter() - lookup_start) * 1000)
+        return hits / len(batch), sorted(durations)
+
+    variant_reuse, variant_ms = run([make_variant(rng.choice(products), rng) for _ in range(queries)])
+    new_reuse, new_ms = run([make_product(rng, new=True) for _ in range(queries)])
+    durations = sorted(variant_ms + new_ms)
+    return {
+        "entries": size,
+        "threshold": threshold,
+        "add_us_mean": round(add_seconds / size * 1e6, 1),
+        "variant_reuse_rate": round(variant_reuse, 3),
+        "new_product_reuse_rate": round(new_reuse, 3),
+        "lookup_ms_p50": round(statistics.median(durations), 3),
+        "lookup_ms_p95": round(durations[int(0.95 * (len(durations) - 1))], 3),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Question similarity index reuse rate and lookup latency")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 50000])
+    parser.add_argument("--thresholds", type=float, nargs="+", default=[float(os.getenv("QUESTION_INDEX_THRESHOLD", 0.9))])
+    parser.add_argument("--queries", type=int, default=500, help="Lookups per query kind")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="Write the full report to this file")
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+    results = [
+        measure(size, args.queries, threshold, args.seed)
+        for size in args.sizes for threshold in args.thresholds
+    ]
+
+    columns = ["entries", "threshold", "add_us_mean", "variant_reuse_rate", "new_product_reuse_rate",
+               "lookup_ms_p50", "lookup_ms_p95"]
+    print(" ".join(f"{column:>22}" for column in columns))
+    for result in results:
+        print(" ".join(f"{str(result[column]):>22}" for column in columns))
+
+    if args.json:
+        with open(args.json, "w") as report:
+            json.dump({"queries": args.queries, "results": results}, report, indent=2)
+        print(f"Report written to {os.path.abspath(args.json)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""Micro-benchmark for TransparencyScorer feature extraction
+
+Times calculate_score on requests with many long answers, the case where
+keyword scanning dominates. Run from the ai-service directory:
+
+    python -m benchmarks.scorer_features --answers 50 100 200 --repeat 20
+"""
+import argparse
+import logging
+import random
+import statistics
+import time
+from typing import Dict, List, Tuple
+
+from app.models.transparency_scorer import TransparencyScorer
+
+WORDS = (
+    "our honey is certified organic and tested for purity every batch is verified by an "
+    "independent lab sourced from family apiaries manufactured in new zealand approved by "
+    "the food authority registered compliant with export rules 100% raw 5 mg pollen per kg "
+    "sustainable fair labor worker welfare environment green quality measure"
+).split()
+
+QUESTION_STEMS = [
+    "How do you test the quality of",
+    "What sustainable practices apply to",
+    "How are workers treated when producing",
+    "Which certifications verify",
+    "Where are the ingredients of",
+]
+
+
+def make_request(num_answers: int, answer_words: int, seed: int = 0) -> Tuple[Dict, Dict[str, str]]:
+    """Build a product and num_answers answers of roughly answer_words words each"""
+    rng = random.Random(seed)
+    product = {
+        "name": "Organic Honey",
+        "description": "Pure organic honey from sustainable apiaries",
+        "ingredients": "100% organic honey",
+        "certifications": ["Organic", "Fair Trade"],
+    }
+    answers = {
+        f"{rng.choice(QUESTION_STEMS)} product {i}?": " ".join(rng.choice(WORDS) for _ in range(answer_words))
+        for i in range(num_answers)
+    }
+    return product, answers
+
+
+def time_call(scorer: TransparencyScorer, request: Tuple[Dict, Dict[str, str]], repeat: int) -> List[float]:
+    """Return per-call durations in milliseconds"""
+    product, answers = request
+    durations = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        scorer.calculate_score(product, answers)
+        durations.append((time.perf_counter() - start) * 1000)
+    return durations
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--answers", type=int, nargs="+", default=[50, 100, 200])
+    parser.add_argument("--answer-words", type=int, default=80)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    scorer = TransparencyScorer()
+    print(f"{'answers':>8} {'median ms':>10} {'min ms':>8}")
+    for num_answers in args.answers:
+        durations = time_call(scorer, make_request(num_answers, args.answer_words), args.repeat)
+        print(f"{num_answers:>8} {statistics.median(durations):>10.3f} {min(durations):>8.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""Deterministic stand-in for the question generation model
+
+StubQuestionGenerator runs the real QuestionGenerator sampling, dedupe,
+fallback and batch scheduler code, but replaces the tokenizer and model with
+a hash-based tokenizer and a seeded candidate picker that sleeps for a
+configurable decode time, scaled down for the faster generation modes.
+Nothing is downloaded, so benchmarks that use it run offline and in seconds.
+"""
+import random
+import time
+import zlib
+from typing import Dict, List
+
+import torch
+
+from app.models.prompt_builder import PROMPT_FIELDS, PromptBuilder
+from app.models.question_generator import QuestionGenerator, GenerationMode, FAST, BALANCED, QUALITY, BEAM, SAMPLE
+
+# Simulated decode cost of each tier relative to the quality tier: a small sampling model,
+# then the base model with a single beam-search round
+MODE_COST = {FAST: 0.3, BALANCED: 0.7, QUALITY: 1.0}
+
+# Candidate questions; several collapse to the same text so dedupe and fallbacks are exercised
+TEMPLATES = [
+    "Where are the raw materials for this product sourced from?",
+    "How is the product tested for quality and safety?",
+    "Which certifications does the product hold?",
+    "How are workers in the supply chain treated?",
+    "What is the environmental impact of manufacturing this product?",
+    "How is the packaging recycled or disposed of?",
+    "Who audits the claims made about this product?",
+    "How is the product tested for quality and safety?",
+    "Which certifications does the product hold?",
+    "What is the environmental impact of manufacturing this product?",
+]
+
+
+class StubTokenizer:
+    """Whitespace tokenizer mapping words to stable ids"""
+
+    pad_token_id = 0
+
+    eos_token_id = None
+
+    def encode(self, text: str, add_special_tokens: bool = True) -> List[int]:
+        return [zlib.crc32(word.encode("utf-8")) % 32000 + 1 for word in text.split()]
+
+    def decode(self, ids: List[int], skip_special_tokens: bool = False) -> str:
+        return " ".join(str(token) for token in ids)
+
+    def __call__(self, text: str, return_tensors: str = "pt") -> Dict[str, torch.Tensor]:
+        ids = torch.tensor([self.encode(text)], dtype=torch.long)
+        return {"input_ids": ids, "attention_mask": torch.ones_like(ids)}
+
+
+class StubQuestionGenerator(QuestionGenerator):
+    """QuestionGenerator whose model is a seeded template picker"""
+
+    def __init__(self, decode_ms: float = 5.0, per_sequence_ms: float = 0.5, seed: int = 0):
+        """Initialize the stub
+
+        Args:
+            decode_ms: Simulated fixed cost of one generate call
+            per_sequence_ms: Simulated extra cost per sampled sequence
+            seed: Seed mixed into every prompt's candidate stream
+        """
+        # The real constructor loads a tokenizer and model, so set its attributes directly
+        self.model_name = "stub"
+        self.model_id = "stub@deterministic"
+        self.prompt_fields = PROMPT_FIELDS
+        self.oversample_factor = 2
+        self.max_batch_sequences = 64
+        self.max_rounds = 2
+        self.similarity_threshold = 0.8
+        self.min_unique_yield = 0.1
+        self.deadline_seconds = 10.0
+        self.generation_kwargs = {}
+        self.scheduler = None
+        self.init_modes({
+            FAST: GenerationMode(FAST, "stub-small", SAMPLE, "deterministic"),
+            BALANCED: GenerationMode(BALANCED, "stub", BEAM, "deterministic"),
+            QUALITY: GenerationMode(QUALITY, "stub", SAMPLE, "deterministic"),
+        }, QUALITY, fallback_depth=4)
+        self.tokenizer = StubTokenizer()
+        self.tokenizers = {"stub-small": self.tokenizer, "stub": self.tokenizer}
+        self.prompt_builders = {name: PromptBuilder(self.tokenizer) for name in self.tokenizers}
+        self.model = None
+        self.models = {}
+        self.decode_ms = decode_ms
+        self.per_sequence_ms = per_sequence_ms
+        self.seed = seed
+        # Calls per prompt, so repeated rounds draw different candidates
+        self._calls: Dict[int, int] = {}
+
+    def warmup(self) -> None:
+        pass
+
+    def memory_footprint(self) -> int:
+        return 0
+
+    def sample(self, inputs, num_sequences: int, cancel_token=None, mode: str = None) -> list:
+        if self.scheduler is not None:
+            return super().sample(inputs, num_sequences, cancel_token, mode)
+        questions = self.sample_batch([inputs["input_ids"][0].tolist()], [num_sequences], mode=mode)[0]
+        if cancel_token is not None:
+            cancel_token.raise_if_cancelled()
+        return questions
+
+    def sample_batch(self, input_ids: list, num_sequences: list, cancel_tokens: list = None,
+                     mode: str = None) -> list:
+        mode = mode or self.default_mode
+        time.sleep(MODE_COST[mode] * (self.decode_ms + self.per_sequence_ms * sum(num_sequences)) / 1000)
+        results = []
+        for ids, count in zip(input_ids, num_sequences):
+            prompt_hash = zlib.crc32(str(ids).encode("utf-8"))
+            call = self._calls.get(prompt_hash, 0)
+            if self.modes[mode].decoding == SAMPLE:
+                self._calls[prompt_hash] = call + 1
+            else:
+                # Beam search is deterministic: the same prompt always gets the first draw
+                call = 0
+            rng = random.Random(f"{self.seed}:{prompt_hash}:{call}")
+            results.append([rng.choice(TEMPLATES) for _ in range(count)])
+        return results
@@ -0,0 +1,343 @@
+"""Reproducible performance benchmark suite for the AI service
+
+Everything runs in-process:
+
+- scorer: TransparencyScorer.calculate_score at varying answer counts and lengths
+- generator: QuestionGenerator.generate with the deterministic stub or the real model,
+  including one case per generation mode (latency tier)
+- load: concurrent clients against /api/generate-questions (overall and per
+  mode) and /api/calculate-transparency-score through the FastAPI app,
+  reporting p50/p95/p99 latency and requests per second
+
+Results are written as JSON. The compare mode flags cases whose latency grew,
+or whose throughput dropped, by more than a threshold and exits non-zero.
+Run from the ai-service directory:
+
+    python -m benchmarks.suite run --generator stub --json baseline.json
+    python -m benchmarks.suite run --generator real --model google/flan-t5-base --json real.json
+    python -m benchmarks.suite compare baseline.json current.json --threshold 0.10
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+from typing import Dict, Any, List, Optional
+
+from benchmarks.generation_backends import PRODUCTS
+from benchmarks.scorer_features import make_request
+
+# Latency metrics where higher is worse, and throughput metrics where lower is worse
+LATENCY_METRICS = ("p50_ms", "p95_ms", "p99_ms")
+THROUGHPUT_METRICS = ("rps",)
+
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    """Nearest-rank percentile of already sorted values"""
+    return sorted_values[min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))]
+
+
+def summarize(durations_ms: List[float], elapsed_seconds: float, errors: int = 0) -> Dict[str, Any]:
+    """Latency percentiles and throughput of a case"""
+    values = sorted(durations_ms)
+    return {
+        "count": len(values),
+        "errors": errors,
+        "p50_ms": round(percentile(values, 0.50), 3),
+        "p95_ms": round(percentile(values, 0.95), 3),
+        "p99_ms": round(percentile(values, 0.99), 3),
+        "mean_ms": round(sum(values) / len(values), 3),
+        "rps": round(len(values) / elapsed_seconds, 2) if elapsed_seconds > 0 else None,
+    }
+
+
+def timed_calls(func, repeat: int) -> Dict[str, Any]:
+    """Call func repeat times sequentially and summarize"""
+    durations = []
+    started = time.perf_counter()
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        durations.append((time.perf_counter() - start) * 1000)
+    return summarize(durations, time.perf_counter() - started)
+
+
+def bench_scorer(answer_counts: List[int], answer_words: List[int], repeat: int) -> Dict[str, Any]:
+    """calculate_score over a grid of answer counts and answer lengths"""
+    from app.models.transparency_scorer import TransparencyScorer
+
+    scorer = TransparencyScorer()
+    results = {}
+    for num_answers in answer_counts:
+        for words in answer_words:
+            product, answers = make_request(num_answers, words)
+            results[f"scorer/answers={num_answers}/words={words}"] = timed_calls(
+                lambda: scorer.calculate_score(product, answers), repeat
+            )
+    return results
+
+
+def bench_generator(generator, question_counts: List[int], modes: List[str], repeat: int) -> Dict[str, Any]:
+    """QuestionGenerator.generate for several question counts and modes, cycling through products"""
+    results = {}
+    for num_questions in question_counts:
+        calls = iter(range(repeat))
+        results[f"generator/num_questions={num_questions}"] = timed_calls(
+            lambda: generator.generate(PRODUCTS[next(calls) % len(PRODUCTS)], num_questions), repeat
+        )
+    # Per tier at the default and the largest question count; the fast tier must stay
+    # the cheapest at 20 questions, where beam-search cost grows fastest
+    for mode in modes:
+        for num_questions in (5, 20):
+            calls = iter(range(repeat))
+            results[f"generator/mode={mode}/num_questions={num_questions}"] = timed_calls(
+                lambda: generator.generate(PRODUCTS[next(calls) % len(PRODUCTS)], num_questions, mode=mode),
+                repeat
+            )
+    return results
+
+
+async def drive(client, path: str, payloads: List[Dict[str, Any]], concurrency: int) -> Dict[str, Any]:
+    """Send every payload to path from concurrency concurrent clients"""
+    pending = iter(payloads)
+    durations: List[float] = []
+    errors = 0
+
+    async def worker():
+        nonlocal errors
+        for payload in pending:
+            start = time.perf_counter()
+            response = await client.post(path, json=payload)
+            if response.status_code == 200:
+                durations.append((time.perf_counter() - start) * 1000)
+            else:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return summarize(durations, time.perf_counter() - started, errors) if durations else {"errors": errors}
+
+
+async def bench_load(generator, concurrency_levels: List[int], modes: List[str], requests: int) -> Dict[str, Any]:
+    """Concurrent load against the generation and scoring endpoints"""
+    import httpx
+    import main
+    from app.models.registry import model_registry
+
+    scoring_payloads = []
+    for index in range(requests):
+        product, answers = make_request(10, 40, seed=index)
+        scoring_payloads.append({"product": product, "answers": answers})
+
+    results = {}
+    for concurrency in concurrency_levels:
+        model_registry.set_question_generator(generator)
+        async with main.app.router.lifespan_context(main.app):
+            async with httpx.AsyncClient(app=main.app, base_url="http://benchmark") as client:
+                # Distinct products with refresh so every request reaches the generator
+                generate_payloads = [
+                    {"product": dict(PRODUCTS[index % len(PRODUCTS)], name=f"Product {index}"),
+                     "num_questions": 5, "refresh": True}
+                    for index in range(requests)
+                ]
+                results[f"load/generate-questions/concurrency={concurrency}"] = await drive(
+                    client, "/api/generate-questions", generate_payloads, concurrency
+                )
+                # Every request asks for the same tier; deep queues on slower tiers fall back to fast
+                for mode in modes:
+                    mode_payloads = [dict(payload, mode=mode) for payload in generate_payloads]
+                    results[f"load/generate-questions/mode={mode}/concurrency={concurrency}"] = await drive(
+                        client, "/api/generate-questions", mode_payloads, concurrency
+                    )
+                # Same few products without refresh: served from the question cache
+                cached_payloads = [
+                    {"product": PRODUCTS[index % len(PRODUCTS)], "num_questions": 5} for index in range(requests)
+                ]
+                results[f"load/generate-questions-cached/concurrency={concurrency}"] = await drive(
+                    client, "/api/generate-questions", cached_payloads, concurrency
+                )
+                results[f"load/calculate-transparency-score/concurrency={concurrency}"] = await drive(
+                    client, "/api/calculate-transparency-score", scoring_payloads, concurrency
+                )
+    return results
+
+
+def git_revision() -> Optional[str]:
+    """Current commit, if running from a git checkout"""
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def load_generator(kind: str, model: str, backend: Optional[str]):
+    """Build the stub or the real question generator"""
+    if kind == "stub":
+        from benchmarks.stub_generator import StubQuestionGenerator
+        return StubQuestionGenerator()
+    from app.models.question_generator import QuestionGenerator
+    generator = QuestionGenerator(model, backend=backend)
+    generator.warmup()
+    return generator
+
+
+def run(args) -> Dict[str, Any]:
+    """Run the selected groups and return the report"""
+    # Benchmarks must neither read nor write a persistent question cache or job store
+    os.environ["QUESTION_CACHE_DB"] = ""
+    os.environ["JOB_DB"] = ""
+    os.environ["PRELOAD_QUESTION_GENERATOR"] = "true"
+    logging.disable(logging.WARNING)
+    random.seed(args.seed)
+
+    quick = args.quick
+    results: Dict[str, Any] = {}
+    if "scorer" in args.groups:
+        results.update(bench_scorer(
+            [1, 10, 50] if quick else [1, 10, 50, 200],
+            [10, 80] if quick else [10, 80, 300],
+            10 if quick else args.repeat
+        ))
+
+    generator = None
+    modes = []
+    if "generator" in args.groups or "load" in args.groups:
+        generator = load_generator(args.generator, args.model, args.backend)
+        # Modes that are not configured (QUESTION_GENERATION_MODES) are skipped
+        modes = [mode for mode in args.modes if mode in generator.modes]
+    if "generator" in args.groups:
+        generator_repeat = args.repeat if args.generator == "stub" else max(1, args.repeat // 10)
+        results.update(bench_generator(generator, [1, 5, 10], modes, 5 if quick else generator_repeat))
+    if "load" in args.groups:
+        results.update(asyncio.run(bench_load(
+            generator,
+            [1, 8] if quick else args.concurrency,
+            modes,
+            20 if quick else args.requests
+        )))
+
+    import torch
+    return {
+        "meta": {
+            "generator": args.generator,
+            "model_id": getattr(generator, "model_id", None),
+            "mode_model_ids": {mode: generator.modes[mode].model_id for mode in modes},
+            # Requests, and fallbacks to the fast tier, per mode over the whole run
+            "generation_modes": generator.mode_stats() if generator is not None else None,
+            "git_revision": git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "torch_threads": torch.get_num_threads(),
+            "seed": args.seed,
+            "quick": quick,
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        },
+        "results": results,
+    }
+
+
+def compare(baseline: Dict[str, Any], current: Dict[str, Any], threshold: float,
+            min_delta_ms: float = 0.0) -> List[Dict[str, Any]]:
+    """Relative change of every shared case and metric, flagging regressions beyond threshold
+
+    Latency changes smaller than min_delta_ms are never flagged, so timer noise
+    on sub-millisecond cases doesn't count as a regression.
+    """
+    rows = []
+    for case, base_metrics in baseline["results"].items():
+        current_metrics = current["results"].get(case)
+        if current_metrics is None:
+            continue
+        for metric in LATENCY_METRICS + THROUGHPUT_METRICS:
+            base_value = base_metrics.get(metric)
+            current_value = current_metrics.get(metric)
+            if not base_value or current_value is None:
+                continue
+            change = (current_value - base_value) / base_value
+            if metric in LATENCY_METRICS:
+                worse = change if current_value - base_value > min_delta_ms else 0.0
+            else:
+                worse = -change
+            rows.append({
+                "case": case,
+                "metric": metric,
+                "baseline": base_value,
+                "current": current_value,
+                "change": round(change, 4),
+                "regression": worse > threshold,
+            })
+    return rows
+
+
+def print_results(report: Dict[str, Any]) -> None:
+    """Print one row per case"""
+    columns = ["count", "errors", "p50_ms", "p95_ms", "p99_ms", "rps"]
+    width = max(len(case) for case in report["results"]) if report["results"] else 10
+    print(f"{'case':<{width}} " + " ".join(f"{column:>10}" for column in columns))
+    for case, metrics in report["results"].items():
+        print(f"{case:<{width}} " + " ".join(f"{str(metrics.get(column, '-')):>10}" for column in columns))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="AI service benchmark suite")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="Run the benchmarks")
+    run_parser.add_argument("--groups", nargs="+", default=["scorer", "generator", "load"],
+                            choices=["scorer", "generator", "load"])
+    run_parser.add_argument("--generator", choices=["stub", "real"], default="stub")
+    run_parser.add_argument("--model", default="google/flan-t5-base", help="Model for --generator real")
+    run_parser.add_argument("--backend", help="Backend for --generator real (default QUESTION_GENERATION_BACKEND)")
+    run_parser.add_argument("--modes", nargs="+", default=["fast", "balanced", "quality"],
+                            choices=["fast", "balanced", "quality"], help="Generation modes benchmarked per tier")
+    run_parser.add_argument("--repeat", type=int, default=50, help="Calls per scorer/generator case")
+    run_parser.add_argument("--requests", type=int, default=200, help="Requests per load case")
+    run_parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    run_parser.add_argument("--seed", type=int, default=0)
+    run_parser.add_argument("--quick", action="store_true", help="Small grid for smoke runs")
+    run_parser.add_argument("--json", help="Write the report to this file")
+
+    compare_parser = commands.add_parser("compare", help="Compare two reports")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("current")
+    compare_parser.add_argument("--threshold", type=float, default=0.10,
+                                help="Relative change counted as a regression (0.10 = 10%%)")
+    compare_parser.add_argument("--min-delta-ms", type=float, default=0.05,
+                                help="Ignore latency increases smaller than this many milliseconds")
+    args = parser.parse_args()
+
+    if args.command == "run":
+        report = run(args)
+        print_results(report)
+        if args.json:
+            with open(args.json, "w") as output:
+                json.dump(report, output, indent=2)
+            print(f"Report written to {os.path.abspath(args.json)}")
+        return
+
+    with open(args.baseline) as baseline_file, open(args.current) as current_file:
+        baseline, current = json.load(baseline_file), json.load(current_file)
+    for key in ("generator", "model_id", "cpu_count"):
+        if baseline["meta"].get(key) != current["meta"].get(key):
+            print(f"Warning: {key} differs ({baseline['meta'].get(key)} vs {current['meta'].get(key)})")
+
+    rows = compare(baseline, current, args.threshold, args.min_delta_ms)
+    regressions = [row for row in rows if row["regression"]]
+    for row in rows:
+        flag = "REGRESSION" if row["regression"] else ""
+        print(f"{row['case']:<60} {row['metric']:>7} {row['baseline']:>10} {row['current']:>10} "
+              f"{row['change']:>+8.1%} {flag}")
+    print(f"{len(regressions)} regression(s) beyond {args.threshold:.0%} in {len(rows)} comparisons")
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""Export the question generation model for the onnx backend
+
+Usage:
+    python export_model.py --model google/flan-t5-base [--quantize] [--output DIR]
+
+The exported encoder/decoder is written to the directory the onnx backend
+loads from (QUESTION_ONNX_MODEL_DIR/<model name>) unless --output is given.
+With --quantize, every ONNX graph is dynamically quantized to int8 weights.
+"""
+import os
+import argparse
+import logging
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from app.models.generation_backends import onnx_model_dir
+from app.utils.logging_config import configure_logging
+
+logger = logging.getLogger(__name__)
+
+
+def export(model_name: str, output_dir: str, quantize: bool) -> None:
+    """Export model_name to ONNX in output_dir, optionally quantizing to int8"""
+    try:
+        from optimum.onnxruntime import ORTModelForSeq2SeqLM
+        from transformers import AutoTokenizer
+    except ImportError as e:
+        raise SystemExit("Exporting requires optimum[onnxruntime]: pip install 'optimum[onnxruntime]'") from e
+
+    logger.info(f"Exporting {model_name} to ONNX in {output_dir}")
+    model = ORTModelForSeq2SeqLM.from_pretrained(model_name, export=True)
+    model.save_pretrained(output_dir)
+    AutoTokenizer.from_pretrained(model_name).save_pretrained(output_dir)
+
+    if quantize:
+        from onnxruntime.quantization import quantize_dynamic, QuantType
+
+        for filename in sorted(os.listdir(output_dir)):
+            if not filename.endswith(".onnx"):
+                continue
+            path = os.path.join(output_dir, filename)
+            quantized_path = path + ".int8"
+            logger.info(f"Quantizing {filename} to int8")
+            quantize_dynamic(path, quantized_path, weight_type=QuantType.QInt8)
+            os.replace(quantized_path, path)
+
+    logger.info(f"Export complete: {output_dir}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Export the question generation model for ONNX Runtime")
+    parser.add_argument("--model", default="google/flan-t5-base", help="Hugging Face model name or local path")
+    parser.add_argument("--output", help="Output directory (defaults to the onnx backend's model directory)")
+    parser.add_argument("--quantize", action="store_true", help="Dynamically quantize weights to int8")
+    args = parser.parse_args()
+
+    configure_logging()
+    export(args.model, args.output or onnx_model_dir(args.model), args.quantize)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,321 @@
+"""Generate questions for a whole product catalogue offline
+
+Products are read from a JSONL file (or stdin) one line at a time and
+processed in chunks by a pool of worker processes, one per core by default,
+each running its own QuestionGenerator with a fixed number of torch threads.
+Only the model of the requested generation mode (--mode) is loaded.
+Within a worker, several products are generated concurrently and their
+prompts are merged into shared generate calls by the batch scheduler.
+
+Each input line is a product object, or {"id": ..., "product": {...}}.
+Results are appended to the output JSONL in input order, one line per
+product: {"line", "id", "questions"} or {"line", "id", "error"}. After each
+chunk a checkpoint records how far the input and output have got, so a
+killed job continues where it stopped when run again with the same arguments.
+
+    python generate_catalogue.py products.jsonl questions.jsonl
+    python generate_catalogue.py products.jsonl questions.jsonl --processes 4 --threads-per-process 2
+"""
+import argparse
+import gc
+import json
+import logging
+import multiprocessing
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, Iterator, List, Optional, Tuple
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from app.utils.logging_config import configure_logging
+
+logger = logging.getLogger("generate_catalogue")
+
+# Per-process state of a pool worker
+_generator = None
+_executor: Optional[ThreadPoolExecutor] = None
+
+
+def default_processes(threads_per_process: int) -> int:
+    """Worker processes that together use every core once"""
+    return max(1, (os.cpu_count() or 1) // threads_per_process)
+
+
+def load_generator(model: str, backend: Optional[str], mode: str):
+    """Construct a QuestionGenerator for one generation mode without running inference"""
+    from app.models.question_generator import QuestionGenerator
+    return QuestionGenerator(model, backend=backend, modes=[mode])
+
+
+def preload_generator(model: str, backend: Optional[str], mode: str) -> None:
+    """Load the weights once in the parent so forked workers share them copy-on-write
+
+    As in serve.py, the parent stays single-threaded and runs no inference.
+    """
+    global _generator
+    if (backend or os.getenv("QUESTION_GENERATION_BACKEND", "eager")).lower() == "onnx":
+        logger.info("Skipping weight preload for the onnx backend; each worker loads its own session")
+        return
+    num_threads = os.environ.get("TORCH_NUM_THREADS")
+    os.environ["TORCH_NUM_THREADS"] = "1"
+    try:
+        _generator = load_generator(model, backend, mode)
+    finally:
+        if num_threads is None:
+            del os.environ["TORCH_NUM_THREADS"]
+        else:
+            os.environ["TORCH_NUM_THREADS"] = num_threads
+    gc.freeze()
+
+
+def init_worker(model: str, backend: Optional[str], mode: str, num_threads: int, batch_size: int,
+                num_questions: int) -> None:
+    """Pool initializer: load (or adopt) the generator and start its batch scheduler"""
+    global _generator, _executor
+    os.environ["TORCH_NUM_THREADS"] = str(num_threads)
+    import torch
+    torch.set_num_threads(num_threads)
+
+    from app.models.batch_scheduler import BatchScheduler
+
+    if _generator is None:
+        _generator = load_generator(model, backend, mode)
+    _generator.warmup()
+    # Offline generation has no client waiting, so no per-product deadline
+    _generator.deadline_seconds = 0
+    # batch_size products are generated concurrently; their prompts are sampled together
+    scheduler = BatchScheduler(
+        _generator,
+        max_batch_size=batch_size * num_questions * _generator.oversample_factor,
+        max_wait_ms=float(os.getenv("QUESTION_BATCH_MAX_WAIT_MS", 10)),
+        bucket_width=int(os.getenv("QUESTION_BATCH_BUCKET_WIDTH", 32))
+    )
+    scheduler.start()
+    _generator.scheduler = scheduler
+    _executor = ThreadPoolExecutor(max_workers=batch_size, thread_name_prefix="catalogue")
+
+
+def parse_product(text: str) -> Tuple[Any, Dict[str, Any]]:
+    """Return the ID and product of an input line
+
+    Raises:
+        ValueError: If the line is not a product object with a name
+    """
+    record = json.loads(text)
+    if not isinstance(record, dict):
+        raise ValueError("Expected a JSON object")
+    product = record.get("product", record)
+    if not isinstance(product, dict) or not product.get("name"):
+        raise ValueError("Product has no name")
+    return record.get("id", product.get("id")), product
+
+
+def generate_one(line_number: int, text: str, num_questions: int) -> Dict[str, Any]:
+    """Generate questions for one input line, reporting failures in the record"""
+    product_id = None
+    try:
+        product_id, product = parse_product(text)
+        return {"line": line_number, "id": product_id, "questions": _generator.generate(product, num_questions)}
+    except Exception as e:
+        return {"line": line_number, "id": product_id, "error": str(e)}
+
+
+def process_chunk(chunk: List[Tuple[int, str]], num_questions: int) -> List[Dict[str, Any]]:
+    """Pool task: generate questions for a chunk of input lines, in order"""
+    futures = [_executor.submit(generate_one, line_number, text, num_questions) for line_number, text in chunk]
+    return [future.result() for future in futures]
+
+
+def read_chunks(lines: Iterator[str], skip: int, chunk_size: int) -> Iterator[Tuple[int, List[Tuple[int, str]]]]:
+    """Yield (lines consumed so far, chunk of (line number, text)) after skipping lines already done
+
+    Blank lines are consumed but produce no output.
+    """
+    chunk: List[Tuple[int, str]] = []
+    line_number = last_yielded = skip
+    for line_number, text in enumerate(lines, start=1):
+        if line_number <= skip:
+            continue
+        if text.strip():
+            chunk.append((line_number, text))
+        if len(chunk) >= chunk_size:
+            yield line_number, chunk
+            chunk = []
+            last_yielded = line_number
+    if line_number > last_yielded:
+        yield line_number, chunk
+
+
+class Checkpoint:
+    """Progress of a job: input lines done and the output size that matches them
+
+    Written atomically after every chunk, so after a crash the output can be
+    truncated to the last checkpoint and the input resumed from the line after it.
+    """
+
+    def __init__(self, path: str, input_path: str):
+        self.path = path
+        self.input_path = input_path
+        self.lines_done = 0
+        self.output_bytes = 0
+        self.products = 0
+        self.errors = 0
+
+    def load(self) -> bool:
+        """Read an existing checkpoint; returns False if there is none
+
+        Raises:
+            SystemExit: If the checkpoint belongs to a different input
+        """
+        if not os.path.exists(self.path):
+            return False
+        with open(self.path) as checkpoint_file:
+            state = json.load(checkpoint_file)
+        if state["input"] != self.input_path:
+            raise SystemExit(f"Checkpoint {self.path} belongs to input {state['input']}; "
+                             f"pass --restart to start over")
+        self.lines_done = state["lines_done"]
+        self.output_bytes = state["output_bytes"]
+        self.products = state["products"]
+        self.errors = state["errors"]
+        return True
+
+    def save(self) -> None:
+        temporary_path = self.path + ".tmp"
+        with open(temporary_path, "w") as checkpoint_file:
+            json.dump({
+                "input": self.input_path,
+                "lines_done": self.lines_done,
+                "output_bytes": self.output_bytes,
+                "products": self.products,
+                "errors": self.errors,
+                "updated_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            }, checkpoint_file)
+            checkpoint_file.flush()
+            os.fsync(checkpoint_file.fileno())
+        os.replace(temporary_path, self.path)
+
+
+def run(args) -> None:
+    """Run or resume a catalogue job"""
+    input_path = "-" if args.input == "-" else os.path.abspath(args.input)
+    checkpoint = Checkpoint(args.checkpoint or args.output + ".checkpoint", input_path)
+    if args.restart:
+        for path in (checkpoint.path, args.output):
+            if os.path.exists(path):
+                os.remove(path)
+    if checkpoint.load():
+        logger.info(f"Resuming after input line {checkpoint.lines_done} ({checkpoint.products} products done)")
+    elif os.path.exists(args.output) and os.path.getsize(args.output) > 0:
+        raise SystemExit(f"{args.output} exists without a checkpoint; pass --restart to overwrite it")
+
+    threads = max(1, args.threads_per_process)
+    processes = args.processes or default_processes(threads)
+    context = multiprocessing.get_context()
+    if context.get_start_method() == "fork" and not args.no_preload:
+        preload_generator(args.model, args.backend, args.mode)
+    logger.info(f"Generating in {args.mode} mode with {processes} processes x {threads} torch threads, "
+                f"{args.batch_size} products in flight per process")
+
+    output = open(args.output, "r+b" if os.path.exists(args.output) else "wb")
+    # Drop anything written after the last checkpoint
+    output.truncate(checkpoint.output_bytes)
+    output.seek(checkpoint.output_bytes)
+    source = sys.stdin if args.input == "-" else open(args.input, encoding="utf-8")
+
+    started = time.perf_counter()
+    done_this_run = 0
+    last_report = started
+    pool = context.Pool(
+        processes,
+        initializer=init_worker,
+        initargs=(args.model, args.backend, args.mode, threads, args.batch_size, args.num_questions)
+    )
+    try:
+        # Bounded window of chunks in flight keeps memory flat however long the input is
+        pending: deque = deque()
+        chunks = read_chunks(source, checkpoint.lines_done, args.chunk_size)
+        exhausted = False
+        while pending or not exhausted:
+            while not exhausted and len(pending) < processes * 2:
+                next_chunk = next(chunks, None)
+                if next_chunk is None:
+                    exhausted = True
+                    break
+                lines_done, chunk = next_chunk
+                pending.append((lines_done, pool.apply_async(process_chunk, (chunk, args.num_questions))))
+            if not pending:
+                break
+
+            # Results are written in input order so a checkpoint is a single line number
+            lines_done, result = pending.popleft()
+            records = result.get()
+            for record in records:
+                output.write((json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8"))
+                checkpoint.errors += "error" in record
+            output.flush()
+            os.fsync(output.fileno())
+            checkpoint.lines_done = lines_done
+            checkpoint.output_bytes = output.tell()
+            checkpoint.products += len(records)
+            checkpoint.save()
+            done_this_run += len(records)
+
+            now = time.perf_counter()
+            if now - last_report >= args.report_every:
+                last_report = now
+                logger.info(f"{checkpoint.products} products done ({done_this_run / (now - started):.2f} products/s, "
+                            f"{checkpoint.errors} errors)")
+        pool.close()
+    except BaseException:
+        pool.terminate()
+        raise
+    finally:
+        pool.join()
+        output.close()
+        if source is not sys.stdin:
+            source.close()
+
+    elapsed = time.perf_counter() - started
+    rate = done_this_run / elapsed if elapsed > 0 else 0.0
+    logger.info(f"Finished: {done_this_run} products in {elapsed:.1f}s ({rate:.2f} products/s), "
+                f"{checkpoint.products} in total, {checkpoint.errors} errors; output in {args.output}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Generate questions for a JSONL product catalogue")
+    parser.add_argument("input", help="Products as JSONL, or - for stdin")
+    parser.add_argument("output", help="Questions as JSONL, appended as products complete")
+    parser.add_argument("--checkpoint", help="Checkpoint file (default: OUTPUT.checkpoint)")
+    parser.add_argument("--restart", action="store_true", help="Discard the checkpoint and output and start over")
+    parser.add_argument("--model", default="google/flan-t5-base", help="Hugging Face model name or local path")
+    parser.add_argument("--backend", help="Inference backend (default QUESTION_GENERATION_BACKEND)")
+    parser.add_argument("--mode", choices=["fast", "balanced", "quality"],
+                        default=os.getenv("QUESTION_DEFAULT_MODE", "quality").lower(),
+                        help="Generation mode: fast uses QUESTION_FAST_MODEL, balanced and quality use --model "
+                             "(default QUESTION_DEFAULT_MODE)")
+    parser.add_argument("--num-questions", type=int, default=5, choices=range(1, 21), metavar="1-20",
+                        help="Questions per product, limited to 20 as in the API")
+    parser.add_argument("--processes", type=int, default=0,
+                        help="Worker processes (default: cores / threads per process)")
+    parser.add_argument("--threads-per-process", type=int, default=int(os.getenv("TORCH_NUM_THREADS", 0)) or 1,
+                        help="PyTorch intra-op threads per worker (default TORCH_NUM_THREADS or 1)")
+    parser.add_argument("--batch-size", type=int, default=8,
+                        help="Products generated concurrently per worker, their prompts sampled in shared batches")
+    parser.add_argument("--chunk-size", type=int, default=64, help="Products per pool task and checkpoint")
+    parser.add_argument("--report-every", type=float, default=10.0, help="Seconds between progress reports")
+    parser.add_argument("--no-preload", action="store_true",
+                        help="Load the model in every worker instead of sharing the parent's copy")
+    args = parser.parse_args()
+
+    configure_logging()
+    run(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,13 @@
+import time
+
+_import_started = time.perf_counter()
+
 import os
 import logging
+import threading
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import JSONResponse, PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.exceptions import RequestValidationError
 from dotenv import load_dotenv
@@ -8,22 +15,49 @@ from dotenv import load_dotenv
 load_dotenv()
 
 # Import API routers
-from app.api.routes import question_router, transparency_router
+from app.api.routes import question_router, transparency_router, model_router, job_router, generate_job_item, profile_router
+from app.models.registry import model_registry
 
 # Import utilities
-from app.utils.logging_config import configure_logging
-from app.utils.error_handlers import validation_exception_handler, general_exception_handler
+from app.utils.logging_config import configure_logging, RequestIdMiddleware
+from app.utils.error_handlers import validation_exception_handler, http_exception_handler, general_exception_handler
+from app.utils.inference_pool import generation_pool, scoring_pool
+from app.utils.metrics import metrics, MetricsMiddleware
+from app.utils.question_index import question_index
+from app.utils.job_queue import job_queue
+from app.utils.profiling import request_profiler, ProfilingMiddleware
 
 # Configure logging
 configure_logging()
 
 logger = logging.getLogger(__name__)
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Load the scorer now; the question generator (torch + transformers) loads in the
+    # background so scoring and health checks are served while it warms up
+    start = time.perf_counter()
+    model_registry.load(preload_generator=os.getenv("PRELOAD_QUESTION_GENERATOR", "true").lower() == "true")
+    if question_index.enabled:
+        # scikit-learn and the persisted index load in the background too
+        threading.Thread(target=question_index.load, name="question-index-load", daemon=True).start()
+    if request_profiler.enabled:
+        threading.Thread(target=request_profiler.warmup, name="profiler-warmup", daemon=True).start()
+    # Job workers pick up queued jobs, including those left over from before a restart
+    job_queue.start(generate_job_item)
+    logger.info(f"Startup completed in {time.perf_counter() - start:.2f}s")
+    yield
+    job_queue.stop()
+    generation_pool.shutdown()
+    scoring_pool.shutdown()
+    model_registry.unload()
+
 # Initialize FastAPI app
 app = FastAPI(
     title="Product Transparency AI Service",
     description="AI microservice for generating product transparency questions and scoring",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # Configure CORS
@@ -36,15 +70,43 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Record per-route request counts and latency for /metrics
+app.add_middleware(MetricsMiddleware)
+
+# Opt-in request profiling; when disabled the middleware isn't installed at all
+if request_profiler.enabled:
+    app.add_middleware(ProfilingMiddleware, profiler=request_profiler)
+
+# Tag log records with the request's X-Request-ID (generated when absent)
+app.add_middleware(RequestIdMiddleware)
+
 # Include routers
 app.include_router(question_router, prefix="/api")
 app.include_router(transparency_router, prefix="/api")
+app.include_router(model_router, prefix="/api")
+app.include_router(job_router, prefix="/api")
+if request_profiler.enabled:
+    app.include_router(profile_router, prefix="/api")
 
-# Health check endpoint
+# Health check endpoint (liveness: the process is up and the event loop responds)
 @app.get("/health")
 async def health_check():
     return {"status": "ok", "message": "AI service is running"}
 
+# Readiness endpoint: 200 once every model is loaded, 503 with per-model states otherwise
+@app.get("/ready")
+async def readiness_check():
+    ready = model_registry.is_ready()
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content={"status": "ready" if ready else "loading", "models": model_registry.states()}
+    )
+
+# Prometheus metrics: per-route requests, model stage timings, throughput and memory
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics_endpoint():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
 # Register error handlers
 @app.exception_handler(RequestValidationError)
 async def validation_error_handler(request: Request, exc: RequestValidationError):
@@ -52,13 +114,14 @@ async def validation_error_handler(request: Request, exc: RequestValidationError
 
 @app.exception_handler(HTTPException)
 async def http_error_handler(request: Request, exc: HTTPException):
-    logger.error(f"HTTP error: {exc.detail}")
-    return {"status": "error", "message": exc.detail}
+    return await http_exception_handler(request, exc)
 
 @app.exception_handler(Exception)
 async def exception_handler(request: Request, exc: Exception):
     return await general_exception_handler(request, exc)
 
+logger.info(f"Application imported in {time.perf_counter() - _import_started:.2f}s")
+
 if __name__ == "__main__":
     import uvicorn
     
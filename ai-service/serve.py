@@ -0,0 +1,172 @@
+"""Run the AI service with several worker processes sharing one copy of the model weights
+
+The parent process binds the listening socket and loads the question
+generator weights once, then forks the workers. Forked workers share the
+weight pages copy-on-write, so resident memory grows by the per-worker
+working set (activations, Python heap) rather than by a full model copy
+per worker. Each worker runs its own event loop, pools and batch scheduler,
+and gets an equal share of the CPU cores for PyTorch intra-op threads.
+
+    python serve.py --workers 4
+    python serve.py --workers 4 --threads-per-worker 2 --port 8000
+"""
+import argparse
+import gc
+import logging
+import os
+import signal
+import socket
+import sys
+import time
+from typing import Dict
+
+import uvicorn
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from main import app
+from app.models.registry import model_registry
+
+logger = logging.getLogger("serve")
+
+
+def threads_per_worker(workers: int, requested: int = 0) -> int:
+    """Intra-op threads for each worker so that workers together use every core once"""
+    if requested > 0:
+        return requested
+    configured = int(os.getenv("TORCH_NUM_THREADS", 0))
+    if configured > 0:
+        return configured
+    return max(1, (os.cpu_count() or 1) // workers)
+
+
+def bind_socket(host: str, port: int) -> socket.socket:
+    """Create the listening socket shared by every worker"""
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.set_inheritable(True)
+    return sock
+
+
+def preload_weights() -> None:
+    """Load the generator weights in the parent before forking
+
+    The parent stays single-threaded: an OpenMP thread pool started before
+    fork is unusable in the children, so no inference runs here.
+    """
+    if os.getenv("QUESTION_GENERATION_BACKEND", "eager").lower() == "onnx":
+        # ONNX Runtime sessions own thread pools that do not survive fork
+        logger.info("Skipping weight preload for the onnx backend; each worker loads its own session")
+        return
+    num_threads = os.environ.get("TORCH_NUM_THREADS")
+    os.environ["TORCH_NUM_THREADS"] = "1"
+    try:
+        model_registry.preload_for_fork()
+    finally:
+        if num_threads is None:
+            del os.environ["TORCH_NUM_THREADS"]
+        else:
+            os.environ["TORCH_NUM_THREADS"] = num_threads
+    # Keep the garbage collector from touching (and so copying) the preloaded objects
+    gc.freeze()
+
+
+def run_worker(sock: socket.socket, num_threads: int, log_level: str) -> None:
+    """Body of a forked worker process"""
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+
+    os.environ["TORCH_NUM_THREADS"] = str(num_threads)
+    if "torch" in sys.modules:
+        sys.modules["torch"].set_num_threads(num_threads)
+
+    config = uvicorn.Config(app, log_level=log_level.lower(), lifespan="on")
+    uvicorn.Server(config).run(sockets=[sock])
+
+
+def spawn_worker(sock: socket.socket, num_threads: int, log_level: str) -> int:
+    """Fork a worker and return its pid"""
+    pid = os.fork()
+    if pid == 0:
+        exit_code = 0
+        try:
+            run_worker(sock, num_threads, log_level)
+        except BaseException:
+            logger.exception("Worker crashed")
+            exit_code = 1
+        finally:
+            os._exit(exit_code)
+    return pid
+
+
+def serve(host: str, port: int, workers: int, num_threads: int, preload: bool, log_level: str) -> None:
+    """Bind, preload, fork the workers and supervise them until a shutdown signal"""
+    sock = bind_socket(host, port)
+    if preload:
+        preload_weights()
+
+    logger.info(f"Starting {workers} workers on {host}:{port} with {num_threads} torch threads each")
+    children: Dict[int, int] = {}
+    for slot in range(workers):
+        children[spawn_worker(sock, num_threads, log_level)] = slot
+
+    stopping = False
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        except InterruptedError:
+            continue
+        slot = children.pop(pid, None)
+        if slot is None or stopping:
+            continue
+        # Replace a crashed worker; the preloaded weights are still shared from this process
+        logger.warning(f"Worker {pid} exited with status {status}, restarting")
+        time.sleep(1)
+        children[spawn_worker(sock, num_threads, log_level)] = slot
+
+    sock.close()
+    logger.info("All workers stopped")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Run the AI service with forked workers")
+    parser.add_argument("--host", default=os.getenv("HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", 8000)))
+    parser.add_argument("--workers", type=int, default=int(os.getenv("WORKERS", 1)))
+    parser.add_argument("--threads-per-worker", type=int, default=0,
+                        help="PyTorch intra-op threads per worker (default: TORCH_NUM_THREADS or cores / workers)")
+    parser.add_argument("--no-preload", action="store_true",
+                        help="Load the model in every worker instead of sharing the parent's copy")
+    args = parser.parse_args()
+
+    workers = max(1, args.workers)
+    serve(
+        args.host,
+        args.port,
+        workers,
+        threads_per_worker(workers, args.threads_per_worker),
+        preload=not args.no_preload,
+        log_level=os.getenv("LOG_LEVEL", "INFO")
+    )
+
+
+if __name__ == "__main__":
+    main()